@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark the reply rules matcher (utils/reply_rules.py).
+
+Generates N synthetic rules (mostly keyword rules, some regex and language
+rules) and M messages, then compares the combined matcher against a naive
+loop that tries every rule per message. Both must pick the same rule for
+every message.
+
+    python bench_reply_rules.py
+    python bench_reply_rules.py --rules 1000 5000 20000 --messages 5000
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+
+from utils.reply_rules import CompiledRules, detect_language
+
+WORDS = (
+    "price delivery order size colour color stock available shipping refund return exchange "
+    "discount promo code invoice receipt payment transfer card cash wholesale bulk retail store "
+    "location address open close hours weekend monday friday today tomorrow bag shoe dress shirt "
+    "watch phone case cream perfume hair wig lace gold silver red blue black white small medium large"
+).split()
+
+
+def make_rules(count: int, rng: random.Random) -> list:
+    rules = []
+    for i in range(count):
+        kind = rng.random()
+        if kind < 0.9:
+            keywords = [f"{rng.choice(WORDS)}{i}", f"{rng.choice(WORDS)} {rng.choice(WORDS)}{i}"]
+            rules.append({"name": f"kw{i}", "keywords": keywords, "reply": f"reply {i} for {{keyword}}"})
+        elif kind < 0.99:
+            rules.append({"name": f"re{i}", "regex": rf"\b{rng.choice(WORDS)}{i}\s*#?(?P<num>\d+)", "reply": f"reply {i} #{{num}}"})
+        else:
+            rules.append({"name": f"lang{i}", "language": rng.choice(["fr", "es", "de"]), "reply": f"reply {i}"})
+    return rules
+
+
+def make_messages(count: int, rules: list, rng: random.Random) -> list:
+    messages = []
+    for _ in range(count):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(5, 25))]
+        if rng.random() < 0.5:
+            rule = rng.choice(rules)
+            if rule.get("keywords"):
+                words.insert(rng.randrange(len(words)), rng.choice(rule["keywords"]))
+            elif rule.get("regex"):
+                words.insert(rng.randrange(len(words)), f"{rule['name'][2:]} #{rng.randint(1, 999)}")
+        messages.append(" ".join(words))
+    return messages
+
+
+class NaiveRules:
+    """Reference implementation: every rule is tried against every message."""
+
+    def __init__(self, rules: list):
+        self.rules = []
+        for rule in rules:
+            keywords = [re.compile(r"\b" + re.escape(" ".join(k.lower().split())) + r"\b", re.IGNORECASE) for k in rule.get("keywords") or []]
+            regex = re.compile(rule["regex"], re.IGNORECASE) if rule.get("regex") else None
+            self.rules.append((rule["name"], keywords, regex, rule.get("language")))
+
+    def match(self, text: str):
+        normalized = " ".join(text.split())
+        lang = None
+        for name, keywords, regex, language in self.rules:
+            if any(k.search(normalized) for k in keywords):
+                return name
+            if regex is not None and regex.search(text):
+                return name
+            if language:
+                lang = lang or detect_language(text) or "?"
+                if lang == language:
+                    return name
+        return None
+
+
+def timed(fn, messages: list) -> tuple:
+    start = time.perf_counter()
+    results = [fn(m) for m in messages]
+    return time.perf_counter() - start, results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the reply rules matcher")
+    parser.add_argument("--rules", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"🧪 Reply rules benchmark: {args.messages} messages per run")
+    print(f"\n{'rules':>7}  {'compile':>9}  {'combined':>12}  {'naive':>12}  {'speedup':>8}  {'matched':>7}")
+    ok = True
+    for count in args.rules:
+        rng = random.Random(args.seed)
+        rules = make_rules(count, rng)
+        messages = make_messages(args.messages, rules, rng)
+
+        start = time.perf_counter()
+        compiled = CompiledRules({"rules": rules})
+        compile_s = time.perf_counter() - start
+        naive = NaiveRules(rules)
+
+        def combined_match(text):
+            match = compiled.match(text)
+            return match.name if match else None
+
+        combined_s, combined = timed(combined_match, messages)
+        naive_s, expected = timed(naive.match, messages)
+        mismatches = sum(a != b for a, b in zip(combined, expected))
+        ok = ok and not mismatches
+
+        per_msg = lambda s: f"{s / len(messages) * 1e6:9.1f}µs"
+        matched = sum(r is not None for r in combined)
+        print(f"{count:>7}  {compile_s * 1000:7.0f}ms  {per_msg(combined_s):>12}  {per_msg(naive_s):>12}  {naive_s / combined_s:7.1f}x  {matched:>7}")
+        if mismatches:
+            print(f"   ❌ {mismatches} message(s) matched a different rule than the naive loop")
+
+    print("\n✅ Combined matcher agrees with the naive loop" if ok else "\n❌ Results differ")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""The benchmark cases. Each returns {case name: summary dict}."""
+import asyncio
+import itertools
+import json
+import time
+from pathlib import Path
+
+from benchmarks.harness import measure, quiet, summarize, webhook_headers
+from benchmarks.stubs import SupabaseStub
+
+PAGE_ID = "17841400000000000"
+_seq = itertools.count()
+
+
+def webhook_payload(items: int) -> dict:
+    """One entry with `items` text messages, each from a new sender."""
+    now_ms = int(time.time() * 1000)
+    events = []
+    for _ in range(items):
+        n = next(_seq)
+        events.append({
+            "sender": {"id": f"bench_user_{n}"},
+            "recipient": {"id": PAGE_ID},
+            "timestamp": now_ms,
+            "message": {"mid": f"bench_mid_{n}", "text": "Hi, how much is delivery?"},
+        })
+    return {"object": "instagram", "entry": [{"id": PAGE_ID, "time": now_ms, "messaging": events}]}
+
+
+async def bench_webhook(client, sizes: list, iterations: int) -> dict:
+    """POST /webhook: time to the 200 ack, and until every reply was sent."""
+    from routes import api
+
+    results = {}
+    for items in sizes:
+        acks, processed = [], []
+
+        async def post():
+            before = set(api._reply_tasks)
+            start = time.perf_counter()
+            body = json.dumps(webhook_payload(items)).encode()
+            r = await client.post("/webhook", content=body, headers=webhook_headers(body))
+            acks.append(time.perf_counter() - start)
+            assert r.status_code == 200, r.text
+            # replies run in background tasks; wait for the ones this request spawned
+            await asyncio.gather(*(set(api._reply_tasks) - before))
+            processed.append(time.perf_counter() - start)
+
+        runs = max(5, iterations // items)
+        with quiet():
+            await measure(post, runs)
+        # measure's warm-up runs are at the front
+        results[f"webhook_post[items={items}]"] = {
+            "ack": summarize(acks[-runs:], units=items),
+            "processed": summarize(processed[-runs:], units=items),
+        }
+    return results
+
+
+def write_log(path: Path, lines: int) -> None:
+    """A webhook.log with `lines` entries shaped like the real ones."""
+    template = json.dumps({
+        "timestamp": "2025-01-15T12:00:00.000000Z",
+        "event": "webhook_received",
+        "data": webhook_payload(1),
+    })
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as f:
+        chunk = 10000
+        for start in range(0, lines, chunk):
+            f.write((template + "\n") * min(chunk, lines - start))
+
+
+async def bench_logs(client, sizes: list, iterations: int) -> dict:
+    """GET /webhook/logs with webhook.log at each size."""
+    from routes import api
+
+    results = {}
+    for lines in sizes:
+        write_log(api.log_tails["events"].path, lines)
+
+        async def get():
+            r = await client.get("/webhook/logs")
+            assert r.status_code == 200, r.text
+
+        with quiet():
+            results[f"webhook_logs[lines={lines}]"] = summarize(await measure(get, iterations))
+    api.log_tails["events"].path.unlink()
+    return results
+
+
+def submission_form() -> dict:
+    return {
+        "full_name": "Bench Resident",
+        "phone": "08012345678",
+        "address": "Block 1, Flat 2",
+        "plate_number": "LAG-123-AB",
+        "sticker_count": "2",
+        "amount_paid": "10000",
+        "payment_method": "transfer",
+        "payment_name": "Bench Resident",
+        "payment_date": "2025-01-15",
+    }
+
+
+async def bench_submit(client, sizes_mb: list, iterations: int) -> dict:
+    """POST /api/stickers/submit with receipts of each size."""
+    results = {}
+    for size_mb in sizes_mb:
+        # exactly 10MB is still accepted (the limit is "more than 10MB")
+        receipt = b"\xff\xd8\xff\xe0" + bytes(int(size_mb * 1024 * 1024) - 12)
+
+        async def submit():
+            # a distinct file each time: identical receipts skip the upload
+            files = {"receipt": ("receipt.jpg", receipt + next(_seq).to_bytes(8, "big"), "image/jpeg")}
+            r = await client.post("/api/stickers/submit", data=submission_form(), files=files)
+            assert r.status_code == 200, r.text
+
+        with quiet():
+            results[f"stickers_submit[receipt_mb={size_mb:g}]"] = summarize(await measure(submit, iterations))
+    return results
+
+
+async def bench_submissions(client, supabase: SupabaseStub, rows: int, iterations: int) -> dict:
+    """GET /api/stickers/submissions with `rows` stored submissions."""
+    from benchmarks.stubs import sample_submission
+
+    table = supabase.tables["sticker_submissions"] = [sample_submission(i) for i in range(rows)]
+    supabase._encoded = {}
+
+    async def get():
+        r = await client.get("/api/stickers/submissions")
+        assert r.status_code == 200, r.text[:200]
+        return r
+
+    with quiet():
+        r = await get()
+        assert len(r.json()) == len(table)
+        return {f"stickers_submissions[rows={rows}]": summarize(await measure(get, iterations, warmup=0))}
+
+
+async def bench_stats(client, supabase: SupabaseStub, rows: int, iterations: int) -> dict:
+    """GET /api/stickers/stats with `rows` stored submissions, cold and cached."""
+    from benchmarks.stubs import sample_submission
+    from routes import stickers
+
+    supabase.tables["sticker_submissions"] = [sample_submission(i) for i in range(rows)]
+
+    async def get(cold: bool):
+        if cold:
+            stickers.submissions_changed()
+        r = await client.get("/api/stickers/stats")
+        assert r.status_code == 200, r.text[:200]
+        assert r.json()["submissions"] == rows
+
+    with quiet():
+        return {
+            f"stickers_stats[rows={rows},cold]": summarize(await measure(lambda: get(True), max(3, iterations // 20))),
+            f"stickers_stats[rows={rows},cached]": summarize(await measure(lambda: get(False), iterations)),
+        }
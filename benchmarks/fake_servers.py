@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Serve the fake Graph API and Supabase locally for offline testing.
+
+    python -m benchmarks.fake_servers
+    python -m benchmarks.fake_servers --latency-ms 120 --jitter-ms 40 --error-rate 0.02 --rate-limit-rate 0.01
+
+Then start the app against them:
+
+    GRAPH_BASE_URL=http://127.0.0.1:8081 SUPABASE_URL=http://127.0.0.1:54321 \\
+    SUPABASE_KEY=fake.fake.fake PAGE_ACCESS_TOKEN=fake-page-token-0 python serve.py
+
+Faults can be changed while running, for both fakes at once:
+
+    curl -X POST localhost:8081/_fake/faults -d '{"latency_ms": 500, "error_rate": 0.1}'
+    curl localhost:8081/_fake/stats
+
+Defaults for the fault options come from FAKE_LATENCY_MS, FAKE_JITTER_MS,
+FAKE_ERROR_RATE and FAKE_RATE_LIMIT_RATE.
+"""
+
+import argparse
+import sys
+import threading
+from pathlib import Path
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import uvicorn
+
+from benchmarks.stubs import FakeGraph, Faults, SupabaseStub, create_graph_app
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def main() -> int:
+    defaults = Faults.from_env()
+    parser = argparse.ArgumentParser(description="Fake Graph API and Supabase servers")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--graph-port", type=int, default=8081)
+    parser.add_argument("--supabase-port", type=int, default=54321)
+    parser.add_argument("--latency-ms", type=float, default=defaults.latency_ms)
+    parser.add_argument("--jitter-ms", type=float, default=defaults.jitter_ms)
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate, help="share of requests failing with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=defaults.rate_limit_rate, help="share of requests failing with a rate limit error")
+    parser.add_argument("--call-budget", type=int, default=6000, help="Graph calls per minute before code 4 rate limiting (0 = unlimited)")
+    parser.add_argument("--pages", type=int, default=1, help="pages returned by /me/accounts")
+    parser.add_argument("--rows", type=int, default=0, help="sticker submissions to seed")
+    args = parser.parse_args()
+
+    faults = Faults(args.latency_ms, args.jitter_ms, args.error_rate, args.rate_limit_rate)
+    graph = FakeGraph(faults, pages=args.pages, call_budget=args.call_budget)
+    supabase = SupabaseStub(rows=args.rows, faults=faults, keep_objects=True)
+
+    supabase_server = make_server(args.host, args.supabase_port, supabase, server_class=ThreadingWSGIServer, handler_class=QuietHandler)
+    threading.Thread(target=supabase_server.serve_forever, daemon=True).start()
+
+    print("🧪 Fake services")
+    print(f"   Graph API: http://{args.host}:{args.graph_port}   (GRAPH_BASE_URL)")
+    print(f"   Supabase:  http://{args.host}:{args.supabase_port}  (SUPABASE_URL, any SUPABASE_KEY like fake.fake.fake)")
+    print(f"   Faults:    {faults.as_dict()}")
+    print("⏹️  Press Ctrl+C to stop")
+    try:
+        uvicorn.run(create_graph_app(graph), host=args.host, port=args.graph_port, log_level="warning")
+    finally:
+        supabase_server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
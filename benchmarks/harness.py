@@ -0,0 +1,129 @@
+"""Run the app in-process against the stubs, with its data files in a temp dir."""
+import asyncio
+import contextlib
+import hashlib
+import hmac
+import os
+import statistics
+import time
+from pathlib import Path
+from typing import Awaitable, Callable
+
+import httpx
+
+from benchmarks.stubs import SupabaseStub, graph_app
+
+BASE_URL = "http://bench.local"
+APP_SECRET = "bench-app-secret"
+
+
+def configure_env() -> None:
+    """Settings the app reads at import time; call before importing main."""
+    os.environ["ENABLE_INSTAGRAM"] = "1"
+    os.environ["ENABLE_STICKERS"] = "1"
+    os.environ["SUPABASE_URL"] = "http://supabase.bench"
+    os.environ["SUPABASE_KEY"] = "bench.bench.bench"
+    os.environ["PAGE_ACCESS_TOKEN"] = "bench-page-token"
+    os.environ["REPLY_PROVIDER"] = "rules"
+    os.environ["FACEBOOK_APP_SECRET"] = APP_SECRET
+    os.environ.pop("WEBHOOK_FORWARD_TARGETS", None)
+    os.environ.pop("PROFILE_REQUESTS", None)
+
+
+def webhook_headers(body: bytes) -> dict:
+    """Headers for POST /webhook, signed the way Meta signs them."""
+    digest = hmac.new(APP_SECRET.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    return {"Content-Type": "application/json", "X-Hub-Signature-256": f"sha256={digest}"}
+
+
+def isolate_data(data_dir: Path) -> None:
+    """Point every file the app writes under data/ at `data_dir`."""
+    import storage
+    from routes import api
+    from utils import conversations, outbox, token_refresh
+
+    data_dir.mkdir(parents=True, exist_ok=True)
+    api.DATA_DIR = data_dir
+    api.log_tails["events"].path = data_dir / "webhook.log"
+    api.log_tails["replies"].path = data_dir / "auto_replies.log"
+    outbox.DB_FILE = data_dir / "outbox.db"
+    conversations.conversations.path = data_dir / "conversations.json"
+    storage.STORE_PATH = data_dir
+    storage.TOKEN_FILE = data_dir / "token.json"
+    storage.DB_FILE = data_dir / "tokens.db"
+    token_refresh.LOCK_FILE = data_dir / "token_scheduler.lock"
+
+
+def install_stubs(supabase: SupabaseStub) -> None:
+    from supabase import create_client
+    from supabase.lib.client_options import SyncClientOptions
+
+    from routes import stickers
+    from utils import graph
+
+    graph._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=graph_app), timeout=10)
+    sb_http = httpx.Client(transport=httpx.WSGITransport(app=supabase), timeout=60)
+    stickers._client = create_client(
+        os.environ["SUPABASE_URL"], os.environ["SUPABASE_KEY"], options=SyncClientOptions(httpx_client=sb_http)
+    )
+
+
+@contextlib.asynccontextmanager
+async def running_app(data_dir: Path, supabase: SupabaseStub):
+    """Yield an httpx client wired to the app, with startup/shutdown run around it."""
+    configure_env()
+    with quiet():
+        import main
+
+        isolate_data(data_dir)
+        install_stubs(supabase)
+        lifespan = main.app.router.lifespan_context(main.app)
+        await lifespan.__aenter__()
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url=BASE_URL, timeout=120) as client:
+            yield client
+    finally:
+        with quiet():
+            await lifespan.__aexit__(None, None, None)
+
+
+@contextlib.contextmanager
+def quiet():
+    """Swallow the app's per-request prints so they don't skew timings."""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def summarize(samples: list, units: int = 1) -> dict:
+    """Latency percentiles (ms) and throughput for per-iteration timings in seconds."""
+    ordered = sorted(samples)
+
+    def pct(p: float) -> float:
+        rank = max(1, -(-len(ordered) * p // 100))
+        return round(ordered[int(rank) - 1] * 1000, 3)
+
+    total = sum(ordered)
+    return {
+        "iterations": len(ordered),
+        "p50_ms": pct(50),
+        "p95_ms": pct(95),
+        "p99_ms": pct(99),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "min_ms": round(ordered[0] * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+        "per_second": round(len(ordered) * units / total, 1) if total else None,
+    }
+
+
+async def measure(fn: Callable[[], Awaitable], iterations: int, warmup: int = 2) -> list:
+    """Time `fn` sequentially; warm-up runs are discarded."""
+    for _ in range(warmup):
+        await fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - start)
+    # let anything the requests scheduled settle before the next case
+    await asyncio.sleep(0)
+    return samples
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Offline benchmarks for the webhook, logs and stickers hot paths.
+
+The app runs in-process (ASGI, no server) with its data files in a temp dir;
+Graph API and Supabase are replaced by the stubs in benchmarks/stubs.py.
+
+    python -m benchmarks.run                             # full suite
+    python -m benchmarks.run --quick                     # smaller sizes, for a quick check
+    python -m benchmarks.run --only webhook logs
+    python -m benchmarks.run --compare benchmarks/results/baseline.json
+
+Results are written as JSON (default benchmarks/results/latest.json). With
+--compare, p50 latencies are checked against an earlier results file and the
+run fails when any case got slower by more than --threshold percent.
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from benchmarks import cases
+from benchmarks.harness import running_app
+from benchmarks.stubs import SupabaseStub
+
+SUITES = ("webhook", "logs", "submit", "submissions", "stats")
+FULL = {"webhook": [1, 10, 100], "logs": [10_000, 1_000_000], "submit": [1, 5, 10], "submissions": 100_000, "stats": 100_000}
+QUICK = {"webhook": [1, 10, 100], "logs": [10_000, 100_000], "submit": [1, 10], "submissions": 10_000, "stats": 10_000}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+async def run_suites(only: list, sizes: dict, iterations: int) -> dict:
+    supabase = SupabaseStub()
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="bench-data-") as tmp:
+        # the suite runs from the repo root so static/ and templates/ resolve
+        os.chdir(ROOT)
+        async with running_app(Path(tmp), supabase) as client:
+            for suite in only:
+                print(f"⏱️  {suite}...", flush=True)
+                start = time.perf_counter()
+                if suite == "webhook":
+                    results.update(await cases.bench_webhook(client, sizes["webhook"], iterations))
+                elif suite == "logs":
+                    results.update(await cases.bench_logs(client, sizes["logs"], iterations))
+                elif suite == "submit":
+                    results.update(await cases.bench_submit(client, sizes["submit"], max(3, iterations // 10)))
+                elif suite == "submissions":
+                    results.update(await cases.bench_submissions(client, supabase, sizes["submissions"], max(3, iterations // 20)))
+                elif suite == "stats":
+                    results.update(await cases.bench_stats(client, supabase, sizes["stats"], iterations))
+                print(f"   done in {time.perf_counter() - start:.1f}s")
+    return results
+
+
+def headline(summary: dict) -> dict:
+    # webhook cases report ack and processed; compare the ack
+    return summary.get("ack", summary)
+
+
+def print_table(results: dict) -> None:
+    print(f"\n{'case':<40} {'p50':>10} {'p95':>10} {'p99':>10} {'per sec':>10}")
+    for name, summary in results.items():
+        rows = [(name, summary)] if "ack" not in summary else [(f"{name} ack", summary["ack"]), (f"{name} processed", summary["processed"])]
+        for label, s in rows:
+            print(f"{label:<40} {s['p50_ms']:>8.2f}ms {s['p95_ms']:>8.2f}ms {s['p99_ms']:>8.2f}ms {s['per_second'] or 0:>10.1f}")
+
+
+def compare(results: dict, baseline_file: Path, threshold: float) -> bool:
+    baseline = json.loads(baseline_file.read_text(encoding="utf-8"))["results"]
+    ok = True
+    print(f"\n📊 p50 vs {baseline_file} (threshold {threshold:g}%)")
+    for name, summary in results.items():
+        if name not in baseline:
+            print(f"   {name:<40} (new)")
+            continue
+        before, after = headline(baseline[name])["p50_ms"], headline(summary)["p50_ms"]
+        change = (after - before) / before * 100 if before else 0.0
+        flag = "❌" if change > threshold else "✅"
+        ok = ok and change <= threshold
+        print(f"   {flag} {name:<40} {before:>9.2f}ms -> {after:>9.2f}ms  {change:+6.1f}%")
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the webhook, logs and stickers hot paths")
+    parser.add_argument("--only", nargs="+", choices=SUITES, default=list(SUITES))
+    parser.add_argument("--quick", action="store_true", help="smaller logs and tables")
+    parser.add_argument("--iterations", type=int, default=200, help="base iteration count (large cases run fewer)")
+    parser.add_argument("--output", type=Path, default=ROOT / "benchmarks" / "results" / "latest.json")
+    parser.add_argument("--compare", type=Path, help="earlier results file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=20.0, help="allowed p50 slowdown in percent")
+    args = parser.parse_args()
+
+    sizes = QUICK if args.quick else FULL
+    print(f"🧪 Benchmarks: {', '.join(args.only)}{' (quick)' if args.quick else ''}")
+    results = asyncio.run(run_suites(args.only, sizes, args.iterations))
+    print_table(results)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "quick": args.quick,
+        },
+        "results": results,
+    }
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"\n💾 Results written to {args.output}")
+
+    if args.compare:
+        return 0 if compare(results, args.compare, args.threshold) else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,471 @@
+"""Offline stand-ins for the services the app talks to.
+
+- `FakeGraph` / `create_graph_app`: ASGI app emulating the Graph API calls
+  the app makes: ``/me/messages``, ``/oauth/access_token``, ``/me``,
+  ``/me/accounts`` (paged), ``/me/permissions``, ``/<ig id>``,
+  ``/debug_token`` and batch requests (``POST /`` with ``batch=[...]``).
+  Every answer carries ``X-App-Usage`` (and ``X-Business-Use-Case-Usage``
+  for messages); past the per-minute call budget requests fail with Graph's
+  rate limit error (code 4), like the real thing.
+- `SupabaseStub`: WSGI app speaking enough PostgREST (select/filters/order/
+  limit, insert, update, delete, rpc) and Storage (upload, public download)
+  for routes/stickers.py, backed by in-memory tables.
+
+Both take a `Faults` object for latency and error injection. The benchmarks
+mount them in-process through httpx transports; benchmarks/fake_servers.py
+serves them over HTTP for manual and load testing.
+"""
+import asyncio
+import itertools
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from typing import Optional
+from urllib.parse import parse_qs, parse_qsl, urlencode, urlsplit
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+_VERSION_RE = re.compile(r"^/v\d+\.\d+")
+
+
+class Faults:
+    """Injected latency and failures, shared by the fakes and adjustable at runtime.
+
+    - latency_ms / jitter_ms  added to every request (uniform jitter)
+    - error_rate              share of requests answered with a 500
+    - rate_limit_rate         share of requests answered with a rate limit error
+    """
+
+    FIELDS = ("latency_ms", "jitter_ms", "error_rate", "rate_limit_rate")
+
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0, rate_limit_rate: float = 0,
+                 seed: Optional[int] = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self._rng = random.Random(seed)
+
+    @classmethod
+    def from_env(cls) -> "Faults":
+        """FAKE_LATENCY_MS, FAKE_JITTER_MS, FAKE_ERROR_RATE, FAKE_RATE_LIMIT_RATE."""
+        return cls(**{field: float(os.getenv(f"FAKE_{field.upper()}", "0")) for field in cls.FIELDS})
+
+    def update(self, values: dict) -> dict:
+        for field in self.FIELDS:
+            if field in values:
+                setattr(self, field, float(values[field]))
+        return self.as_dict()
+
+    def as_dict(self) -> dict:
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def delay(self) -> float:
+        jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0
+        return max(0.0, self.latency_ms + jitter) / 1000
+
+    def pick(self) -> Optional[str]:
+        """None, "error" or "rate_limit" for the next request."""
+        roll = self._rng.random()
+        if roll < self.error_rate:
+            return "error"
+        if roll < self.error_rate + self.rate_limit_rate:
+            return "rate_limit"
+        return None
+
+
+def graph_error(message: str, code: int, status: int = 400, error_type: str = "OAuthException", **extra) -> tuple:
+    return status, {"error": {"message": message, "type": error_type, "code": code, "fbtrace_id": "FAKE", **extra}}
+
+
+class FakeGraph:
+    def __init__(self, faults: Optional[Faults] = None, pages: int = 1, call_budget: int = 6000):
+        self.faults = faults or Faults()
+        self.pages = pages
+        # calls per rolling minute before code 4 ("Application request limit reached")
+        self.call_budget = call_budget
+        self.stats = {"requests": 0, "messages": 0, "batches": 0, "errors_injected": 0, "rate_limited": 0}
+        self._calls = deque()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def _usage(self) -> int:
+        """Percent of the per-minute budget used, counting this call."""
+        now = time.monotonic()
+        with self._lock:
+            while self._calls and now - self._calls[0] >= 60:
+                self._calls.popleft()
+            self._calls.append(now)
+            return int(len(self._calls) * 100 / self.call_budget) if self.call_budget else 0
+
+    @staticmethod
+    def page(n: int) -> dict:
+        return {
+            "id": f"10000000000{n:04d}",
+            "name": f"Fake Page {n}",
+            "access_token": f"fake-page-token-{n}",
+            "instagram_business_account": {
+                "id": f"178414000000{n:05d}",
+                "username": f"fake_ig_{n:04d}",
+                "profile_picture_url": "https://example.invalid/fake.jpg",
+            },
+        }
+
+    def handle(self, method: str, path: str, params: dict, body: dict, base_url: str = "") -> tuple:
+        """(status, headers, body) for one Graph call; batch items come through here too."""
+        self.stats["requests"] += 1
+        usage = self._usage()
+        headers = {"X-App-Usage": json.dumps({"call_count": usage, "total_cputime": usage // 2, "total_time": usage // 2})}
+        path = _VERSION_RE.sub("", path).rstrip("/") or "/"
+        fault = self.faults.pick()
+        if fault == "error":
+            self.stats["errors_injected"] += 1
+            status, payload = graph_error("An unexpected error has occurred. Please retry your request later.", 2, 500, is_transient=True)
+        elif fault == "rate_limit" or usage > 100:
+            self.stats["rate_limited"] += 1
+            status, payload = graph_error("Application request limit reached", 4, is_transient=True)
+        else:
+            status, payload = self._route(method, path, params, body, base_url)
+        if path == "/me/messages":
+            headers["X-Business-Use-Case-Usage"] = json.dumps({self.page(0)["id"]: [{
+                "type": "messenger", "call_count": usage, "total_cputime": usage // 2, "total_time": usage // 2,
+                "estimated_time_to_regain_access": 0 if usage <= 100 else 1,
+            }]})
+        return status, headers, payload
+
+    def _route(self, method: str, path: str, params: dict, body: dict, base_url: str) -> tuple:
+        token = params.get("access_token") or body.get("access_token")
+        if path == "/oauth/access_token":
+            if params.get("code"):
+                return 200, {"access_token": f"fake-short-{params['code']}", "token_type": "bearer"}
+            if params.get("grant_type") == "fb_exchange_token" and params.get("fb_exchange_token"):
+                return 200, {"access_token": f"fake-long-{next(self._ids)}", "token_type": "bearer", "expires_in": 5183944}
+            return graph_error("Missing authorization code", 191)
+        if not token:
+            return graph_error("An active access token must be used to query information about the current user.", 2500)
+        if token.startswith(("invalid", "expired")):
+            return graph_error("Error validating access token: Session has expired.", 190, 401, error_subcode=463)
+
+        if path == "/debug_token":
+            now = int(time.time())
+            return 200, {"data": {
+                "app_id": "fake-app", "type": "USER", "is_valid": True, "user_id": "fake-user-1",
+                "expires_at": now + 60 * 24 * 3600, "data_access_expires_at": now + 90 * 24 * 3600,
+                "scopes": ["instagram_basic", "instagram_manage_messages", "pages_show_list", "pages_messaging"],
+            }}
+        if path == "/me/messages" and method == "POST":
+            recipient = (body.get("recipient") or {}).get("id")
+            if not recipient or not (body.get("message") or {}).get("text"):
+                return graph_error("(#100) The parameter recipient is required", 100)
+            self.stats["messages"] += 1
+            return 200, {"recipient_id": recipient, "message_id": f"m_fake_{next(self._ids)}"}
+        if path == "/me/permissions":
+            if method == "DELETE":
+                return 200, {"success": True}
+            return 200, {"data": [{"permission": "instagram_basic", "status": "granted"}]}
+        if path == "/me/accounts":
+            limit = int(params.get("limit", 25))
+            start = int(params.get("after") or 0)
+            data = [self._fields(self.page(n), params) for n in range(start, min(start + limit, self.pages))]
+            result = {"data": data, "paging": {"cursors": {"before": str(start), "after": str(start + len(data))}}}
+            if start + limit < self.pages:
+                result["paging"]["next"] = f"{base_url}/me/accounts?" + urlencode({**params, "after": start + limit})
+            return 200, result
+        if path == "/me":
+            return 200, self._fields({"id": "fake-user-1", "name": "Fake User", "username": "fake_user",
+                                      "profile_picture_url": "https://example.invalid/fake.jpg"}, params)
+        match = re.fullmatch(r"/(\d+)", path)
+        if match and method == "GET":
+            return 200, self._fields({"id": match.group(1), "username": f"fake_ig_{match.group(1)[-4:]}", "name": "Fake Business",
+                                      "profile_picture_url": "https://example.invalid/fake.jpg"}, params)
+        return graph_error(f"Unsupported {method.lower()} request.", 100, error_type="GraphMethodException")
+
+    @staticmethod
+    def _fields(node: dict, params: dict) -> dict:
+        # like Graph, a sub-object is only its id unless expanded (`field{a,b}`)
+        result = {}
+        for name, nested in re.findall(r"(\w+)(?:\{([^}]*)\})?", params.get("fields", "id")):
+            value = node.get(name)
+            if isinstance(value, dict):
+                value = FakeGraph._fields(value, {"fields": nested or "id"})
+            if value is not None:
+                result[name] = value
+        result.setdefault("id", node.get("id"))
+        return result
+
+    def batch(self, requests_json: str, token: Optional[str], base_url: str = "") -> tuple:
+        try:
+            requests = json.loads(requests_json)
+        except ValueError:
+            requests = None
+        if not isinstance(requests, list):
+            return graph_error("(#100) The parameter batch must be a JSON array", 100)
+        if len(requests) > 50:
+            return graph_error("(#100) Too many requests in batch message. Maximum batch size is 50", 100)
+        self.stats["batches"] += 1
+        results = []
+        for item in requests:
+            url = urlsplit("/" + item.get("relative_url", "").lstrip("/"))
+            params = dict(parse_qsl(url.query))
+            body = dict(parse_qsl(item.get("body", "")))
+            for key in ("recipient", "message"):
+                if isinstance(body.get(key), str):
+                    try:
+                        body[key] = json.loads(body[key])
+                    except ValueError:
+                        pass
+            if token:
+                params.setdefault("access_token", token)
+            status, headers, payload = self.handle(item.get("method", "GET").upper(), url.path, params, body, base_url)
+            results.append({"code": status, "headers": [{"name": k, "value": v} for k, v in headers.items()], "body": json.dumps(payload)})
+        return 200, results
+
+
+def create_graph_app(fake: Optional[FakeGraph] = None) -> FastAPI:
+    fake = fake or FakeGraph()
+    app = FastAPI()
+    app.state.fake = fake
+
+    @app.get("/_fake/stats")
+    async def stats():
+        return {**fake.stats, "faults": fake.faults.as_dict()}
+
+    @app.post("/_fake/faults")
+    async def set_faults(request: Request):
+        return fake.faults.update(await request.json())
+
+    @app.api_route("/{path:path}", methods=["GET", "POST", "DELETE"])
+    async def graph(path: str, request: Request):
+        delay = fake.faults.delay()
+        if delay:
+            await asyncio.sleep(delay)
+        path = "/" + path
+        version = _VERSION_RE.match(path)
+        base_url = str(request.base_url).rstrip("/") + (version.group(0) if version else "")
+        params = dict(request.query_params)
+        body = {}
+        if request.method == "POST":
+            if request.headers.get("content-type", "").startswith("application/json"):
+                body = await request.json()
+            else:
+                body = dict(await request.form())
+        if request.method == "POST" and "batch" in body and _VERSION_RE.sub("", path).strip("/") == "":
+            status, payload = fake.batch(body["batch"], body.get("access_token") or params.get("access_token"), base_url)
+            return JSONResponse(payload, status_code=status)
+        status, headers, payload = fake.handle(request.method, path, params, body, base_url)
+        return JSONResponse(payload, status_code=status, headers=headers)
+
+    return app
+
+
+graph_app = create_graph_app()
+
+
+def postgrest_error(message: str, code: str, status: str = "400 Bad Request") -> tuple:
+    return status, {"code": code, "details": None, "hint": None, "message": message}
+
+
+_OPERATORS = {
+    "eq": lambda a, b: (str(a).lower() if isinstance(a, bool) else str(a)) == b,
+    "neq": lambda a, b: (str(a).lower() if isinstance(a, bool) else str(a)) != b,
+    "gt": lambda a, b: a is not None and str(a) > b,
+    "gte": lambda a, b: a is not None and str(a) >= b,
+    "lt": lambda a, b: a is not None and str(a) < b,
+    "lte": lambda a, b: a is not None and str(a) <= b,
+    "is": lambda a, b: a is None if b == "null" else str(a).lower() == b,
+    "in": lambda a, b: str(a) in b.strip("()").split(","),
+}
+_RESERVED_PARAMS = ("select", "order", "limit", "offset", "on_conflict", "columns")
+
+
+class SupabaseStub:
+    """Minimal PostgREST (/rest/v1/<table>, /rest/v1/rpc/<fn>) and Storage (/storage/v1/object/...)."""
+
+    def __init__(self, rows: int = 0, faults: Optional[Faults] = None, keep_objects: bool = False):
+        self.tables = {"sticker_submissions": [sample_submission(i) for i in range(rows)]}
+        # rpc name -> callable(stub, args) returning the JSON result
+        self.functions = {"sticker_stats": sticker_stats}
+        self.faults = faults or Faults()
+        # benchmarks upload many MB; only keep object bytes when asked to
+        self.keep_objects = keep_objects
+        self.objects = {}
+        self.uploads = 0
+        self.uploaded_bytes = 0
+        self._lock = threading.Lock()
+        # the app's cost is what's being measured, so serialized reads are cached
+        self._encoded = {}
+
+    def __call__(self, environ, start_response):
+        method = environ["REQUEST_METHOD"]
+        path = environ["PATH_INFO"]
+        length = int(environ.get("CONTENT_LENGTH") or 0)
+        body = environ["wsgi.input"].read(length) if length else b""
+
+        if path == "/_fake/faults":
+            values = json.loads(body) if method == "POST" and body else {}
+            return self._reply(start_response, "200 OK", json.dumps(self.faults.update(values)).encode())
+        delay = self.faults.delay()
+        if delay:
+            time.sleep(delay)
+        fault = self.faults.pick()
+        if fault == "error":
+            return self._reply(start_response, "500 Internal Server Error", b'{"message": "injected failure"}')
+        if fault == "rate_limit":
+            return self._reply(start_response, "429 Too Many Requests", b'{"message": "rate limit exceeded"}', [("Retry-After", "1")])
+
+        with self._lock:
+            if path.startswith("/storage/v1/object/"):
+                status, payload = self._storage(method, path[len("/storage/v1/object/"):], body, environ)
+            else:
+                match = re.fullmatch(r"/rest/v1/(rpc/)?(\w+)", path)
+                if not match:
+                    status, payload = "404 Not Found", {"message": "not found"}
+                elif match.group(1):
+                    status, payload = self._rpc(match.group(2), body)
+                else:
+                    status, payload = self._table(method, match.group(2), environ.get("QUERY_STRING", ""), body)
+        if isinstance(payload, bytes):
+            return self._reply(start_response, status, payload, content_type="application/octet-stream" if path.startswith("/storage/") else "application/json")
+        return self._reply(start_response, status, json.dumps(payload).encode())
+
+    def _storage(self, method: str, key: str, body: bytes, environ) -> tuple:
+        if method == "GET" and key.startswith("public/"):
+            data = self.objects.get(key[len("public/"):])
+            if data is None:
+                return "404 Not Found", {"statusCode": "404", "error": "not_found", "message": "Object not found"}
+            return "200 OK", data
+        if method in ("POST", "PUT"):
+            if key in self.objects and environ.get("HTTP_X_UPSERT", "false") != "true":
+                return "400 Bad Request", {"statusCode": "409", "error": "Duplicate", "message": "The resource already exists"}
+            content_type = environ.get("CONTENT_TYPE", "")
+            if self.keep_objects and content_type.startswith("multipart/form-data"):
+                body = _multipart_file(body, content_type)
+            self.uploads += 1
+            self.uploaded_bytes += len(body)
+            self.objects[key] = body if self.keep_objects else b""
+            return "200 OK", {"Key": key}
+        return "405 Method Not Allowed", {"message": "unsupported"}
+
+    def _rpc(self, name: str, body: bytes) -> tuple:
+        function = self.functions.get(name)
+        if function is None:
+            return postgrest_error(f"Could not find the function public.{name}", "PGRST202", "404 Not Found")
+        return "200 OK", function(self, json.loads(body or b"{}"))
+
+    def _table(self, method: str, name: str, query_string: str, body: bytes) -> tuple:
+        table = self.tables.setdefault(name, [])
+        query = parse_qs(query_string, keep_blank_values=True)
+        filters = [(column, *value.partition(".")[::2]) for column, values in query.items()
+                   if column not in _RESERVED_PARAMS for value in values]
+        for _, operator, _ in filters:
+            if operator not in _OPERATORS:
+                return postgrest_error(f"unknown operator {operator}", "PGRST100")
+
+        def matches(row: dict) -> bool:
+            return all(_OPERATORS[op](row.get(column), value) for column, op, value in filters)
+
+        if method == "POST":
+            rows = json.loads(body)
+            rows = rows if isinstance(rows, list) else [rows]
+            existing = {row.get("id") for row in table}
+            if any(row.get("id") is not None and row.get("id") in existing for row in rows):
+                return postgrest_error("duplicate key value violates unique constraint", "23505", "409 Conflict")
+            table.extend(rows)
+            self._invalidate(name)
+            return "201 Created", rows
+        if method == "PATCH":
+            updates = json.loads(body)
+            changed = [row for row in table if matches(row)]
+            for row in changed:
+                row.update(updates)
+            self._invalidate(name)
+            return "200 OK", changed
+        if method == "DELETE":
+            removed = [row for row in table if matches(row)]
+            self.tables[name] = [row for row in table if not matches(row)]
+            self._invalidate(name)
+            return "200 OK", removed
+        if method != "GET":
+            return "405 Method Not Allowed", {"message": "unsupported"}
+
+        key = (name, query_string)
+        if key not in self._encoded:
+            rows = [row for row in table if matches(row)] if filters else table
+            # sort by the last key first so earlier keys take precedence
+            for order in reversed(",".join(query.get("order", [])).split(",")):
+                if order:
+                    column, _, direction = order.partition(".")
+                    rows = sorted(rows, key=lambda row: (row.get(column) is not None, row.get(column) or ""), reverse=direction.startswith("desc"))
+            offset = int(query.get("offset", ["0"])[0])
+            end = offset + int(query["limit"][0]) if "limit" in query else None
+            rows = rows[offset:end]
+            select = query.get("select", ["*"])[0]
+            if select != "*":
+                rows = [{column: row.get(column) for column in select.split(",")} for row in rows]
+            self._encoded[key] = json.dumps(rows).encode()
+        return "200 OK", self._encoded[key]
+
+    def _invalidate(self, name: str) -> None:
+        self._encoded = {k: v for k, v in self._encoded.items() if k[0] != name}
+
+    @staticmethod
+    def _reply(start_response, status: str, body: bytes, headers: Optional[list] = None, content_type: str = "application/json"):
+        start_response(status, [("Content-Type", content_type), ("Content-Length", str(len(body)))] + (headers or []))
+        return [body]
+
+
+def _multipart_file(body: bytes, content_type: str) -> bytes:
+    """The ``file`` part of a storage upload (storage3 sends multipart/form-data)."""
+    message = BytesParser(policy=default_policy).parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+    for part in message.iter_parts():
+        if part.get_param("name", header="content-disposition") == "file":
+            return part.get_payload(decode=True) or b""
+    return body
+
+
+def sample_submission(i: int) -> dict:
+    return {
+        "id": f"{i:08x}",
+        "full_name": f"Resident {i}",
+        "phone": f"080{i:08d}",
+        "address": f"Block {i % 40}, Flat {i % 12}, Infinity Estate",
+        "owner_name": "",
+        "plate_number": f"LAG-{i % 1000:03d}-{chr(65 + i % 26)}{chr(65 + i // 26 % 26)}",
+        "sticker_count": 1 + i % 3,
+        "amount_paid": 5000 * (1 + i % 3),
+        "payment_method": "transfer",
+        "payment_name": f"Resident {i}",
+        "payment_date": "2025-01-15",
+        "receipt_filename": f"{i:08x}_receipt.jpg",
+        "receipt_url": f"http://supabase.bench/storage/v1/object/public/sticker-receipts/{i:08x}_receipt.jpg",
+        "submitted_at": f"2025-01-{1 + i % 28:02d}T{i % 24:02d}:{i % 60:02d}:00+00:00",
+        "collected": i % 5 == 0,
+        "collected_at": None,
+    }
+
+
+def sticker_stats(stub: SupabaseStub, args: dict) -> dict:
+    """Python version of public.sticker_stats() (supabase/migrations)."""
+    stats = {"submissions": 0, "stickers": 0, "amount_paid": 0, "collected": 0, "pending": 0,
+             "stickers_collected": 0, "stickers_pending": 0, "by_payment_method": {}}
+    for row in stub.tables.get("sticker_submissions", []):
+        count, amount = int(row.get("sticker_count") or 0), float(row.get("amount_paid") or 0)
+        state = "collected" if row.get("collected") else "pending"
+        stats["submissions"] += 1
+        stats["stickers"] += count
+        stats["amount_paid"] += amount
+        stats[state] += 1
+        stats[f"stickers_{state}"] += count
+        method = (row.get("payment_method") or "").strip().lower() or "unknown"
+        totals = stats["by_payment_method"].setdefault(method, {"submissions": 0, "stickers": 0, "amount_paid": 0})
+        totals["submissions"] += 1
+        totals["stickers"] += count
+        totals["amount_paid"] += amount
+    return stats
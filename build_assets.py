@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+Build step for the files under static/.
+
+1. Minifies HTML (with its inline <style>/<script>), CSS and JS, makes the
+   Google Fonts stylesheet non-render-blocking, and optimizes PNGs (resized
+   with Pillow when installed, otherwise losslessly recompressed with
+   metadata chunks stripped).
+2. Writes the results to static/dist/ under content-hashed names and records
+   them in static/dist/manifest.json, which main.py / routes/web.py use to
+   serve the built files.
+3. Writes precompressed `<file>.br` (when the `brotli` package is installed)
+   and `<file>.gz` variants next to every compressible asset, which
+   utils/static.py serves to clients that accept them. Variants that wouldn't
+   be smaller are removed.
+
+Prints the size savings per asset. Run as part of the deploy build:
+    python build_assets.py
+"""
+
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import struct
+import zlib
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:  # optional; gzip variants are still produced
+    brotli = None
+
+STATIC_DIR = Path(__file__).resolve().parent / "static"
+DIST_DIR = STATIC_DIR / "dist"
+MANIFEST_FILE = DIST_DIR / "manifest.json"
+COMPRESSIBLE = {".html", ".css", ".js", ".json", ".svg", ".txt", ".xml", ".map", ".ico"}
+VARIANT_SUFFIXES = (".br", ".gz")
+
+
+def _write_variant(target: Path, data: bytes, original_size: int) -> int:
+    """Write `data` to `target` if it's smaller than the original; return its size."""
+    if len(data) >= original_size:
+        if target.exists():
+            target.unlink()
+        return 0
+    target.write_bytes(data)
+    return len(data)
+
+
+def compress_file(path: Path) -> dict:
+    raw = path.read_bytes()
+    result = {"file": str(path.relative_to(STATIC_DIR)), "size": len(raw), "gzip": 0, "br": 0}
+    gz = gzip.compress(raw, compresslevel=9, mtime=0)
+    result["gzip"] = _write_variant(path.with_name(path.name + ".gz"), gz, len(raw))
+    if brotli is not None:
+        br = brotli.compress(raw, quality=11)
+        result["br"] = _write_variant(path.with_name(path.name + ".br"), br, len(raw))
+    return result
+
+
+# --- minifiers --------------------------------------------------------------
+# Deliberately conservative: they drop comments and indentation but keep line
+# breaks where they might matter (JS automatic semicolon insertion, inline
+# HTML whitespace), so the output behaves exactly like the source.
+
+def minify_css(css: str) -> str:
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    # spaces around structural punctuation; ':' only loses the space after it
+    # so descendant selectors like `a :hover` keep their meaning
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    css = re.sub(r":\s+", ":", css)
+    return css.replace(";}", "}").strip()
+
+
+_REGEX_PREFIX = set("(,=:[!&|?{};+-*%<>~^")
+_REGEX_KEYWORD_RE = re.compile(r"(?:^|[^\w$])(?:return|typeof|case|do|else|in|of|void|yield|await|delete|new|instanceof)$")
+_IDENT_CHARS = re.compile(r"[\w$]")
+
+
+def _scan_quoted(src: str, i: int, quote: str) -> int:
+    """Return the index just past the string starting at src[i]."""
+    j = i + 1
+    while j < len(src) and src[j] != quote:
+        if src[j] == "\\":
+            j += 1
+        elif src[j] == "\n":
+            break
+        j += 1
+    return j + 1
+
+
+def _scan_template(src: str, i: int) -> tuple:
+    """Scan template literal text from i. Returns (end, closed): `end` is just
+    past the closing backtick (closed) or just past an opening `${`."""
+    while i < len(src):
+        ch = src[i]
+        if ch == "\\":
+            i += 2
+            continue
+        if ch == "`":
+            return i + 1, True
+        if src.startswith("${", i):
+            return i + 2, False
+        i += 1
+    return len(src), True
+
+
+def _scan_regex(src: str, i: int) -> int:
+    """Return the index past the regex literal at src[i], or -1 if it isn't one."""
+    j, in_class = i + 1, False
+    while j < len(src):
+        ch = src[j]
+        if ch == "\\":
+            j += 2
+            continue
+        if ch == "\n":
+            return -1
+        if ch == "[":
+            in_class = True
+        elif ch == "]":
+            in_class = False
+        elif ch == "/" and not in_class:
+            j += 1
+            while j < len(src) and src[j].isalpha():
+                j += 1
+            return j
+        j += 1
+    return -1
+
+
+def minify_js(src: str) -> str:
+    out = []
+    tail = ""  # recent output, for regex/keyword context
+    template_depths = []
+    depth = 0
+    i, n = 0, len(src)
+
+    def emit(text):
+        nonlocal tail
+        out.append(text)
+        tail = (tail + text)[-24:]
+
+    while i < n:
+        c = src[i]
+        if c == "`" or (c == "}" and template_depths and depth == 0):
+            end, closed = _scan_template(src, i + 1)
+            emit(src[i:end])
+            if c == "`" and not closed:
+                template_depths.append(depth)
+                depth = 0
+            elif c == "}" and closed:
+                depth = template_depths.pop()
+            i = end
+        elif c in "'\"":
+            end = _scan_quoted(src, i, c)
+            emit(src[i:end])
+            i = end
+        elif c.isspace() or src.startswith("//", i) or src.startswith("/*", i):
+            # a run of whitespace and comments collapses to one separator
+            j, newline = i, False
+            while j < n:
+                if src[j].isspace():
+                    newline = newline or src[j] == "\n"
+                    j += 1
+                elif src.startswith("//", j):
+                    j = src.find("\n", j)
+                    j = n if j == -1 else j
+                elif src.startswith("/*", j):
+                    end = src.find("*/", j + 2)
+                    end = n if end == -1 else end + 2
+                    newline = newline or "\n" in src[j:end]
+                    j = end
+                else:
+                    break
+            prev = tail[-1:] if tail else ""
+            nxt = src[j:j + 1]
+            if newline:
+                # keep newlines for automatic semicolon insertion
+                if prev and prev not in "{;,([\n":
+                    emit("\n")
+            elif prev and nxt and (
+                (_IDENT_CHARS.match(prev) and _IDENT_CHARS.match(nxt)) or (prev in "+-" and nxt == prev)
+            ):
+                emit(" ")
+            i = j
+        elif c == "/" and (not tail.strip() or tail.rstrip()[-1] in _REGEX_PREFIX or _REGEX_KEYWORD_RE.search(tail.rstrip())):
+            end = _scan_regex(src, i)
+            if end == -1:
+                emit(c)
+                i += 1
+            else:
+                emit(src[i:end])
+                i = end
+        else:
+            if c == "{":
+                depth += 1
+            elif c == "}":
+                depth -= 1
+            emit(c)
+            i += 1
+    return "".join(out).strip()
+
+
+_PROTECTED_RE = re.compile(r"(<(script|style|pre|textarea)\b[^>]*>)(.*?)(</\2\s*>)", re.S | re.I)
+_FONT_LINK_RE = re.compile(r'<link\s+href="(https://fonts\.googleapis\.com/[^"]+)"\s+rel="stylesheet"\s*/?>')
+
+
+def _collapse_html(fragment: str) -> str:
+    fragment = re.sub(r"<!--(?!\[if).*?-->", "", fragment, flags=re.S)
+    return re.sub(r"\s+", lambda m: "\n" if "\n" in m.group() else " ", fragment)
+
+
+def defer_font_stylesheets(html: str) -> str:
+    """Load Google Fonts CSS without blocking first paint (critical path)."""
+    def replace(m):
+        href = m.group(1)
+        return (
+            '<link rel="preconnect" href="https://fonts.gstatic.com" crossorigin/>'
+            f'<link href="{href}" rel="stylesheet" media="print" onload="this.media=\'all\'"/>'
+            f'<noscript><link href="{href}" rel="stylesheet"/></noscript>'
+        )
+    return _FONT_LINK_RE.sub(replace, html)
+
+
+def minify_html(html: str) -> str:
+    parts, pos = [], 0
+    for m in _PROTECTED_RE.finditer(html):
+        open_tag, tag, body, close = m.groups()
+        parts.append(_collapse_html(html[pos:m.start()]))
+        tag = tag.lower()
+        if tag == "style":
+            body = minify_css(body)
+        elif tag == "script" and "src=" not in open_tag.lower() and "json" not in open_tag.lower():
+            body = minify_js(body)
+        parts.append(_collapse_html(open_tag) + body + close)
+        pos = m.end()
+    parts.append(_collapse_html(html[pos:]))
+    return defer_font_stylesheets("".join(parts).strip()) + "\n"
+
+
+# --- images ------------------------------------------------------------------
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# chunks that affect how the image renders; everything else is metadata
+_PNG_KEEP = {b"IHDR", b"PLTE", b"tRNS", b"gAMA", b"cHRM", b"sRGB", b"iCCP", b"sBIT", b"IEND"}
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+
+def recompress_png(data: bytes) -> bytes:
+    """Lossless: strip metadata chunks and re-deflate the image data at level 9."""
+    if not data.startswith(_PNG_SIGNATURE):
+        return data
+    chunks, idat, pos = [], [], len(_PNG_SIGNATURE)
+    while pos < len(data):
+        (length,) = struct.unpack(">I", data[pos:pos + 4])
+        kind = data[pos + 4:pos + 8]
+        body = data[pos + 8:pos + 8 + length]
+        pos += 12 + length
+        if kind == b"IDAT":
+            if not idat:
+                chunks.append((b"IDAT", None))
+            idat.append(body)
+        elif kind in _PNG_KEEP:
+            chunks.append((kind, body))
+    pixels = zlib.compress(zlib.decompress(b"".join(idat)), 9)
+    out = [_PNG_SIGNATURE]
+    for kind, body in chunks:
+        out.append(_png_chunk(kind, pixels if kind == b"IDAT" else body))
+    return b"".join(out)
+
+
+def optimize_png(data: bytes, max_px: int) -> bytes:
+    try:
+        from PIL import Image
+    except ImportError:
+        return recompress_png(data)
+    image = Image.open(io.BytesIO(data))
+    if max(image.size) > max_px:
+        image.thumbnail((max_px, max_px), Image.LANCZOS)
+    buf = io.BytesIO()
+    image.save(buf, "PNG", optimize=True)
+    return buf.getvalue()
+
+
+# --- build -------------------------------------------------------------------
+
+def iter_assets(root: Path):
+    for dirpath, _, filenames in os.walk(root):
+        for name in sorted(filenames):
+            path = Path(dirpath) / name
+            if path.suffix in VARIANT_SUFFIXES:
+                continue
+            if path.suffix.lower() in COMPRESSIBLE:
+                yield path
+
+
+def iter_sources(root: Path = STATIC_DIR):
+    """Source files under static/, excluding build output and variants."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        if Path(dirpath) == root and DIST_DIR.name in dirnames:
+            dirnames.remove(DIST_DIR.name)
+        for name in sorted(filenames):
+            if not name.endswith(VARIANT_SUFFIXES):
+                yield Path(dirpath) / name
+
+
+def _hashed_name(rel: Path, data: bytes) -> Path:
+    digest = hashlib.sha256(data).hexdigest()[:10]
+    return rel.with_name(f"{rel.stem}.{digest}{rel.suffix}")
+
+
+def build_dist(max_image_px: int = 512) -> list:
+    """Minify/optimize every source asset into static/dist/ and write the manifest."""
+    if DIST_DIR.exists():
+        shutil.rmtree(DIST_DIR)
+    DIST_DIR.mkdir(parents=True)
+
+    sources = sorted(iter_sources(), key=lambda p: p.suffix == ".html")  # HTML last
+    manifest, results = {}, []
+    for path in sources:
+        rel = path.relative_to(STATIC_DIR)
+        raw = path.read_bytes()
+        suffix = path.suffix.lower()
+        if suffix == ".html":
+            text = minify_html(raw.decode("utf-8"))
+            # point references at the hashed copies built so far
+            for logical, built in manifest.items():
+                text = text.replace(f"/static/{logical}", f"/static/{built}")
+            built_bytes = text.encode("utf-8")
+        elif suffix == ".css":
+            built_bytes = minify_css(raw.decode("utf-8")).encode("utf-8")
+        elif suffix == ".js":
+            built_bytes = minify_js(raw.decode("utf-8")).encode("utf-8")
+        elif suffix == ".png":
+            built_bytes = optimize_png(raw, max_image_px)
+            if len(built_bytes) >= len(raw):
+                built_bytes = raw
+        else:
+            built_bytes = raw
+
+        target_rel = Path(DIST_DIR.name) / _hashed_name(rel, built_bytes)
+        target = STATIC_DIR / target_rel
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(built_bytes)
+        manifest[rel.as_posix()] = target_rel.as_posix()
+        results.append({"file": rel.as_posix(), "built": target_rel.as_posix(), "size": len(raw), "built_size": len(built_bytes)})
+
+    MANIFEST_FILE.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    return results
+
+
+def clean(root: Path) -> int:
+    removed = 0
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            if name.endswith(VARIANT_SUFFIXES):
+                (Path(dirpath) / name).unlink()
+                removed += 1
+    if DIST_DIR.exists():
+        shutil.rmtree(DIST_DIR)
+    return removed
+
+
+def build(root: Path = STATIC_DIR, max_image_px: int = 512) -> list:
+    results = build_dist(max_image_px)
+    compressed = {r["file"]: r for r in (compress_file(path) for path in iter_assets(root))}
+
+    print(f"{'asset':<40} {'original':>10} {'built':>10} {'gzip':>10} {'brotli':>10} {'saved':>7}")
+    for r in results:
+        variants = compressed.get(r["built"], {})
+        smallest = min([r["built_size"]] + [v for v in (variants.get("gzip"), variants.get("br")) if v])
+        saved = 100 * (1 - smallest / r["size"]) if r["size"] else 0
+        br = str(variants.get("br", 0)) if brotli is not None else "-"
+        print(f"{r['file']:<40} {r['size']:>10} {r['built_size']:>10} {variants.get('gzip', 0):>10} {br:>10} {saved:>6.1f}%")
+    total = sum(r["size"] for r in results)
+    total_built = sum(r["built_size"] for r in results)
+    print(f"\n📦 {len(results)} assets: {total} -> {total_built} bytes before transfer compression")
+    print(f"   manifest: {MANIFEST_FILE}")
+    if brotli is None:
+        print("⚠️  brotli not installed - only gzip variants were written (pip install brotli)")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clean", action="store_true", help="remove static/dist and generated .br/.gz files and exit")
+    parser.add_argument("--max-image-px", type=int, default=512, help="downscale PNGs above this size (needs Pillow)")
+    args = parser.parse_args()
+
+    if args.clean:
+        print(f"🧹 Removed build output and {clean(STATIC_DIR)} precompressed files")
+    else:
+        build(max_image_px=args.max_image_px)
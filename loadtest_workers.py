@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Worker scaling load test.
+
+Starts `serve.py` with 1, 2, 4 ... workers (up to the CPU count), drives
+POST /webhook with read-receipt payloads from many concurrent
+connections and reports requests/second per worker count and the scaling
+efficiency relative to a single worker.
+
+    python loadtest_workers.py
+    python loadtest_workers.py --workers 1 2 4 8 --duration 15 --concurrency 128
+
+Events carry no message text, so no replies are attempted and the run stays
+offline. Each run's servers get a fresh temporary DATA_DIR, so the webhook
+log, inbox and tokens they write never touch data/. Near-linear scaling
+means efficiency close to 100%.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def payload(i: int) -> dict:
+    # read receipts: logged and processed like any event, but never answered
+    return {
+        "object": "instagram",
+        "entry": [{
+            "id": "17841400000000000",
+            "time": int(time.time() * 1000),
+            "messaging": [{
+                "sender": {"id": f"loadtest-{i}"},
+                "recipient": {"id": "17841400000000000"},
+                "timestamp": int(time.time() * 1000),
+                "read": {"mid": f"loadtest-mid-{i}"},
+            }],
+        }],
+    }
+
+
+def wait_ready(base_url: str, timeout: float = 30) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{base_url}/webhook/status", timeout=1).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"server at {base_url} did not start")
+
+
+def headers(body: bytes) -> dict:
+    """Sign like Meta when the servers will check X-Hub-Signature-256."""
+    headers = {"Content-Type": "application/json"}
+    secret = os.getenv("FACEBOOK_APP_SECRET") or os.getenv("INSTAGRAM_CLIENT_SECRET")
+    if secret:
+        headers["X-Hub-Signature-256"] = "sha256=" + hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    return headers
+
+
+async def drive(base_url: str, duration: float, concurrency: int) -> tuple:
+    done = errors = 0
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=10) as client:
+        async def worker(n: int):
+            nonlocal done, errors
+            i = n
+            while time.perf_counter() < deadline:
+                try:
+                    body = json.dumps(payload(i)).encode()
+                    r = await client.post("/webhook", content=body, headers=headers(body))
+                    if r.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                done += 1
+                i += concurrency
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(n) for n in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return done, errors, elapsed
+
+
+def run(workers: int, duration: float, concurrency: int) -> dict:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    with tempfile.TemporaryDirectory(prefix="loadtest-data-") as data_dir:
+        env = dict(os.environ, ENABLE_STICKERS="0", DATA_DIR=data_dir)
+        proc = subprocess.Popen(
+            [sys.executable, "serve.py", "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+            cwd=HERE,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_ready(base_url)
+            done, errors, elapsed = asyncio.run(drive(base_url, duration, concurrency))
+        finally:
+            proc.terminate()
+            proc.wait(timeout=30)
+    return {"workers": workers, "requests": done, "errors": errors, "rps": done / elapsed}
+
+
+def main() -> int:
+    cpus = os.cpu_count() or 1
+    default_counts = [n for n in (1, 2, 4, 8, 16) if n <= cpus] or [1]
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=default_counts)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per run")
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    print(f"🧪 Load testing POST /webhook on {cpus} CPU(s): workers={args.workers}, {args.duration:.0f}s each, concurrency {args.concurrency}")
+    if max(args.workers) > cpus:
+        print(f"⚠️  More workers than CPUs ({cpus}); scaling will flatten past {cpus}")
+
+    results = [run(n, args.duration, args.concurrency) for n in args.workers]
+    base = results[0]["rps"] / results[0]["workers"]
+
+    print(f"\n{'workers':>7}  {'req/s':>9}  {'errors':>6}  {'speedup':>7}  {'efficiency':>10}")
+    for r in results:
+        speedup = r["rps"] / results[0]["rps"]
+        efficiency = r["rps"] / (base * r["workers"]) * 100
+        print(f"{r['workers']:>7}  {r['rps']:>9.0f}  {r['errors']:>6}  {speedup:>6.2f}x  {efficiency:>9.0f}%")
+
+    return 1 if any(r["errors"] for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
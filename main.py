@@ -13,49 +13,106 @@ if os.path.exists('.env'):
 		# python-dotenv isn't installed locally; that's okay for production
 		pass
 
-from routes.web import router as web_router
-from routes.api import router as api_router
-from routes.stickers import router as stickers_router
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from contextlib import asynccontextmanager
+
+from routes.web import prerender_pages, router as web_router
+from utils.static import PrecompressedStaticFiles, static_page
+
+
+def feature_enabled(name: str, default: bool = True) -> bool:
+    """ENABLE_<NAME>=0/1 switches an optional subsystem off or on."""
+    value = os.getenv(f"ENABLE_{name}")
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Optional subsystems. Each one is only imported when enabled, so a cold start
+# doesn't pay for SDKs the deployment never uses.
+INSTAGRAM_ENABLED = feature_enabled("INSTAGRAM")
+STATIC_SITES_ENABLED = feature_enabled("STATIC_SITES")
+# stickers need Supabase credentials; without them the router stays off
+STICKERS_ENABLED = feature_enabled("STICKERS", default=bool(os.getenv("SUPABASE_URL")))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if INSTAGRAM_ENABLED:
+        from routes.api import drain_reply_tasks, get_reply_outbox
+        from utils.conversations import conversations
+        from utils.forwarding import forwarder as webhook_forwarder
+        from utils.reply_providers import generator as reply_generator
+        from utils.token_refresh import scheduler as token_scheduler
+
+        reply_outbox = get_reply_outbox()
+
+        # keep stored long-lived tokens checked and refreshed in the background
+        token_scheduler.start()
+        # retry queued replies and replay any a previous process left unsent
+        reply_outbox.start()
+        # restore per-conversation reply state and snapshot it periodically
+        conversations.start()
+        # relay accepted webhooks to WEBHOOK_FORWARD_TARGETS
+        webhook_forwarder.start()
+    # render the template-only pages once instead of on every request
+    prerender_pages()
+    yield
+    if INSTAGRAM_ENABLED:
+        from utils.graph import close_http_client
+
+        # finish replies that are mid-generation before tearing things down
+        await drain_reply_tasks()
+        await reply_generator.close()
+        await reply_outbox.stop()
+        await webhook_forwarder.stop()
+        await conversations.stop()
+        await token_scheduler.stop()
+        # release pooled Graph API connections
+        await close_http_client()
+
+
+app = FastAPI(lifespan=lifespan)
 
+# include routers
+if INSTAGRAM_ENABLED:
+    from routes.api import router as api_router
 
-app = FastAPI()
+    app.include_router(api_router)
+if STICKERS_ENABLED:
+    from routes.stickers import router as stickers_router
 
-# include routers
-app.include_router(api_router)
-app.include_router(stickers_router)
+    app.include_router(stickers_router)
 app.include_router(web_router)
 
 
-@app.get("/infinity-estate/stickers")
-async def sticker_form():
-    return FileResponse("static/infinity/sticker_form.html")
-
+# Fixed HTML pages served outside /static. They go through the same layer as
+# /static (precompressed variants, ETag/304), see utils/static.py.
+STATIC_PAGES = {
+    "/infinity-estate/stickers": "static/infinity/sticker_form.html",
+    "/infinity-estate/stickers/admin": "static/infinity/sticker_admin.html",
+    "/accesscodeng/privacy": "static/AccesscodeNG/privacy.html",
+    "/accesscodeng/support": "static/AccesscodeNG/support.html",
+    "/flutter/privacy.html": "static/flutter/privacy.html",
+    "/flutter/support.html": "static/flutter/support.html",
+    "/AccesscodeNG/privacy.html": "static/AccesscodeNG/privacy.html",
+}
 
-@app.get("/infinity-estate/stickers/admin")
-async def sticker_admin():
-    return FileResponse("static/infinity/sticker_admin.html")
+if STATIC_SITES_ENABLED:
+    for url_path, file_path in STATIC_PAGES.items():
+        app.add_api_route(url_path, static_page(file_path), methods=["GET"], include_in_schema=False)
 
 # Serve static assets from /static
-app.mount("/static", StaticFiles(directory="static"), name="static")
-
-@app.get("/accesscodeng/privacy")
-async def accesscodeng_privacy_clean():
-    return FileResponse("static/AccesscodeNG/privacy.html")
-
-@app.get("/accesscodeng/support")
-async def accesscodeng_support():
-    return FileResponse("static/AccesscodeNG/support.html")
+app.mount("/static", PrecompressedStaticFiles(directory="static"), name="static")
 
-@app.get("/flutter/privacy.html")
-async def flutter_privacy():
-    return FileResponse("static/flutter/privacy.html")
+# Opt-in request profiling (PROFILE_REQUESTS=1 + PROFILE_SECRET). When disabled
+# nothing is imported or installed, so regular requests are untouched.
+from utils.profiling import profiling_enabled
 
-@app.get("/flutter/support.html")
-async def flutter_support():
-    return FileResponse("static/flutter/support.html")
+if profiling_enabled():
+    from utils.profiling import RequestProfilerMiddleware, instrument_sync_endpoints
+    from routes.profiles import router as profiles_router
 
-@app.get("/AccesscodeNG/privacy.html")
-async def accesscodeng_privacy():
-    return FileResponse("static/AccesscodeNG/privacy.html")
\ No newline at end of file
+    app.include_router(profiles_router)
+    instrument_sync_endpoints(app)
+    app.add_middleware(RequestProfilerMiddleware)
+    print("🧪 Request profiling enabled - see /debug/profiles")
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Replay archived webhook events through the reply pipeline.
+
+Events from data/webhook.log (or .jsonl.gz segments written by
+seed_webhook_logs.py) go through the same handler as POST /webhook, in
+process and without HTTP. Sends are always dry runs, and the data files the
+pipeline writes (inbox/outbox, conversations, logs) live in a temp dir, so
+a replay never touches data/ or messages anyone.
+
+    python replay_webhooks.py                                   # data/webhook.log, max speed
+    python replay_webhooks.py --speed 60                        # 60x the original pace
+    python replay_webhooks.py --rules candidate_rules.json      # try new reply rules
+    python replay_webhooks.py data/archive --expected data/archive --limit 100000
+    python replay_webhooks.py --save before.jsonl               # keep this run's replies...
+    python replay_webhooks.py --rules new.json --expected before.jsonl   # ...and diff against them
+
+Generated replies are compared with the recorded ones (data/auto_replies.log
+by default), matched on sender and incoming message. Conversation throttling
+runs on the archived timestamps, so it decides the same way at any speed.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import datetime
+import gzip
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Iterator, Optional
+
+ROOT = Path(__file__).resolve().parent
+DATA_DIR = ROOT / "data"
+
+
+def log_files(paths: list, prefix: str) -> list:
+    """Files to read, in order: plain files as given, directories expanded to their log segments."""
+    files = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            files.extend(sorted(path.glob(f"{prefix}*.log")) + sorted(path.glob(f"{prefix}*.jsonl.gz")))
+        else:
+            files.append(path)
+    return files
+
+
+def read_lines(files: list) -> Iterator[dict]:
+    for path in files:
+        opener = gzip.open if path.suffix == ".gz" else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def event_time(message_event: dict, logged_at: Optional[str]) -> float:
+    """When Meta sent the event, in epoch seconds; falls back to when it was logged."""
+    ts = message_event.get("timestamp")
+    if isinstance(ts, (int, float)) and ts > 0:
+        # Meta sends milliseconds; hand-written samples often use seconds
+        return ts / 1000 if ts > 1e11 else float(ts)
+    if logged_at:
+        try:
+            return datetime.datetime.fromisoformat(logged_at.replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            pass
+    return time.time()
+
+
+def archived_events(files: list, limit: Optional[int]) -> Iterator[tuple]:
+    """Yield (event time, messaging event, entry id) from webhook_received log lines."""
+    from routes.api import messaging_events
+
+    count = 0
+    for line in read_lines(files):
+        if line.get("event") != "webhook_received" or not isinstance(line.get("data"), dict):
+            continue
+        for message_event, entry_id in messaging_events(line["data"]):
+            if limit is not None and count >= limit:
+                return
+            count += 1
+            yield event_time(message_event, line.get("timestamp")), message_event, entry_id
+
+
+def replies_by_message(files: list) -> dict:
+    """(sender id, incoming message) -> reply texts, from auto_replies log lines.
+
+    Each outbox item is logged again when its state changes; only its latest
+    line counts.
+    """
+    latest = {}
+    for n, line in enumerate(read_lines(files)):
+        if "auto_reply" not in line:
+            continue
+        latest[line.get("outbox_id") or f"line-{n}"] = line
+    grouped = {}
+    for line in latest.values():
+        key = (line.get("sender_id"), line.get("incoming_message"))
+        grouped.setdefault(key, []).append(line["auto_reply"])
+    return grouped
+
+
+def diff_replies(expected: dict, actual: dict) -> dict:
+    diff = {"same": 0, "changed": [], "new": [], "dropped": []}
+    for key in sorted(set(expected) | set(actual), key=lambda k: (str(k[0]), str(k[1]))):
+        before, after = expected.get(key), actual.get(key)
+        entry = {"sender_id": key[0], "incoming_message": key[1], "before": before, "after": after}
+        if before == after:
+            diff["same"] += 1
+        elif before and after:
+            diff["changed"].append(entry)
+        elif after:
+            diff["new"].append(entry)
+        else:
+            diff["dropped"].append(entry)
+    return diff
+
+
+class ReplayClock:
+    """Archived time for the conversation store, so throttling matches the original traffic."""
+
+    def __init__(self):
+        self.now = time.time()
+
+    def __call__(self) -> float:
+        return self.now
+
+
+async def replay(events: Iterator[tuple], speed: float, concurrency: int, verbose: bool) -> dict:
+    from benchmarks.harness import quiet, summarize
+    from routes import api
+    from utils.conversations import conversations
+    from utils.reply_providers import generator as reply_generator
+
+    clock = ReplayClock()
+    conversations.clock = clock
+    api.REPLY_DRY_RUN = True
+
+    slots = asyncio.Semaphore(concurrency)
+    latencies, errors = [], []
+    tasks = set()
+    first_event, start = None, time.perf_counter()
+
+    async def handle(ts: float, message_event: dict, entry_id: Optional[str]) -> None:
+        began = time.perf_counter()
+        try:
+            # the mid is claimed as POST /webhook does, and the handler claims
+            # throttling before its first await, so the clock set here is what
+            # both see
+            clock.now = ts
+            for inbox_id, event, entry in await asyncio.to_thread(api.accept_events, [(message_event, entry_id)]):
+                await api.handle_message_event(event, entry, inbox_id)
+            latencies.append(time.perf_counter() - began)
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+        finally:
+            slots.release()
+
+    output = contextlib.nullcontext() if verbose else quiet()
+    with output:
+        for ts, message_event, entry_id in events:
+            if speed > 0:
+                first_event = ts if first_event is None else first_event
+                wait = (ts - first_event) / speed - (time.perf_counter() - start)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+            await slots.acquire()
+            task = asyncio.create_task(handle(ts, message_event, entry_id))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+        await reply_generator.close()
+
+    wall = time.perf_counter() - start
+    return {
+        "events": len(latencies) + len(errors),
+        "errors": len(errors),
+        "first_errors": errors[:5],
+        "wall_s": round(wall, 3),
+        "events_per_second": round((len(latencies) + len(errors)) / wall, 1) if wall else None,
+        "latency": summarize(latencies) if latencies else None,
+    }
+
+
+def print_diff(diff: dict, show: int) -> None:
+    changed, new, dropped = diff["changed"], diff["new"], diff["dropped"]
+    print(f"\n🔍 Replies: {diff['same']} unchanged, {len(changed)} changed, {len(new)} new, {len(dropped)} dropped")
+    for title, entries in (("changed", changed), ("new", new), ("dropped", dropped)):
+        for entry in entries[:show]:
+            print(f"\n   [{title}] {entry['sender_id']}: {entry['incoming_message']!r}")
+            for reply in entry["before"] or []:
+                print(f"     - {reply}")
+            for reply in entry["after"] or []:
+                print(f"     + {reply}")
+        if len(entries) > show:
+            print(f"\n   ... {len(entries) - show} more {title}")
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay archived webhook events through the reply pipeline (dry run)")
+    parser.add_argument("inputs", nargs="*", default=[str(DATA_DIR / "webhook.log")], help="webhook logs or directories of segments")
+    parser.add_argument("--expected", nargs="+", help="recorded replies to diff against (default: auto_replies logs next to the inputs)")
+    parser.add_argument("--speed", type=float, default=0, help="multiple of the original pace (0 = as fast as possible)")
+    parser.add_argument("--concurrency", type=int, default=100, help="events in flight at once")
+    parser.add_argument("--limit", type=int, help="replay at most this many messaging events")
+    parser.add_argument("--rules", help="reply rules file to use instead of REPLY_RULES_FILE / reply_rules.json")
+    parser.add_argument("--provider", help="reply provider to use instead of REPLY_PROVIDER")
+    parser.add_argument("--save", type=Path, help="write this run's replies as an auto_replies log")
+    parser.add_argument("--report", type=Path, help="write throughput and the full diff as JSON")
+    parser.add_argument("--show", type=int, default=10, help="diff entries printed per category")
+    parser.add_argument("--verbose", action="store_true", help="show the handler's own output")
+    args = parser.parse_args(argv)
+
+    # read at import time by the modules below
+    if args.rules:
+        os.environ["REPLY_RULES_FILE"] = str(Path(args.rules).resolve())
+    if args.provider:
+        os.environ["REPLY_PROVIDER"] = args.provider
+    os.environ["REPLY_DRY_RUN"] = "1"
+    os.environ.pop("WEBHOOK_FORWARD_TARGETS", None)
+    sys.path.insert(0, str(ROOT))
+
+    from benchmarks.harness import isolate_data
+    from routes import api
+
+    inputs = log_files(args.inputs, "webhook")
+    missing = [str(p) for p in inputs if not p.exists()]
+    if not inputs or missing:
+        print(f"❌ Nothing to replay: {', '.join(missing) or 'no webhook logs found'}")
+        return 1
+    expected_paths = args.expected or [
+        str(p) if Path(p).is_dir() else str(Path(p).with_name(Path(p).name.replace("webhook", "auto_replies", 1)))
+        for p in args.inputs
+    ]
+    expected_files = [p for p in log_files(expected_paths, "auto_replies") if p.exists()]
+
+    print(f"🔁 Replaying {', '.join(map(str, inputs))}")
+    print(f"   speed: {'max' if args.speed <= 0 else f'{args.speed:g}x'}, provider: {os.getenv('REPLY_PROVIDER', 'rules')}, sends: dry run")
+
+    with tempfile.TemporaryDirectory(prefix="replay-") as tmp:
+        isolate_data(Path(tmp))
+        stats = asyncio.run(replay(archived_events(inputs, args.limit), args.speed, args.concurrency, args.verbose))
+        replay_log = api.log_tails["replies"].path
+        actual = replies_by_message([replay_log]) if replay_log.exists() else {}
+        if args.save:
+            args.save.parent.mkdir(parents=True, exist_ok=True)
+            if replay_log.exists():
+                shutil.copyfile(replay_log, args.save)
+            else:
+                args.save.write_text("", encoding="utf-8")
+
+    replies = sum(len(texts) for texts in actual.values())
+    print(f"\n⚡ {stats['events']} events in {stats['wall_s']:.2f}s ({stats['events_per_second'] or 0:.1f}/s), "
+          f"{replies} reply segments, {stats['errors']} errors")
+    if stats["latency"]:
+        lat = stats["latency"]
+        print(f"   per event: p50 {lat['p50_ms']:.2f}ms, p95 {lat['p95_ms']:.2f}ms, p99 {lat['p99_ms']:.2f}ms")
+    for error in stats["first_errors"]:
+        print(f"   ❌ {error}")
+
+    diff = None
+    if expected_files:
+        diff = diff_replies(replies_by_message(expected_files), actual)
+        print(f"\n📂 Compared with {', '.join(map(str, expected_files))}")
+        print_diff(diff, args.show)
+    else:
+        print("\n📂 No recorded replies to compare with (see --expected)")
+    if args.save:
+        print(f"\n💾 Replies written to {args.save}")
+
+    if args.report:
+        args.report.parent.mkdir(parents=True, exist_ok=True)
+        args.report.write_text(json.dumps({"stats": stats, "replies": replies, "diff": diff}, indent=2), encoding="utf-8")
+        print(f"💾 Report written to {args.report}")
+    return 1 if stats["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
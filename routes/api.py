@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Request, HTTPException
-from fastapi.responses import JSONResponse, RedirectResponse, PlainTextResponse
+from fastapi.responses import JSONResponse, RedirectResponse, PlainTextResponse, StreamingResponse
 """
 FastAPI routes for Instagram Business integration and webhook messaging.
 
@@ -8,7 +8,7 @@ This module provides a complete Instagram Business integration demo for Meta app
 1. OAuth Flow:
    - /auth/instagram - Initiate Instagram Business OAuth
    - /auth/callback - Handle OAuth callback and token exchange
-   - /instagram/profile - Fetch connected account profile
+   - /instagram/profile - Fetch every connected account profile (a list)
    - /instagram/disconnect - Disconnect account with CSRF protection
 
 2. Webhook Messaging (for Meta app review):
@@ -36,14 +36,78 @@ For Meta app review:
 """
 
 import os
-import httpx
-from storage import save_token, load_token, clear_token
+import asyncio
+import hashlib
+import hmac
+import sqlite3
+import time
+from storage import (
+    STORE_PATH,
+    create_session,
+    default_account,
+    delete_account,
+    delete_session,
+    get_session_account,
+    save_account,
+)
+from utils.cache import TTLCache
+from utils.conversations import conversations
+from utils.filelock import append_line
+from utils.log_tail import LogTail
+from utils.graph import GRAPH_URL, app_secret, get_http_client
+# httpx, the outbox, forwarder, reply providers/rules, page tokens and the
+# token scheduler are imported by the handlers that use them, so importing
+# this router (and answering Meta's GET /webhook handshake) doesn't pay for them
 import json
 import datetime
-from pathlib import Path
+from typing import Optional
 
 router = APIRouter()
 
+# REPLY_DRY_RUN=1 runs the whole reply path but never calls the Send API;
+# replies are recorded as logged_only (used by replay_webhooks.py)
+REPLY_DRY_RUN = os.getenv("REPLY_DRY_RUN", "").lower() in ("1", "true", "yes")
+
+# JSONL logs written by the webhook handlers, for /webhook/logs and /webhook/stream
+DATA_DIR = STORE_PATH
+log_tails = {
+    "events": LogTail(DATA_DIR / "webhook.log"),
+    "replies": LogTail(DATA_DIR / "auto_replies.log"),
+}
+
+# Profiles fetched after login (or on first /instagram/profile call), keyed by
+# access token so the homepage doesn't wait on Graph for every page load.
+PROFILE_CACHE_TTL = int(os.getenv("PROFILE_CACHE_TTL", "300"))
+_profile_cache = TTLCache(ttl=PROFILE_CACHE_TTL)
+# In-flight warm-ups, so a profile request arriving mid-fetch awaits it
+# instead of issuing the same Graph calls again.
+_profile_warmups = {}
+
+# Browser session -> connected account (see storage.py)
+SESSION_COOKIE = "grace_session"
+SESSION_MAX_AGE = 60 * 24 * 3600
+
+
+def current_account(request: Request, fallback: bool = True):
+    """Return the stored account for this browser session, if any.
+
+    Without a session cookie, read-only routes (`fallback`) get the default
+    stored account: the only one, or the imported ``legacy`` token. Routes
+    that change or delete an account pass fallback=False and need a session.
+    """
+    session_id = request.cookies.get(SESSION_COOKIE)
+    if not session_id:
+        return default_account() if fallback else None
+    return get_session_account(session_id)
+
+
+def resolve_token(request: Request):
+    """Access token for this session (or the default account), falling back to INSTAGRAM_ACCESS_TOKEN."""
+    account = current_account(request)
+    if account:
+        return account["access_token"]
+    return os.getenv('INSTAGRAM_ACCESS_TOKEN')
+
 
 async def revoke_permissions_and_audit(token: str):
     """Revoke Graph API permissions for a token and append an audit entry.
@@ -53,9 +117,8 @@ async def revoke_permissions_and_audit(token: str):
     revoked = False
     response_body = None
     try:
-        url = "https://graph.facebook.com/v23.0/me/permissions"
-        async with httpx.AsyncClient(timeout=10) as client:
-            r = await client.delete(url, params={"access_token": token})
+        url = f"{GRAPH_URL}/me/permissions"
+        r = await get_http_client().delete(url, params={"access_token": token})
         try:
             response_body = r.json()
         except Exception:
@@ -69,17 +132,15 @@ async def revoke_permissions_and_audit(token: str):
 
     # Append audit to file (best-effort)
     try:
-        audit_dir = Path(__file__).resolve().parent.parent / "data"
-        audit_dir.mkdir(parents=True, exist_ok=True)
-        audit_path = audit_dir / "revoke.log"
+        DATA_DIR.mkdir(parents=True, exist_ok=True)
+        audit_path = DATA_DIR / "revoke.log"
         log = {
             "ts": datetime.datetime.utcnow().isoformat() + "Z",
             "action": "revoke_permissions",
             "revoked": revoked,
             "response": response_body,
         }
-        with audit_path.open("a", encoding="utf-8") as f:
-            f.write(json.dumps(log) + "\n")
+        append_line(audit_path, json.dumps(log))
     except Exception as e:
         print(f"Failed to write revoke audit log: {e}")
 
@@ -93,7 +154,8 @@ async def auth_callback(request: Request):
     Steps:
     1. Exchange code -> short-lived token at Facebook Graph.
     2. Exchange short-lived -> long-lived token (fb_exchange_token).
-    3. Persist long-lived token and redirect to `/`.
+    3. Look up the Facebook user id, persist the token for that account and
+       bind it to a session cookie, then redirect to `/`.
     """
     params = dict(request.query_params)
     print("Auth callback params:", params)
@@ -115,8 +177,10 @@ async def auth_callback(request: Request):
     if not (client_id and client_secret and redirect_uri):
         return JSONResponse({"error": "oauth_not_configured"}, status_code=500)
 
+    client = get_http_client()
+
     # 1) Exchange authorization code for a short-lived token
-    short_lived_url = "https://graph.facebook.com/v23.0/oauth/access_token"
+    short_lived_url = f"{GRAPH_URL}/oauth/access_token"
     params_exchange = {
         "client_id": client_id,
         "redirect_uri": redirect_uri,
@@ -124,8 +188,7 @@ async def auth_callback(request: Request):
         "code": code,
     }
 
-    async with httpx.AsyncClient(timeout=10) as client:
-        r = await client.get(short_lived_url, params=params_exchange)
+    r = await client.get(short_lived_url, params=params_exchange)
     print(f"Short-lived exchange status: {r.status_code} body: {getattr(r, 'text', None)}")
 
     if r.status_code != 200:
@@ -140,7 +203,7 @@ async def auth_callback(request: Request):
         return JSONResponse({"error": "no_access_token_in_response", "body": body}, status_code=500)
 
     # 2) Exchange the short-lived token for a long-lived token
-    long_lived_url = "https://graph.facebook.com/v23.0/oauth/access_token"
+    long_lived_url = f"{GRAPH_URL}/oauth/access_token"
     exchange_params = {
         "grant_type": "fb_exchange_token",
         "client_id": client_id,
@@ -148,8 +211,7 @@ async def auth_callback(request: Request):
         "fb_exchange_token": short_lived,
     }
 
-    async with httpx.AsyncClient(timeout=10) as client:
-        r2 = await client.get(long_lived_url, params=exchange_params)
+    r2 = await client.get(long_lived_url, params=exchange_params)
     print(f"Long-lived exchange status: {r2.status_code} body: {getattr(r2, 'text', None)}")
 
     if r2.status_code != 200:
@@ -163,11 +225,31 @@ async def auth_callback(request: Request):
     if not long_lived:
         return JSONResponse({"error": "no_long_lived_token", "body": body2}, status_code=500)
 
-    # persist token for reviewer/demo flow
-    save_token(long_lived)
+    # 3) Identify the user so each connected business gets its own record
+    r3 = await client.get(f"{GRAPH_URL}/me", params={"fields": "id", "access_token": long_lived})
+    account_id = r3.json().get("id") if r3.status_code == 200 else None
+    if not account_id:
+        return JSONResponse({"error": "account_lookup_failed", "status_code": r3.status_code}, status_code=500)
+
+    expires_in = body2.get("expires_in")
+    account = save_account(account_id, long_lived, expires_at=time.time() + expires_in if expires_in else None)
+    # record scopes/expiry from debug_token in the background
+    from utils.token_refresh import scheduler as token_scheduler
+
+    token_scheduler.schedule_check(account)
+
+    old_session = request.cookies.get(SESSION_COOKIE)
+    if old_session:
+        delete_session(old_session)
+    session_id = create_session(account_id)
+
+    # Start fetching the profile now; the homepage we redirect to asks for it
+    # straight away and will pick up the cached (or in-flight) result.
+    start_profile_warmup(long_lived, account_id)
 
     # redirect reviewer back to the homepage where frontend will call /instagram/profile
     response = RedirectResponse(url="/")
+    response.set_cookie(SESSION_COOKIE, session_id, max_age=SESSION_MAX_AGE, httponly=True, secure=True, samesite="lax")
     # clear the state cookie now that the flow is complete
     response.delete_cookie("oauth_state")
     return response
@@ -192,75 +274,141 @@ async def deauthorize():
     return {"message": "ok"}
 
 
+# IG fields read for each connected account; expanded inline on the pages
+# query, so every profile arrives with its page
+PROFILE_FIELDS = "id,username,profile_picture_url"
+
+
+async def fetch_instagram_profiles(token: str):
+    """Resolve every Instagram Business profile connected to `token`'s pages.
+
+    One /me/accounts call per page of results, with the IG account expanded in
+    place. Returns (status_code, body) so callers can either serve or cache
+    it; on success the body is a list of profiles.
+    """
+    client = get_http_client()
+
+    url = f"{GRAPH_URL}/me/accounts"
+    params = {
+        "fields": f"id,name,instagram_business_account{{{PROFILE_FIELDS}}}",
+        "limit": 100,
+        "access_token": token,
+    }
+    profiles, pages = [], []
+    while url:
+        r = await client.get(url, params=params)
+        if r.status_code != 200:
+            if profiles:
+                # keep what the earlier pages returned rather than failing the login
+                print(f"Page listing stopped after {len(pages)} pages: {r.status_code} {r.text}")
+                break
+            # Return the upstream error to help debugging
+            try:
+                detail = r.json()
+            except Exception:
+                detail = {"error": "accounts_fetch_failed", "status_code": r.status_code}
+            return 400, {"detail": detail}
+
+        body = r.json()
+        for page in body.get("data", []):
+            pages.append(page)
+            ig = page.get("instagram_business_account")
+            if ig and ig.get("id"):
+                profiles.append({**ig, "page_id": page.get("id"), "page_name": page.get("name")})
+        # the `next` link already carries every query parameter
+        url = body.get("paging", {}).get("next")
+        params = None
+
+    if profiles:
+        print(f"Found {len(profiles)} Instagram profile(s) across {len(pages)} page(s)")
+        return 200, profiles
+
+    # Fallback: try direct /me fields (may work for non-business IG tokens)
+    fallback_url = f"{GRAPH_URL}/me"
+    params_fallback = {"fields": PROFILE_FIELDS, "access_token": token}
+    r = await client.get(fallback_url, params=params_fallback)
+    print(f"Fallback /me fetch status: {r.status_code} body: {r.text}")
+    if r.status_code == 200:
+        return 200, [r.json()]
+
+    # No IG account found; return helpful debug info
+    return 400, {"detail": {
+        "error": "no_instagram_business_account_found",
+        "pages": pages,
+    }}
+
+
+async def warm_profile_cache(token: str, account_id: Optional[str] = None):
+    """Fetch the profile for `token` and cache successful results.
+
+    When `account_id` is given the Instagram account id is recorded on the
+    stored account as well.
+    """
+    import httpx
+
+    try:
+        status_code, body = await fetch_instagram_profiles(token)
+    except httpx.HTTPError as e:
+        print(f"Profile warm-up failed: {e}")
+        return None
+    finally:
+        _profile_warmups.pop(token, None)
+    if status_code == 200:
+        _profile_cache.set(token, body)
+        if account_id and body and body[0].get("id"):
+            save_account(account_id, ig_id=body[0]["id"])
+    return status_code, body
+
+
+def start_profile_warmup(token: str, account_id: Optional[str] = None) -> None:
+    if token in _profile_warmups or token in _profile_cache:
+        return
+    _profile_warmups[token] = asyncio.create_task(warm_profile_cache(token, account_id))
+
+
+def forget_profile(token: str) -> None:
+    _profile_cache.pop(token)
+    task = _profile_warmups.pop(token, None)
+    if task is not None:
+        task.cancel()
+
+
 @router.get("/instagram/profile")
-def get_instagram_profile():
-    # Load token from storage first, fall back to env var
-    token = load_token() or os.getenv('INSTAGRAM_ACCESS_TOKEN')
+async def get_instagram_profile(request: Request):
+    """Instagram profiles connected to this session's pages, as a list."""
+    # Token for this browser session, falling back to the env var
+    token = resolve_token(request)
     print(f"Loaded token present: {bool(token)}")
     if not token:
         raise HTTPException(status_code=401, detail="No access token configured")
-    # Strategy:
-    # 1) Call /me/accounts?fields=instagram_business_account to find any connected
-    #    Instagram Business accounts via the user's Pages.
-    # 2) If found, fetch the Instagram account by id with the desired fields.
-    # 3) Fall back to a direct /me fields call as a last resort.
-
-    pages_url = "https://graph.facebook.com/v23.0/me/accounts"
-    params_pages = {"fields": "instagram_business_account", "access_token": token}
-    r = httpx.get(pages_url, params=params_pages, timeout=10)
-    if r.status_code != 200:
-        # Return the upstream error to help debugging
-        try:
-            detail = r.json()
-        except Exception:
-            detail = {"error": "accounts_fetch_failed", "status_code": r.status_code}
-        raise HTTPException(status_code=400, detail=detail)
-
-    pages_body = r.json()
-    for page in pages_body.get("data", []):
-        ig = page.get("instagram_business_account")
-        if ig and ig.get("id"):
-            ig_id = ig["id"]
-            profile_url = f"https://graph.facebook.com/v23.0/{ig_id}"
-            # account_type is not available on IGUser nodes in some API versions;
-            # avoid requesting it to prevent (#100) errors. Request the common
-            # fields that are usually present on IGUser nodes.
-            params_profile = {"fields": "id,username,profile_picture_url", "access_token": token}
-            r2 = httpx.get(profile_url, params=params_profile, timeout=10)
-            print(f"Profile fetch {profile_url} status: {r2.status_code} body: {r2.text}")
-            if r2.status_code != 200:
-                try:
-                    return JSONResponse(r2.json(), status_code=r2.status_code)
-                except Exception:
-                    raise HTTPException(status_code=400, detail={"error": "instagram_profile_fetch_failed", "status_code": r2.status_code})
-            return JSONResponse(r2.json())
 
-    # Fallback: try direct /me fields (may work for non-business IG tokens)
-    fallback_url = "https://graph.facebook.com/v23.0/me"
-    params_fallback = {"fields": "id,username,profile_picture_url", "access_token": token}
-    r3 = httpx.get(fallback_url, params=params_fallback, timeout=10)
-    print(f"Fallback /me fetch status: {r3.status_code} body: {r3.text}")
-    if r3.status_code == 200:
-        return JSONResponse(r3.json())
+    cached = _profile_cache.get(token)
+    if cached is not None:
+        return JSONResponse(cached)
 
-    # No IG account found; return helpful debug info
-    raise HTTPException(status_code=400, detail={
-        "error": "no_instagram_business_account_found",
-        "pages": pages_body.get("data", []),
-    })
+    pending = _profile_warmups.get(token)
+    result = await asyncio.shield(pending) if pending is not None else None
+    if result is None:
+        result = await warm_profile_cache(token)
+    if result is None:
+        raise HTTPException(status_code=502, detail={"error": "graph_unreachable"})
+    status_code, body = result
+    return JSONResponse(body, status_code=status_code)
 
 
 @router.get("/token")
-def view_token():
-    """Return whether a token is stored (for testing only)."""
-    token = load_token()
-    return {"stored": bool(token)}
+def view_token(request: Request):
+    """Return whether a token is stored for this session (for testing only)."""
+    return {"stored": bool(current_account(request))}
 
 
 @router.delete("/token")
-def delete_token():
-    """Clear stored token (testing/admin)."""
-    clear_token()
+def delete_token(request: Request):
+    """Clear the stored token for this session (testing/admin)."""
+    account = current_account(request, fallback=False)
+    if account:
+        forget_profile(account["access_token"])
+        delete_account(account["account_id"])
     return {"cleared": True}
 
 
@@ -279,7 +427,9 @@ async def instagram_disconnect(request: Request):
     if not cookie_csrf or not header_csrf or cookie_csrf != header_csrf:
         return JSONResponse({"error": "invalid_csrf"}, status_code=403)
 
-    token = load_token() or os.getenv('INSTAGRAM_ACCESS_TOKEN')
+    # only the session's own account: never revoke on behalf of a default one
+    account = current_account(request, fallback=False)
+    token = account["access_token"] if account else None
     if not token:
         return JSONResponse({"error": "no_token"}, status_code=400)
 
@@ -287,20 +437,25 @@ async def instagram_disconnect(request: Request):
     revoked, response_body = await revoke_permissions_and_audit(token)
 
     # Clear local token either way so UI returns to neutral state
-    clear_token()
+    forget_profile(token)
+    if account:
+        delete_account(account["account_id"])
 
-    return JSONResponse({"revoked": revoked, "response": response_body})
+    response = JSONResponse({"revoked": revoked, "response": response_body})
+    response.delete_cookie(SESSION_COOKIE)
+    return response
 
 
 @router.get("/token/content")
-def token_content(raw: bool = False):
+def token_content(request: Request, raw: bool = False):
     """Return the stored token in masked form.
 
     By default this returns a masked token to avoid accidental leakage.
     To retrieve the raw token set the environment variable `ALLOW_TOKEN_INSPECT=1`
     and call with `?raw=1` (only for local debugging).
     """
-    token = load_token()
+    account = current_account(request)
+    token = account["access_token"] if account else None
     if not token:
         return JSONResponse({"token_present": False}, status_code=404)
 
@@ -354,14 +509,18 @@ def debug_oauth():
 
 
 @router.get("/token/inspect")
-def inspect_token():
-    """Inspect the stored access token using Facebook's debug_token endpoint.
+async def inspect_token(request: Request):
+    """Return the debug_token result for the session's access token.
 
-    Returns the debug_token payload. Requires INSTAGRAM_CLIENT_SECRET to be set
-    so we can build an app access token (app_id|app_secret).
+    debug_token itself runs in the background token scheduler
+    (utils/token_refresh.py); this only reads the state it recorded. A token
+    that hasn't been checked yet gets a check queued and a 202 response.
+    Requires INSTAGRAM_CLIENT_SECRET so an app access token can be built.
     """
-    token = load_token() or os.getenv('INSTAGRAM_ACCESS_TOKEN')
-    if not token:
+    from utils.token_refresh import env_account, get_token_state, scheduler as token_scheduler
+
+    account = current_account(request) or env_account()
+    if not account:
         return JSONResponse({"error": "no_token"}, status_code=400)
 
     app_id = os.getenv("FACEBOOK_APP_ID") or os.getenv("INSTAGRAM_CLIENT_ID")
@@ -369,14 +528,15 @@ def inspect_token():
     if not (app_id and app_secret):
         return JSONResponse({"error": "app_credentials_missing"}, status_code=500)
 
-    app_access = f"{app_id}|{app_secret}"
-    url = "https://graph.facebook.com/debug_token"
-    params = {"input_token": token, "access_token": app_access}
-    r = httpx.get(url, params=params, timeout=10)
-    try:
-        return JSONResponse(r.json(), status_code=r.status_code)
-    except Exception:
-        return JSONResponse({"error": "debug_failed"}, status_code=500)
+    state = get_token_state(account["account_id"])
+    if state is None:
+        token_scheduler.schedule_check(account)
+        return JSONResponse({"status": "pending", "note": "token check queued; retry shortly"}, status_code=202)
+
+    body = dict(state.get("debug") or {"error": state.get("error") or "debug_failed"})
+    body["checked_at"] = state.get("checked_at")
+    body["refreshed_at"] = state.get("refreshed_at")
+    return JSONResponse(body, status_code=state.get("status_code", 500))
 
 
 @router.get("/webhook")
@@ -410,14 +570,28 @@ async def webhook_verify(request: Request):
 async def webhook_receive(request: Request):
     """Receive webhook events from Meta (Instagram/Facebook).
     
-    This logs incoming messages and sends a static auto-reply for demo purposes.
-    In production, this would integrate with the Grace AI system.
+    This logs incoming messages and acknowledges immediately; replies are
+    generated (reply_rules.json, or the REPLY_PROVIDER backend) and sent in
+    background tasks.
     """
+    raw_body = await request.body()
+    verified = verify_webhook_signature(raw_body, request.headers.get("x-hub-signature-256"))
+    if verified is False:
+        print("❌ Webhook rejected: X-Hub-Signature-256 doesn't match the app secret")
+        raise HTTPException(status_code=403, detail="Invalid signature")
     try:
-        body = await request.json()
+        body = json.loads(raw_body)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid JSON")
     
+    # On disk before the 200: Meta doesn't redeliver an acknowledged event.
+    # A SQLite write, so in a thread; a busy database means "not yet", retried by Meta
+    try:
+        accepted = await asyncio.to_thread(accept_events, list(messaging_events(body)))
+    except sqlite3.Error as e:
+        print(f"❌ Could not record webhook events, asking Meta to retry: {e}")
+        return JSONResponse({"status": "retry"}, status_code=503)
+    
     # Log the webhook event with enhanced visibility
     print("\n" + "="*60)
     print(f"🔔 WEBHOOK RECEIVED at {datetime.datetime.utcnow().isoformat()}Z")
@@ -428,9 +602,8 @@ async def webhook_receive(request: Request):
     
     # Log to file for reviewer inspection
     try:
-        webhook_dir = Path(__file__).resolve().parent.parent / "data"
-        webhook_dir.mkdir(parents=True, exist_ok=True)
-        webhook_log = webhook_dir / "webhook.log"
+        webhook_log = log_tails["events"].path
+        webhook_log.parent.mkdir(parents=True, exist_ok=True)
         
         log_entry = {
             "timestamp": datetime.datetime.utcnow().isoformat() + "Z",
@@ -438,64 +611,259 @@ async def webhook_receive(request: Request):
             "data": body
         }
         
-        with webhook_log.open("a", encoding="utf-8") as f:
-            f.write(json.dumps(log_entry) + "\n")
+        # locked single-write append: safe with several workers
+        append_line(webhook_log, json.dumps(log_entry))
+        log_tails["events"].notify()
     except Exception as e:
         print(f"Failed to log webhook: {e}")
     
-    # Process messaging events
-    if "entry" in body:
-        for entry in body["entry"]:
-            if "messaging" in entry:
-                for message_event in entry["messaging"]:
-                    await handle_message_event(message_event)
+    # Relay to downstream consumers (WEBHOOK_FORWARD_TARGETS); only queues.
+    # Forwards are signed, so only bodies known to come from Meta go out
+    if verified:
+        from utils.forwarding import forwarder as webhook_forwarder
+
+        webhook_forwarder.publish(raw_body)
+    
+    # Process messaging events in the background: Meta only needs a quick 200,
+    # and a slow reply provider must not hold up the ack or other conversations
+    for inbox_id, message_event, entry_id in accepted:
+        spawn_reply_task(handle_message_event(message_event, entry_id, inbox_id))
     
     return JSONResponse({"status": "received"})
 
 
-async def send_instagram_reply(sender_id: str, text: str):
+def verify_webhook_signature(raw_body: bytes, signature: Optional[str]) -> Optional[bool]:
+    """Check Meta's X-Hub-Signature-256 (HMAC-SHA256 of the body with the app secret).
+
+    Returns None when no app secret (FACEBOOK_APP_SECRET / INSTAGRAM_CLIENT_SECRET)
+    is set and nothing can be checked.
+    """
+    secret = app_secret()
+    if not secret:
+        return None
+    expected = "sha256=" + hmac.new(secret.encode("utf-8"), raw_body, hashlib.sha256).hexdigest()
+    return bool(signature) and hmac.compare_digest(expected, signature)
+
+
+def messaging_events(body: dict):
+    """Yield (messaging event, entry id) for every event in a webhook payload."""
+    for entry in body.get("entry") or []:
+        for message_event in entry.get("messaging") or []:
+            yield message_event, entry.get("id")
+
+
+def accept_events(events) -> list:
+    """Record messaging events in the inbox; returns (inbox id, event, entry id) for the new ones.
+
+    Meta redelivers events, so the message mid is claimed in the same write:
+    a mid that is already recorded is left out, and only one worker answers it.
+    """
+    from utils import outbox
+
+    events = [(message_event, entry_id) for message_event, entry_id in events if message_event.get("message", {}).get("text")]
+    if not events:
+        return []
+    ids = outbox.receive([
+        (f"mid:{mid}" if (mid := message_event["message"].get("mid")) else None, message_event, entry_id)
+        for message_event, entry_id in events
+    ])
+    accepted = []
+    for inbox_id, (message_event, entry_id) in zip(ids, events):
+        if inbox_id is None:
+            print(f"🔁 Duplicate delivery of {message_event['message'].get('mid')} - already handled")
+        else:
+            accepted.append((inbox_id, message_event, entry_id))
+    return accepted
+
+
+# in-flight reply tasks, kept referenced until done and drained on shutdown
+_reply_tasks = set()
+
+
+def spawn_reply_task(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    _reply_tasks.add(task)
+    task.add_done_callback(_reply_tasks.discard)
+    task.add_done_callback(_report_reply_task)
+    return task
+
+
+def _report_reply_task(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception():
+        print(f"❌ Handling a message event failed: {task.exception()!r}")
+
+
+async def drain_reply_tasks(timeout: float = 10) -> None:
+    """Let in-flight replies finish (up to `timeout` seconds) before shutdown."""
+    if not _reply_tasks:
+        return
+    done, pending = await asyncio.wait(set(_reply_tasks), timeout=timeout)
+    for task in pending:
+        task.cancel()
+    if pending:
+        print(f"⚠️  Cancelled {len(pending)} reply task(s) still running at shutdown")
+
+
+def _token_rejected(r) -> bool:
+    """True when Graph says the page token itself is invalid or expired."""
+    if r.status_code == 401:
+        return True
+    try:
+        return r.json().get("error", {}).get("code") == 190
+    except Exception:
+        return False
+
+
+def _retryable(r) -> bool:
+    """Rate limits and server-side errors are worth another attempt later."""
+    if r.status_code == 429 or r.status_code >= 500:
+        return True
+    try:
+        # Graph's throttling codes (application / user / page level)
+        return r.json().get("error", {}).get("code") in (4, 17, 32, 613)
+    except Exception:
+        return False
+
+
+async def deliver_reply(sender_id: str, text: str, recipient_id: Optional[str] = None) -> tuple:
     """Send a reply message via Instagram Graph API.
-    
+
     Args:
         sender_id: The Instagram user ID to send the message to
         text: The message text to send
-    
+        recipient_id: The business account that received the message
+            (webhook ``recipient.id`` / ``entry.id``); selects the page token
+
     Returns:
-        bool: True if the message was sent successfully, False otherwise
+        (outcome, error): outcome is one of the utils.outbox constants
+        SENT, RETRY, FAILED or NO_TOKEN
     """
-    page_access_token = os.getenv("PAGE_ACCESS_TOKEN")
+    import httpx
+
+    from utils import outbox
+    from utils.page_tokens import resolver as page_token_resolver
+
+    if REPLY_DRY_RUN:
+        print(f"🧪 Dry run - reply to {sender_id} not sent")
+        return outbox.NO_TOKEN, "dry run"
     
-    if not page_access_token or page_access_token == "your_page_access_token_here":
-        print("PAGE_ACCESS_TOKEN not configured - reply will only be logged")
-        return False
+    page_access_token = await page_token_resolver.get(recipient_id)
+    
+    if not page_access_token:
+        print(f"No page access token for recipient {recipient_id} - reply will only be logged")
+        return outbox.NO_TOKEN, "no page access token"
     
-    url = "https://graph.facebook.com/v20.0/me/messages"
-    params = {"access_token": page_access_token}
+    url = f"{GRAPH_URL}/me/messages"
     payload = {
         "recipient": {"id": sender_id},
         "message": {"text": text}
     }
     
     try:
-        async with httpx.AsyncClient() as client:
-            r = await client.post(url, params=params, json=payload, timeout=10)
-            print(f"Reply status: {r.status_code}, response: {r.text}")
-            
-            if r.status_code == 200:
-                print(f"Successfully sent reply to {sender_id}")
-                return True
-            else:
-                print(f"Failed to send reply to {sender_id}: {r.status_code} {r.text}")
-                return False
-                
-    except Exception as e:
+        client = get_http_client()
+        r = await client.post(url, params={"access_token": page_access_token}, json=payload)
+        if _token_rejected(r) and recipient_id:
+            # token revoked or rotated: re-resolve once and retry
+            print(f"Page token for {recipient_id} rejected ({r.status_code}); refreshing")
+            page_token_resolver.invalidate(recipient_id)
+            fresh_token = await page_token_resolver.get(recipient_id)
+            if fresh_token and fresh_token != page_access_token:
+                r = await client.post(url, params={"access_token": fresh_token}, json=payload)
+        print(f"Reply status: {r.status_code}, response: {r.text}")
+
+        if r.status_code == 200:
+            print(f"Successfully sent reply to {sender_id}")
+            return outbox.SENT, None
+        print(f"Failed to send reply to {sender_id}: {r.status_code} {r.text}")
+        return (outbox.RETRY if _retryable(r) else outbox.FAILED), f"{r.status_code} {r.text[:500]}"
+
+    except httpx.HTTPError as e:
         print(f"Error sending reply to {sender_id}: {e}")
-        return False
+        return outbox.RETRY, str(e)
+
+
+async def send_instagram_reply(sender_id: str, text: str, recipient_id: Optional[str] = None):
+    """Send a reply once, without the outbox. True if Graph accepted it."""
+    from utils import outbox
+
+    outcome, _ = await deliver_reply(sender_id, text, recipient_id)
+    return outcome == outbox.SENT
+
+
+# outbox status -> status written to auto_replies.log
+REPLY_LOG_STATUS = {
+    "sent": "sent_via_api",
+    "logged_only": "logged_only",
+    "pending": "queued_for_retry",
+    "failed": "failed",
+}
+
+
+def log_reply(item: dict, status: str) -> None:
+    """Append an outbox item's latest state to auto_replies.log for reviewer inspection."""
+    try:
+        reply_log = log_tails["replies"].path
+        
+        reply_entry = {
+            "timestamp": datetime.datetime.utcnow().isoformat() + "Z",
+            "sender_id": item["sender_id"],
+            "recipient_id": item.get("recipient_id"),
+            "incoming_message": item.get("incoming"),
+            "auto_reply": item["text"],
+            "status": REPLY_LOG_STATUS.get(status, status),
+            "outbox_id": item["id"],
+        }
+        
+        append_line(reply_log, json.dumps(reply_entry))
+        log_tails["replies"].notify()
+    except Exception as e:
+        print(f"Failed to log auto-reply: {e}")
+
+
+async def _deliver_outbox_item(item: dict) -> tuple:
+    return await deliver_reply(item["sender_id"], item["text"], item.get("recipient_id"))
+
+
+def _redrive_event(item: dict) -> None:
+    spawn_reply_task(handle_message_event(item["event"], item["entry_id"], item["id"]))
+
 
+_reply_outbox = None
+
+
+def get_reply_outbox():
+    """The worker that retries pending replies, replays the ones a crashed
+    process left behind and re-drives webhook events whose handling never
+    finished (started by main.py)."""
+    global _reply_outbox
+    if _reply_outbox is None:
+        from utils import outbox
+
+        _reply_outbox = outbox.OutboxWorker(_deliver_outbox_item, on_result=log_reply, redrive=_redrive_event)
+    return _reply_outbox
+
+
+async def handle_message_event(message_event, entry_id: Optional[str] = None, inbox_id: Optional[int] = None):
+    """Handle an individual message event and send auto-reply.
+
+    `inbox_id` is the event's inbox row (see accept_events). It is marked done
+    once the event is handled; if the handler fails or the process dies first,
+    the outbox worker re-drives it.
+    """
+    from utils import outbox
+
+    await _handle_message_event(message_event, entry_id, inbox_id)
+    if inbox_id is not None:
+        await asyncio.to_thread(outbox.finish_event, inbox_id)
+
+
+async def _handle_message_event(message_event, entry_id: Optional[str], inbox_id: Optional[int]):
+    from utils import outbox
+    from utils.reply_providers import ReplyRequest, generator as reply_generator
+    from utils.reply_rules import rules as reply_rules
 
-async def handle_message_event(message_event):
-    """Handle an individual message event and send auto-reply."""
     sender_id = message_event.get("sender", {}).get("id")
+    recipient_id = message_event.get("recipient", {}).get("id") or entry_id
     message_text = message_event.get("message", {}).get("text", "")
     
     if not sender_id or not message_text:
@@ -506,88 +874,125 @@ async def handle_message_event(message_event):
     print(f"   👤 From: {sender_id}")
     print(f"   📝 Text: {message_text}")
     
-    # Send auto-reply (static response for demo)
-    auto_reply = "Hi! This is Grace, your AI sales assistant. Thanks for your message! This is an automated demo response during our Instagram app review. Full conversational AI capabilities will be available soon! 🤖✨"
+    conversation = conversations.touch(recipient_id, sender_id)
     
-    # Try to send the reply via Graph API
-    reply_sent = await send_instagram_reply(sender_id, auto_reply)
+    # Rule match from reply_rules.json; its reply is also the static fallback
+    rule, static_reply = reply_rules.reply_for(
+        message_text, sender_id=sender_id, page_id=recipient_id, message_count=conversation["message_count"]
+    )
+    print(f"   🧭 Rule: {rule or 'default'} (message #{conversation['message_count']} in this conversation)")
     
-    if reply_sent:
-        print(f"✅ AUTO-REPLY SENT to {sender_id}")
-        print(f"   📤 Reply: {auto_reply[:50]}...")
-        reply_status = "sent_via_api"
-    else:
-        print(f"📝 AUTO-REPLY LOGGED ONLY for {sender_id}")
-        print(f"   📤 Reply: {auto_reply[:50]}...")
-        reply_status = "logged_only"
+    # Don't answer every message of a conversation: see utils/conversations.py.
+    # Provider replies aren't repeats, so only the minimum gap applies to them
+    cooldown = not reply_generator.uses_provider(rule)
+    if not conversations.claim_reply(recipient_id, sender_id, rule, cooldown=cooldown):
+        print(f"🤫 AUTO-REPLY THROTTLED for {sender_id} - replied recently")
+        return
     
-    # Log the auto-reply for reviewer inspection
-    try:
-        webhook_dir = Path(__file__).resolve().parent.parent / "data"
-        reply_log = webhook_dir / "auto_replies.log"
-        
-        reply_entry = {
-            "timestamp": datetime.datetime.utcnow().isoformat() + "Z",
-            "sender_id": sender_id,
-            "incoming_message": message_text,
-            "auto_reply": auto_reply,
-            "status": reply_status
-        }
+    request = ReplyRequest(message_text, sender_id, recipient_id, rule=rule, static_reply=static_reply, conversation=conversation)
+    # Each segment goes out as soon as the provider has produced it
+    async for auto_reply in reply_generator.segments(request):
+        # Recorded before sending so a crash mid-send can't lose the reply
+        item_id = await asyncio.to_thread(
+            outbox.enqueue, sender_id, auto_reply, recipient_id, incoming=message_text, inbox_id=inbox_id
+        )
+        item = {"id": item_id, "sender_id": sender_id, "recipient_id": recipient_id, "text": auto_reply, "incoming": message_text}
+        status = await get_reply_outbox().attempt(item)
         
-        with reply_log.open("a", encoding="utf-8") as f:
-            f.write(json.dumps(reply_entry) + "\n")
-    except Exception as e:
-        print(f"Failed to log auto-reply: {e}")
+        if status == "sent":
+            print(f"✅ AUTO-REPLY SENT to {sender_id}")
+        elif status == "pending":
+            print(f"⏳ AUTO-REPLY QUEUED FOR RETRY to {sender_id}")
+        else:
+            print(f"📝 AUTO-REPLY LOGGED ONLY for {sender_id} ({status})")
+        print(f"   📤 Reply: {auto_reply[:50]}...")
+
+
+def _parse_lines(lines: list) -> list:
+    parsed = []
+    for line in lines:
+        try:
+            parsed.append(json.loads(line))
+        except ValueError:
+            continue
+    return parsed
 
 
 @router.get("/webhook/logs")
 def webhook_logs():
     """View recent webhook events and auto-replies (for demo/debugging)."""
-    logs = {"webhook_events": [], "auto_replies": []}
-    
     try:
-        webhook_dir = Path(__file__).resolve().parent.parent / "data"
-        
-        # Read webhook events
-        webhook_log = webhook_dir / "webhook.log"
-        if webhook_log.exists():
-            with webhook_log.open("r", encoding="utf-8") as f:
-                for line in f:
-                    try:
-                        logs["webhook_events"].append(json.loads(line.strip()))
-                    except:
-                        continue
-        
-        # Read auto-replies
-        reply_log = webhook_dir / "auto_replies.log"
-        if reply_log.exists():
-            with reply_log.open("r", encoding="utf-8") as f:
-                for line in f:
-                    try:
-                        logs["auto_replies"].append(json.loads(line.strip()))
-                    except:
-                        continue
-        
-        # Keep only last 50 entries of each type
-        logs["webhook_events"] = logs["webhook_events"][-50:]
-        logs["auto_replies"] = logs["auto_replies"][-50:]
-        
+        # only the last 50 lines of each file are read, from the end
+        logs = {
+            "webhook_events": _parse_lines(log_tails["events"].last(50)),
+            "auto_replies": _parse_lines(log_tails["replies"].last(50)),
+        }
     except Exception as e:
         return JSONResponse({"error": f"Failed to read logs: {e}"}, status_code=500)
     
     return JSONResponse(logs)
 
 
+@router.get("/webhook/stream")
+async def webhook_stream(request: Request, source: str = "events", cursor: Optional[int] = None, backlog: int = 0, format: str = "sse"):
+    """Live tail of webhook events (``source=events``) or auto-replies (``source=replies``).
+
+    Server-Sent Events by default (``format=ndjson`` for one JSON object per
+    line). Every event carries a cursor; reconnect with ``?cursor=`` or the
+    SSE ``Last-Event-ID`` header to resume without gaps. Without a cursor the
+    stream starts at the end, after replaying the last ``backlog`` entries.
+    """
+    tail = log_tails.get(source)
+    if tail is None:
+        raise HTTPException(status_code=400, detail=f"source must be one of {', '.join(log_tails)}")
+    if format not in ("sse", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be sse or ndjson")
+    if cursor is None and request.headers.get("last-event-id", "").isdigit():
+        cursor = int(request.headers["last-event-id"])
+    if cursor is None:
+        cursor = await asyncio.to_thread(tail.offset_before_last, min(max(backlog, 0), 1000))
+
+    async def events():
+        if format == "sse":
+            # tell EventSource clients how long to wait before reconnecting
+            yield "retry: 2000\n\n"
+        async for position, line in tail.follow(cursor):
+            if line is None:
+                yield ": ping\n\n" if format == "sse" else "\n"
+                continue
+            try:
+                json.loads(line)
+            except ValueError:
+                continue
+            if format == "sse":
+                yield f"id: {position}\nevent: {source}\ndata: {line}\n\n"
+            else:
+                yield f'{{"cursor": {position}, "event": {line}}}\n'
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    # X-Accel-Buffering: stop reverse proxies from holding events back
+    return StreamingResponse(events(), media_type=media_type, headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
 @router.get("/webhook/status")
 def webhook_status():
     """Check webhook configuration status."""
+    from utils import outbox
+    from utils.forwarding import forwarder as webhook_forwarder
+    from utils.page_tokens import env_page_token, resolver as page_token_resolver
+
     page_access_token = os.getenv("PAGE_ACCESS_TOKEN", "")
     webhook_verify_token = os.getenv("WEBHOOK_VERIFY_TOKEN", "")
     
     status = {
         "webhook_verify_token_configured": bool(webhook_verify_token and webhook_verify_token != "your_webhook_verify_token_here"),
         "page_access_token_configured": bool(page_access_token and page_access_token != "your_page_access_token_here"),
-        "messaging_enabled": bool(page_access_token and page_access_token != "your_page_access_token_here"),
+        "messaging_enabled": bool(env_page_token() or len(page_token_resolver)),
+        "resolved_page_tokens": len(page_token_resolver),
+        "reply_outbox": outbox.counts(),
+        "webhook_inbox": outbox.counts("inbox"),
+        "conversations_cached": len(conversations),
+        "forwarding": webhook_forwarder.status(),
         "webhook_url_for_meta_console": "https://fynko.space/webhook",
         "webhook_verification_endpoint": "GET https://fynko.space/webhook",
         "webhook_events_endpoint": "POST https://fynko.space/webhook",
@@ -0,0 +1,30 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, JSONResponse
+
+from utils.profiling import PROFILE_DIR, PROFILE_HEADER, REPORTS_PREFIX, list_reports, signature_valid
+
+# Only included by main.py when request profiling is enabled.
+router = APIRouter(prefix=REPORTS_PREFIX)
+
+
+def _require_signature(request: Request) -> None:
+    signature = request.headers.get(PROFILE_HEADER.decode()) or request.query_params.get("_profile")
+    if not signature_valid(request.url.path, signature):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+
+@router.get("")
+def profiles_index(request: Request):
+    """List saved request profiles, newest first."""
+    _require_signature(request)
+    return JSONResponse({"profiles": list_reports()})
+
+
+@router.get("/{name}")
+def profile_report(name: str, request: Request):
+    _require_signature(request)
+    target = (PROFILE_DIR / name).resolve()
+    if target.parent != PROFILE_DIR.resolve() or not target.is_file():
+        raise HTTPException(status_code=404, detail="Profile not found")
+    media_type = "text/html" if target.suffix == ".html" else "text/plain"
+    return FileResponse(target, media_type=media_type)
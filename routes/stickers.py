@@ -2,25 +2,125 @@ from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Request
 from fastapi.responses import JSONResponse, RedirectResponse
 import uuid
 import datetime
+import hashlib
 import os
-from supabase import create_client, Client
+import re
+from typing import TYPE_CHECKING, Optional
+
+from utils.cache import TTLCache
+
+if TYPE_CHECKING:
+    from supabase import Client
 
 router = APIRouter(prefix="/api/stickers")
 
-SUPABASE_URL = os.environ["SUPABASE_URL"]
-SUPABASE_KEY = os.environ["SUPABASE_KEY"]
 BUCKET = "sticker-receipts"
+RECEIPT_MAX_BYTES = 10 * 1024 * 1024
+RECEIPT_CHUNK = 1024 * 1024
+
+# /stats comes from the sticker_stats() SQL function (supabase/migrations);
+# kept briefly so an admin page polling it doesn't hit the database each time
+STATS_CACHE_TTL = float(os.getenv("STICKER_STATS_TTL", "10"))
+_stats_cache = TTLCache(ttl=STATS_CACHE_TTL, maxsize=1)
+
+# What parse_count/parse_amount accept. The sticker_stats migration converts
+# old text values with the same patterns, so keep the two in step.
+COUNT_PATTERN = re.compile(r"0*[1-9][0-9]{0,8}")
+# up to 10 digits before the point (numeric(12, 2)), plain or with thousands commas
+AMOUNT_PATTERN = re.compile(r"([0-9]{1,10}|[0-9]{1,3}(,[0-9]{3}){1,2}|[0-9],[0-9]{3},[0-9]{3},[0-9]{3})(\.[0-9]+)?")
 
 _client = None
 
 
-def get_supabase() -> Client:
+def supabase_configured() -> bool:
+    return bool(os.getenv("SUPABASE_URL") and os.getenv("SUPABASE_KEY"))
+
+
+def get_supabase() -> "Client":
+    # The supabase SDK is slow to import, so it's only loaded on the first
+    # sticker request rather than at app startup.
     global _client
     if _client is None:
-        _client = create_client(SUPABASE_URL, SUPABASE_KEY)
+        if not supabase_configured():
+            raise HTTPException(status_code=503, detail="Sticker storage not configured (SUPABASE_URL / SUPABASE_KEY)")
+        from supabase import create_client
+
+        _client = create_client(os.environ["SUPABASE_URL"], os.environ["SUPABASE_KEY"])
     return _client
 
 
+def parse_count(value) -> int:
+    """sticker_count as an integer (the column is typed, forms send strings)."""
+    text = str(value).strip()
+    if not text.isascii() or not text.isdigit():
+        raise HTTPException(status_code=400, detail="sticker_count must be a whole number")
+    if not COUNT_PATTERN.fullmatch(text):
+        raise HTTPException(status_code=400, detail="sticker_count must be between 1 and 999999999")
+    return int(text)
+
+
+def parse_amount(value) -> Optional[float]:
+    """amount_paid as a number; blank means not given. Accepts "₦10,000.50"."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        text = f"{value:f}"
+    else:
+        raw = str(value if value is not None else "").strip()
+        if not raw:
+            return None
+        # drop the currency sign and spaces; digits, separators and a sign stay
+        text = re.sub(r"[^0-9.,-]", "", raw)
+    if not re.search(r"[0-9]", text):
+        # "abc" or "N/A" isn't a missing amount
+        raise HTTPException(status_code=400, detail="amount_paid must be a number like 10000 or 10,000.50")
+    if text.startswith("-"):
+        raise HTTPException(status_code=400, detail="amount_paid can't be negative")
+    if not AMOUNT_PATTERN.fullmatch(text):
+        raise HTTPException(status_code=400, detail="amount_paid must be a number like 10000 or 10,000.50")
+    return float(text.replace(",", ""))
+
+
+def submissions_changed() -> None:
+    _stats_cache.clear()
+
+
+async def read_receipt(receipt: UploadFile) -> tuple:
+    """Read the upload in chunks, hashing as it goes. Returns (bytes, sha256 hex)."""
+    digest = hashlib.sha256()
+    chunks, size = [], 0
+    while chunk := await receipt.read(RECEIPT_CHUNK):
+        size += len(chunk)
+        if size > RECEIPT_MAX_BYTES:
+            raise HTTPException(status_code=400, detail="File too large (max 10MB)")
+        digest.update(chunk)
+        chunks.append(chunk)
+    return b"".join(chunks), digest.hexdigest()
+
+
+def store_receipt(sb: "Client", contents: bytes, sha256: str, content_type: str) -> tuple:
+    """Store a receipt under its content hash. Returns (path, id of an earlier submission with it).
+
+    Identical receipts share one object: when one is already stored it's
+    reused instead of uploaded again, and the submission is flagged as a
+    probable duplicate of the first one that sent it.
+    """
+    from storage3.exceptions import StorageApiError
+
+    path = f"sha256/{sha256}"
+    earlier = (
+        sb.table("sticker_submissions").select("id").eq("receipt_sha256", sha256)
+        .order("submitted_at").limit(1).execute()
+    )
+    if earlier.data:
+        return path, earlier.data[0]["id"]
+    try:
+        sb.storage.from_(BUCKET).upload(path=path, file=contents, file_options={"content-type": content_type})
+    except StorageApiError as e:
+        # stored by a submission that failed afterwards, or one racing this one
+        if str(e.status) != "409" and e.code != "Duplicate":
+            raise
+    return path, None
+
+
 @router.post("/submit")
 async def submit_sticker(
     full_name: str = Form(...),
@@ -35,23 +135,16 @@ async def submit_sticker(
     payment_date: str = Form(...),
     receipt: UploadFile = File(...),
 ):
-    contents = await receipt.read()
-    if len(contents) > 10 * 1024 * 1024:
-        raise HTTPException(status_code=400, detail="File too large (max 10MB)")
+    count, amount = parse_count(sticker_count), parse_amount(amount_paid)
+    contents, receipt_sha256 = await read_receipt(receipt)
 
     submission_id = str(uuid.uuid4())[:8]
-    safe_name = "".join(c if c.isalnum() or c in "._-" else "_" for c in (receipt.filename or "file"))
-    receipt_filename = f"{submission_id}_{safe_name}"
-
     sb = get_supabase()
 
-    # Upload receipt to Supabase Storage
-    sb.storage.from_(BUCKET).upload(
-        path=receipt_filename,
-        file=contents,
-        file_options={"content-type": receipt.content_type or "application/octet-stream"},
+    # Upload receipt to Supabase Storage, once per distinct file
+    receipt_filename, duplicate_of = store_receipt(
+        sb, contents, receipt_sha256, receipt.content_type or "application/octet-stream"
     )
-
     receipt_url = sb.storage.from_(BUCKET).get_public_url(receipt_filename)
 
     entry = {
@@ -61,19 +154,22 @@ async def submit_sticker(
         "address": address,
         "owner_name": owner_name,
         "plate_number": plate_number,
-        "sticker_count": sticker_count,
-        "amount_paid": amount_paid,
+        "sticker_count": count,
+        "amount_paid": amount,
         "payment_method": payment_method,
         "payment_name": payment_name,
         "payment_date": payment_date,
         "receipt_filename": receipt_filename,
         "receipt_url": receipt_url,
+        "receipt_sha256": receipt_sha256,
+        "probable_duplicate_of": duplicate_of,
         "submitted_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
     }
 
     sb.table("sticker_submissions").insert(entry).execute()
+    submissions_changed()
 
-    return JSONResponse({"status": "ok", "id": submission_id})
+    return JSONResponse({"status": "ok", "id": submission_id, "probable_duplicate": duplicate_of is not None})
 
 
 @router.get("/submissions")
@@ -83,6 +179,16 @@ def get_submissions():
     return JSONResponse(result.data)
 
 
+@router.get("/stats")
+def get_stats():
+    """Totals for the admin page, aggregated in the database."""
+    stats = _stats_cache.get("stats")
+    if stats is None:
+        stats = get_supabase().rpc("sticker_stats").execute().data
+        _stats_cache.set("stats", stats)
+    return JSONResponse(stats)
+
+
 @router.patch("/submission/{submission_id}")
 async def update_submission(submission_id: str, request: Request):
     body = await request.json()
@@ -90,11 +196,16 @@ async def update_submission(submission_id: str, request: Request):
     updates = {k: v for k, v in body.items() if k in allowed}
     if not updates:
         raise HTTPException(status_code=400, detail="No valid fields to update")
+    if "sticker_count" in updates:
+        updates["sticker_count"] = parse_count(updates["sticker_count"])
+    if "amount_paid" in updates:
+        updates["amount_paid"] = parse_amount(updates["amount_paid"])
 
     sb = get_supabase()
     result = sb.table("sticker_submissions").update(updates).eq("id", submission_id).execute()
     if not result.data:
         raise HTTPException(status_code=404, detail="Submission not found")
+    submissions_changed()
     return JSONResponse({"status": "ok"})
 
 
@@ -102,7 +213,8 @@ async def update_submission(submission_id: str, request: Request):
 async def toggle_collected(submission_id: str):
     sb = get_supabase()
     row = sb.table("sticker_submissions").select("collected").eq("id", submission_id).maybe_single().execute()
-    if not row.data:
+    # maybe_single() gives no response at all when nothing matched
+    if not row or not row.data:
         raise HTTPException(status_code=404, detail="Submission not found")
     new_state = not bool(row.data.get("collected"))
     updates = {
@@ -110,6 +222,7 @@ async def toggle_collected(submission_id: str):
         "collected_at": datetime.datetime.now(datetime.timezone.utc).isoformat() if new_state else None,
     }
     sb.table("sticker_submissions").update(updates).eq("id", submission_id).execute()
+    submissions_changed()
     return JSONResponse({"status": "ok", "collected": new_state})
 
 
@@ -127,8 +240,8 @@ async def manual_add(request: Request):
         "address": body.get("address", ""),
         "owner_name": body.get("owner_name", ""),
         "plate_number": body.get("plate_number", ""),
-        "sticker_count": str(body.get("sticker_count", 1)),
-        "amount_paid": str(body.get("amount_paid", "")),
+        "sticker_count": parse_count(body.get("sticker_count", 1)),
+        "amount_paid": parse_amount(body.get("amount_paid")),
         "payment_method": body.get("payment_method", ""),
         "payment_name": body.get("payment_name", ""),
         "payment_date": body.get("payment_date", ""),
@@ -139,6 +252,7 @@ async def manual_add(request: Request):
     }
 
     get_supabase().table("sticker_submissions").insert(entry).execute()
+    submissions_changed()
     return JSONResponse({"status": "ok", "id": entry["id"]})
 
 
@@ -146,6 +260,6 @@ async def manual_add(request: Request):
 def get_receipt(receipt_id: str):
     sb = get_supabase()
     result = sb.table("sticker_submissions").select("receipt_filename,receipt_url").eq("id", receipt_id).maybe_single().execute()
-    if not result.data or not result.data.get("receipt_url"):
+    if not result or not result.data or not result.data.get("receipt_url"):
         raise HTTPException(status_code=404, detail="Receipt not found")
     return RedirectResponse(url=result.data["receipt_url"])
@@ -1,13 +1,46 @@
 from fastapi import APIRouter, Request
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, Response
 from fastapi.templating import Jinja2Templates
+from jinja2 import FileSystemBytecodeCache
+import hashlib
 import os
 
+from storage import STORE_PATH
 from utils.oauth import build_auth_url, generate_state
+from utils.static import asset_url
 
 router = APIRouter()
 
+# Compiled templates survive restarts, so a cold start skips Jinja's parser
+TEMPLATE_CACHE_DIR = STORE_PATH / "jinja_cache"
+TEMPLATE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+
 templates = Jinja2Templates(directory="templates")
+templates.env.bytecode_cache = FileSystemBytecodeCache(str(TEMPLATE_CACHE_DIR))
+# {{ asset_url('fynko.png') }} -> content-hashed URL once build_assets.py has run
+templates.env.globals["asset_url"] = asset_url
+
+# None of these pages use per-request data, so each is rendered once
+PRERENDERED_PAGES = ("welcome.html", "privacy.html", "terms.html")
+_rendered = {}
+
+
+def prerender_pages() -> None:
+    """Render the static templates to bytes + ETag (called at startup)."""
+    for name in PRERENDERED_PAGES:
+        body = templates.get_template(name).render().encode("utf-8")
+        _rendered[name] = (body, '"%s"' % hashlib.sha256(body).hexdigest()[:32])
+
+
+def rendered_page(request: Request, name: str) -> Response:
+    """Serve a pre-rendered page, answering If-None-Match with 304."""
+    if name not in _rendered:
+        prerender_pages()
+    body, etag = _rendered[name]
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return HTMLResponse(body, headers=headers)
 
 
 @router.get("/", response_class=HTMLResponse)
@@ -15,19 +48,19 @@ async def home(request: Request):
     # The frontend will call /instagram/profile to populate reviewer info
     # ensure a CSRF token is set as a cookie for double-submit validation
     csrf = generate_state(16)
-    response = templates.TemplateResponse("welcome.html", {"request": request})
+    response = rendered_page(request, "welcome.html")
     response.set_cookie("csrf_token", csrf, httponly=False, secure=True, samesite='lax')
     return response
 
 
 @router.get("/privacy", response_class=HTMLResponse)
 async def privacy(request: Request):
-    return templates.TemplateResponse("privacy.html", {"request": request})
+    return rendered_page(request, "privacy.html")
 
 
 @router.get("/terms", response_class=HTMLResponse)
 async def terms(request: Request):
-    return templates.TemplateResponse("terms.html", {"request": request})
+    return rendered_page(request, "terms.html")
 
 
 
@@ -3,12 +3,61 @@
 Seed webhook logs with sample data for Meta app review.
 This creates demonstration webhook events and auto-replies so reviewers
 can see how the system works even before sending real messages.
+
+With options it generates synthetic data at scale instead, for exercising
+log readers and the stickers admin listing:
+
+    python seed_webhook_logs.py                                   # the two demo events (app review)
+    python seed_webhook_logs.py --events 1000000 --senders 50000 --days 30
+    python seed_webhook_logs.py --events 5000000 --format gz --segment-lines 1000000 --out data/archive
+    python seed_webhook_logs.py --mix message=0.6,read=0.2,delivery=0.1,reaction=0.05,postback=0.05
+    python seed_webhook_logs.py --stickers 100000                  # sticker_submissions.jsonl
+    python seed_webhook_logs.py --stickers 100000 --stickers-to supabase   # insert via SUPABASE_URL
+
+Output is streamed, so memory stays flat however many events are asked for.
+The same --seed (with a fixed --end) gives the same data.
 """
 
+import argparse
+import gzip
 import json
 import datetime
+import os
+import random
+import sys
+import time
+import uuid
 from pathlib import Path
 
+PAGE_ID = "17841457603940745"
+DEFAULT_MIX = "message=0.7,read=0.15,delivery=0.1,reaction=0.03,postback=0.02"
+MESSAGE_TEXTS = [
+    "Hi! I'm interested in your products",
+    "What are your business hours?",
+    "How much is this?",
+    "Do you deliver to Abuja?",
+    "Is the black one still available in size M?",
+    "Where is my order #{n}?",
+    "Can I pay on delivery?",
+    "Thank you 🙏",
+    "Please send your account details",
+    "Can I speak to a human please",
+    "Bonjour, quel est le prix ?",
+    "Hola, ¿hacen envíos?",
+    "ok",
+]
+REPLY_TEXTS = [
+    "Hi! Thanks for reaching out 👋 How can we help you today?",
+    "Our prices are listed on the product posts, and we're happy to help you choose!",
+    "Thanks! We'll check on order #{n} and get back to you shortly.",
+    "We deliver nationwide within 2-5 working days 🚚",
+    "Thanks for your message! A member of our team will reply soon.",
+]
+# outbox status mix for generated replies (see REPLY_LOG_STATUS in routes/api.py)
+REPLY_STATUSES = {"sent_via_api": 0.93, "logged_only": 0.03, "queued_for_retry": 0.03, "failed": 0.01}
+BATCH_SHAPES = {1: 0.9, 2: 0.07, 3: 0.03}
+WRITE_CHUNK = 10000
+
 def seed_webhook_logs():
     """Create sample webhook logs for demo purposes."""
     
@@ -105,5 +154,245 @@ def seed_webhook_logs():
     print(f"   - /webhook/logs (JSON API)")
     print(f"   - /webhook/status (Configuration status)")
 
+def parse_mix(spec: str) -> dict:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight)
+    unknown = set(mix) - {"message", "read", "delivery", "reaction", "postback"}
+    if unknown:
+        raise ValueError(f"unknown event type(s) in --mix: {', '.join(sorted(unknown))}")
+    return mix
+
+
+class Generator:
+    """Synthetic Instagram webhook deliveries and the replies they get."""
+
+    def __init__(self, senders: int, start: float, end: float, mix: dict, reply_ratio: float, seed: int):
+        self.rng = random.Random(seed)
+        self.senders = senders
+        self.start = start
+        self.end = end
+        self.event_types = list(mix)
+        self.event_weights = list(mix.values())
+        self.reply_ratio = reply_ratio
+        self.mid = 0
+        self.outbox_id = 0
+
+    def sender(self) -> str:
+        # skewed: a few senders are chatty, most write once or twice
+        return str(7000000000000000 + int(self.senders * self.rng.random() ** 2))
+
+    def messaging(self, sender: str, ts_ms: int) -> dict:
+        kind = self.rng.choices(self.event_types, self.event_weights)[0]
+        event = {"sender": {"id": sender}, "recipient": {"id": PAGE_ID}, "timestamp": ts_ms}
+        self.mid += 1
+        mid = f"m_synthetic_{self.mid}"
+        if kind == "message":
+            event["message"] = {"mid": mid, "text": self.rng.choice(MESSAGE_TEXTS).format(n=self.rng.randint(1000, 99999))}
+        elif kind == "read":
+            event["read"] = {"mid": mid}
+        elif kind == "delivery":
+            event["delivery"] = {"mids": [mid], "watermark": ts_ms}
+        elif kind == "reaction":
+            event["reaction"] = {"mid": mid, "action": "react", "reaction": "love", "emoji": "❤️"}
+        else:
+            event["postback"] = {"mid": mid, "title": "Get Started", "payload": "GET_STARTED"}
+        return event
+
+    def generate(self, count: int):
+        """Yield (event line, [reply lines]) in timestamp order."""
+        span = self.end - self.start
+        shapes, weights = list(BATCH_SHAPES), list(BATCH_SHAPES.values())
+        for i in range(count):
+            ts = self.start + span * (i + self.rng.random()) / count
+            ts_ms = int(ts * 1000)
+            sender = self.sender()
+            events = [self.messaging(sender, ts_ms) for _ in range(self.rng.choices(shapes, weights)[0])]
+            line = json.dumps({
+                "timestamp": iso(ts),
+                "event": "webhook_received",
+                "data": {"object": "instagram", "entry": [{"id": PAGE_ID, "time": ts_ms, "messaging": events}]},
+            })
+            replies = []
+            for event in events:
+                if "message" in event and self.rng.random() < self.reply_ratio:
+                    self.outbox_id += 1
+                    replies.append(json.dumps({
+                        "timestamp": iso(ts + self.rng.uniform(0.3, 4)),
+                        "sender_id": sender,
+                        "recipient_id": PAGE_ID,
+                        "incoming_message": event["message"]["text"],
+                        "auto_reply": self.rng.choice(REPLY_TEXTS).format(n=self.rng.randint(1000, 99999)),
+                        "status": self.rng.choices(list(REPLY_STATUSES), list(REPLY_STATUSES.values()))[0],
+                        "outbox_id": self.outbox_id,
+                    }))
+            yield line, replies
+
+
+def iso(ts: float) -> str:
+    return datetime.datetime.utcfromtimestamp(ts).isoformat() + "Z"
+
+
+class SegmentWriter:
+    """Write lines to one JSONL file, or to numbered .jsonl.gz segments."""
+
+    def __init__(self, out_dir: Path, name: str, gz: bool, segment_lines: int, append: bool, suffix: str = ".log"):
+        self.out_dir = out_dir
+        self.name = name
+        self.suffix = suffix
+        self.gz = gz
+        self.segment_lines = segment_lines
+        self.append = append
+        self.files = []
+        self.lines = 0
+        self._file = None
+        self._in_segment = 0
+        self._buffer = []
+
+    def _open(self):
+        if self.gz:
+            path = self.out_dir / f"{self.name}-{len(self.files) + 1:05d}.jsonl.gz"
+            f = gzip.open(path, "wt", encoding="utf-8", compresslevel=5)
+        else:
+            path = self.out_dir / f"{self.name}{self.suffix}"
+            f = path.open("a" if self.append else "w", encoding="utf-8")
+        self.files.append(path)
+        self._in_segment = 0
+        return f
+
+    def write(self, line: str) -> None:
+        self._buffer.append(line)
+        self.lines += 1
+        if len(self._buffer) >= WRITE_CHUNK:
+            self.flush()
+
+    def flush(self) -> None:
+        while self._buffer:
+            if self._file is None or (self.gz and self._in_segment >= self.segment_lines):
+                if self._file is not None:
+                    self._file.close()
+                self._file = self._open()
+            room = len(self._buffer) if not self.gz else self.segment_lines - self._in_segment
+            chunk, self._buffer = self._buffer[:room], self._buffer[room:]
+            self._file.write("\n".join(chunk) + "\n")
+            self._in_segment += len(chunk)
+
+    def close(self) -> None:
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+
+
+def sticker_submission(rng: random.Random, submitted_at: float) -> dict:
+    first = rng.choice(["Ada", "Chinedu", "Funke", "Ibrahim", "Ngozi", "Tunde", "Zainab", "Emeka", "Bisi", "Yusuf"])
+    last = rng.choice(["Okafor", "Adeyemi", "Bello", "Eze", "Ogunleye", "Musa", "Nwosu", "Balogun"])
+    count = rng.choices([1, 2, 3, 4], [0.6, 0.25, 0.1, 0.05])[0]
+    # a full 128-bit id: 32-bit ones collide once a run reaches ~100k rows
+    submission_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+    collected = rng.random() < 0.4
+    return {
+        "id": submission_id,
+        "full_name": f"{first} {last}",
+        "phone": f"0{rng.choice([70, 80, 81, 90, 91])}{rng.randint(10000000, 99999999)}",
+        "address": f"Block {rng.randint(1, 60)}, Flat {rng.randint(1, 12)}, Infinity Estate",
+        "owner_name": "" if rng.random() < 0.8 else f"{rng.choice(['Mr', 'Mrs', 'Dr'])} {last}",
+        "plate_number": f"{rng.choice(['LAG', 'KJA', 'EKY', 'ABJ'])}-{rng.randint(100, 999)}-{chr(65 + rng.randrange(26))}{chr(65 + rng.randrange(26))}",
+        "sticker_count": str(count),
+        "amount_paid": str(5000 * count) if rng.random() < 0.9 else "",
+        "payment_method": rng.choices(["transfer", "cash", "pos"], [0.8, 0.15, 0.05])[0],
+        "payment_name": f"{first} {last}",
+        "payment_date": datetime.datetime.utcfromtimestamp(submitted_at - rng.uniform(0, 3 * 86400)).date().isoformat(),
+        "receipt_filename": f"{submission_id}_receipt.jpg",
+        "receipt_url": "",
+        "submitted_at": datetime.datetime.fromtimestamp(submitted_at, datetime.timezone.utc).isoformat(),
+        "collected": collected,
+        "collected_at": datetime.datetime.fromtimestamp(submitted_at + rng.uniform(3600, 7 * 86400), datetime.timezone.utc).isoformat() if collected else None,
+    }
+
+
+def generate_stickers(args, out_dir: Path) -> None:
+    rng = random.Random(args.seed + 1)
+    end = time.time() if args.end is None else args.end
+    start = end - args.days * 86400
+    rows = (sticker_submission(rng, start + (end - start) * (i + rng.random()) / args.stickers) for i in range(args.stickers))
+    began = time.perf_counter()
+    if args.stickers_to == "supabase":
+        url, key = os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY")
+        if not (url and key):
+            print("❌ --stickers-to supabase needs SUPABASE_URL and SUPABASE_KEY")
+            sys.exit(1)
+        from supabase import create_client
+
+        table = create_client(url, key).table("sticker_submissions")
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == 1000:
+                table.insert(batch).execute()
+                batch = []
+        if batch:
+            table.insert(batch).execute()
+        target = f"{url} (sticker_submissions)"
+    else:
+        writer = SegmentWriter(out_dir, "sticker_submissions", args.format == "gz", args.segment_lines, args.append, suffix=".jsonl")
+        for row in rows:
+            writer.write(json.dumps(row))
+        writer.close()
+        target = ", ".join(str(p) for p in writer.files)
+    print(f"✅ {args.stickers} sticker submissions -> {target} ({time.perf_counter() - began:.1f}s)")
+
+
+def generate_logs(args, out_dir: Path) -> None:
+    end = time.time() if args.end is None else args.end
+    generator = Generator(args.senders, end - args.days * 86400, end, parse_mix(args.mix), args.reply_ratio, args.seed)
+    gz = args.format == "gz"
+    events = SegmentWriter(out_dir, "webhook", gz, args.segment_lines, args.append)
+    replies = SegmentWriter(out_dir, "auto_replies", gz, args.segment_lines, args.append)
+    began = time.perf_counter()
+    for n, (line, reply_lines) in enumerate(generator.generate(args.events), 1):
+        events.write(line)
+        for reply in reply_lines:
+            replies.write(reply)
+        if n % 500000 == 0:
+            print(f"   ... {n} events ({n / (time.perf_counter() - began):.0f}/s)")
+    events.close()
+    replies.close()
+    elapsed = time.perf_counter() - began
+    size = sum(p.stat().st_size for p in events.files + replies.files)
+    print(f"✅ {events.lines} webhook events and {replies.lines} auto-replies in {elapsed:.1f}s ({size / 1e6:.0f} MB)")
+    for path in events.files + replies.files:
+        print(f"   - {path}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Seed demo webhook logs, or generate synthetic data at scale")
+    parser.add_argument("--events", type=int, default=0, help="webhook deliveries to generate")
+    parser.add_argument("--senders", type=int, default=10000, help="distinct Instagram users")
+    parser.add_argument("--days", type=float, default=30, help="spread events over this many days")
+    parser.add_argument("--end", type=float, help="unix time of the last event (default: now)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="event type weights")
+    parser.add_argument("--reply-ratio", type=float, default=0.8, help="share of text messages that got an auto-reply")
+    parser.add_argument("--stickers", type=int, default=0, help="sticker submissions to generate")
+    parser.add_argument("--stickers-to", choices=["file", "supabase"], default="file")
+    parser.add_argument("--format", choices=["jsonl", "gz"], default="jsonl", help="plain logs, or gzipped .jsonl.gz segments")
+    parser.add_argument("--segment-lines", type=int, default=1000000, help="lines per .gz segment")
+    parser.add_argument("--out", type=Path, default=Path(__file__).resolve().parent / "data")
+    parser.add_argument("--append", action="store_true", help="append to existing .log files instead of replacing them")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if not (args.events or args.stickers):
+        seed_webhook_logs()
+        return 0
+    args.out.mkdir(parents=True, exist_ok=True)
+    if args.events:
+        print(f"🧪 Generating {args.events} webhook events from {args.senders} senders over {args.days:g} days ({args.format})")
+        generate_logs(args, args.out)
+    if args.stickers:
+        generate_stickers(args, args.out)
+    return 0
+
+
 if __name__ == "__main__":
-    seed_webhook_logs()
+    sys.exit(main())
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Production launcher with multi-worker support.
+
+    python serve.py                    # WEB_CONCURRENCY workers (default: CPU count)
+    python serve.py --workers 4
+    python serve.py --gunicorn         # gunicorn master + uvicorn workers
+
+Workers share state through data/ (or DATA_DIR): tokens and sessions in SQLite
+(storage.py), the webhook inbox and reply outbox in SQLite (utils/outbox.py),
+log files via locked appends and the token refresh scheduler via a leader
+lock (utils/filelock.py). Per-process caches (profiles, page tokens, HTTP pools)
+are just caches and are rebuilt on demand in each worker.
+"""
+
+import argparse
+import os
+import shutil
+import sys
+
+
+def default_workers() -> int:
+    return int(os.getenv("WEB_CONCURRENCY") or os.cpu_count() or 1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the app with one or more worker processes")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "10000")))
+    parser.add_argument("--workers", type=int, default=default_workers())
+    parser.add_argument("--gunicorn", action="store_true", help="use gunicorn as the process manager (Linux/macOS)")
+    parser.add_argument("--log-level", default=os.getenv("LOG_LEVEL", "info"))
+    args = parser.parse_args()
+
+    print(f"🚀 Starting {args.workers} worker(s) on {args.host}:{args.port}")
+
+    if args.gunicorn:
+        gunicorn = shutil.which("gunicorn")
+        if not gunicorn:
+            sys.exit("❌ gunicorn is not installed (pip install gunicorn)")
+        os.execv(gunicorn, [
+            gunicorn, "main:app",
+            "--worker-class", "uvicorn.workers.UvicornWorker",
+            "--workers", str(args.workers),
+            "--bind", f"{args.host}:{args.port}",
+            "--log-level", args.log_level,
+            # replace a worker that stops answering instead of hanging the pod
+            "--timeout", "60",
+            "--graceful-timeout", "20",
+        ])
+
+    import uvicorn
+
+    uvicorn.run(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        log_level=args.log_level,
+        proxy_headers=True,
+        forwarded_allow_ips="*",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,41 +1,305 @@
-"""Simple token storage utilities.
+"""Token storage utilities.
 
-Uses a small JSON file in the project directory to persist a single access token.
-This is intentionally simple for reviewer/demo flows. In production, use a secure
-secrets store or database.
+Connected accounts are kept in a small SQLite database (``data/tokens.db``),
+one row per Facebook user: access token, expiry, granted scopes, Instagram
+business account id and page token. Browser sessions map a session cookie to
+an account so several businesses can be connected at once. The token
+scheduler's last ``debug_token`` result per account is kept here too, so every
+worker can answer ``/token/inspect`` (see utils/token_refresh.py).
+
+Reads are served from an in-memory copy that is loaded once per process and
+updated on every write, so request paths never touch the database. SQLite
+runs in WAL mode so readers and the single writer don't block each other.
+
+With several worker processes, each read first checks ``PRAGMA data_version``
+on a long-lived connection (a shared-memory lookup, no disk I/O); when another
+process has committed, the in-memory copy is reloaded.
+
+The old single ``token.json`` file is imported once as the ``legacy`` account.
+Read-only requests without a session use the only stored account, or the
+``legacy`` one, as the single token used to (see `default_account`); with
+several accounts and no legacy token there is no default.
 """
 import json
+import os
+import sqlite3
+import threading
+import time
+import secrets
+from contextlib import contextmanager
 from pathlib import Path
 from typing import Optional
 
-STORE_PATH = Path(__file__).parent / "data"
-STORE_PATH.mkdir(exist_ok=True)
+# everything the app writes lives here; DATA_DIR moves it (tests, load runs)
+STORE_PATH = Path(os.getenv("DATA_DIR") or Path(__file__).parent / "data")
+STORE_PATH.mkdir(parents=True, exist_ok=True)
 TOKEN_FILE = STORE_PATH / "token.json"
+DB_FILE = STORE_PATH / "tokens.db"
+
+LEGACY_ACCOUNT = "legacy"
+ACCOUNT_FIELDS = ("access_token", "expires_at", "scopes", "ig_id", "page_id", "page_token")
+
+_lock = threading.RLock()
+_accounts: Optional[dict] = None
+_sessions: Optional[dict] = None
+_token_states: Optional[dict] = None
+_watch: Optional[sqlite3.Connection] = None
+_data_version: Optional[int] = None
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(DB_FILE, timeout=10)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
 
 
-def save_token(token: str) -> None:
+@contextmanager
+def _db():
+    conn = _connect()
     try:
-        TOKEN_FILE.write_text(json.dumps({"access_token": token}))
-        print(f"Saved access token to {TOKEN_FILE}")
-    except Exception as e:
-        # Don't crash the app on save errors; log for debugging
-        print(f"Failed to save token to {TOKEN_FILE}: {e}")
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def _init_db(conn: sqlite3.Connection) -> None:
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS accounts (
+            account_id   TEXT PRIMARY KEY,
+            access_token TEXT NOT NULL,
+            expires_at   REAL,
+            scopes       TEXT,
+            ig_id        TEXT,
+            page_id      TEXT,
+            page_token   TEXT,
+            updated_at   REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS sessions (
+            session_id TEXT PRIMARY KEY,
+            account_id TEXT NOT NULL,
+            created_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS sessions_account ON sessions(account_id);
+        CREATE TABLE IF NOT EXISTS token_state (
+            account_id TEXT PRIMARY KEY,
+            state      TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        """
+    )
+
+
+def _row_to_account(row: sqlite3.Row) -> dict:
+    account = dict(row)
+    account["scopes"] = json.loads(account["scopes"]) if account.get("scopes") else []
+    return account
 
 
-def load_token() -> Optional[str]:
+def _import_legacy_token(conn: sqlite3.Connection) -> None:
     if not TOKEN_FILE.exists():
-        return None
+        return
     try:
-        data = json.loads(TOKEN_FILE.read_text())
-        return data.get("access_token")
+        token = json.loads(TOKEN_FILE.read_text()).get("access_token")
+    except FileNotFoundError:
+        # another worker imported it first
+        return
     except Exception:
         print(f"Failed to read token file {TOKEN_FILE}")
+        return
+    if token:
+        conn.execute(
+            "INSERT OR IGNORE INTO accounts (account_id, access_token, updated_at) VALUES (?, ?, ?)",
+            (LEGACY_ACCOUNT, token, time.time()),
+        )
+        print(f"Imported legacy token from {TOKEN_FILE} as account '{LEGACY_ACCOUNT}'")
+    TOKEN_FILE.unlink(missing_ok=True)
+
+
+def _current_data_version() -> int:
+    global _watch
+    if _watch is None:
+        _watch = sqlite3.connect(DB_FILE, timeout=10, check_same_thread=False)
+    return _watch.execute("PRAGMA data_version").fetchone()[0]
+
+
+def _load() -> None:
+    """Populate the in-memory cache from SQLite, again if another process wrote."""
+    global _accounts, _sessions, _token_states, _data_version
+    with _lock:
+        # read the version first so a write racing the reload isn't missed
+        version = _current_data_version()
+        if _accounts is not None and version == _data_version:
+            return
+        with _db() as conn:
+            _init_db(conn)
+            _import_legacy_token(conn)
+            _accounts = {row["account_id"]: _row_to_account(row) for row in conn.execute("SELECT * FROM accounts")}
+            _sessions = {row["session_id"]: row["account_id"] for row in conn.execute("SELECT * FROM sessions")}
+            _token_states = {row["account_id"]: json.loads(row["state"]) for row in conn.execute("SELECT * FROM token_state")}
+        _data_version = version
+
+
+def reload() -> None:
+    """Drop the in-memory cache so the next read goes back to SQLite."""
+    global _accounts, _sessions, _token_states
+    with _lock:
+        _accounts = None
+        _sessions = None
+        _token_states = None
+
+
+def save_account(account_id: str, access_token: Optional[str] = None, **fields) -> dict:
+    """Insert or update an account. Fields left as None keep their stored value."""
+    unknown = set(fields) - set(ACCOUNT_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown account fields: {sorted(unknown)}")
+    _load()
+    with _lock:
+        account = dict(_accounts.get(account_id) or {"account_id": account_id, "scopes": []})
+        if access_token is not None:
+            account["access_token"] = access_token
+        account.update({k: v for k, v in fields.items() if v is not None})
+        if not account.get("access_token"):
+            raise ValueError("access_token is required for a new account")
+        account["updated_at"] = time.time()
+        with _db() as conn:
+            conn.execute(
+                """
+                INSERT INTO accounts (account_id, access_token, expires_at, scopes, ig_id, page_id, page_token, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(account_id) DO UPDATE SET
+                    access_token=excluded.access_token, expires_at=excluded.expires_at,
+                    scopes=excluded.scopes, ig_id=excluded.ig_id, page_id=excluded.page_id,
+                    page_token=excluded.page_token, updated_at=excluded.updated_at
+                """,
+                (
+                    account_id,
+                    account["access_token"],
+                    account.get("expires_at"),
+                    json.dumps(account.get("scopes") or []),
+                    account.get("ig_id"),
+                    account.get("page_id"),
+                    account.get("page_token"),
+                    account["updated_at"],
+                ),
+            )
+        _accounts[account_id] = account
+        return dict(account)
+
+
+def get_account(account_id: str) -> Optional[dict]:
+    _load()
+    account = _accounts.get(account_id)
+    return dict(account) if account else None
+
+
+def list_accounts() -> list:
+    _load()
+    return [dict(a) for a in _accounts.values()]
+
+
+def default_account() -> Optional[dict]:
+    """The account for requests without a session: the only stored one, else the legacy one."""
+    _load()
+    with _lock:
+        if len(_accounts) == 1:
+            account = next(iter(_accounts.values()))
+        else:
+            account = _accounts.get(LEGACY_ACCOUNT)
+    return dict(account) if account else None
+
+
+def delete_account(account_id: str) -> None:
+    _load()
+    with _lock:
+        try:
+            with _db() as conn:
+                conn.execute("DELETE FROM accounts WHERE account_id = ?", (account_id,))
+                conn.execute("DELETE FROM sessions WHERE account_id = ?", (account_id,))
+                conn.execute("DELETE FROM token_state WHERE account_id = ?", (account_id,))
+        except sqlite3.Error as e:
+            print(f"Failed to delete account {account_id}: {e}")
+        _accounts.pop(account_id, None)
+        _token_states.pop(account_id, None)
+        for session_id in [s for s, a in _sessions.items() if a == account_id]:
+            del _sessions[session_id]
+
+
+def create_session(account_id: str) -> str:
+    _load()
+    session_id = secrets.token_urlsafe(32)
+    with _lock:
+        with _db() as conn:
+            conn.execute(
+                "INSERT INTO sessions (session_id, account_id, created_at) VALUES (?, ?, ?)",
+                (session_id, account_id, time.time()),
+            )
+        _sessions[session_id] = account_id
+    return session_id
+
+
+def get_session_account(session_id: Optional[str]) -> Optional[dict]:
+    if not session_id:
+        return None
+    _load()
+    account_id = _sessions.get(session_id)
+    return get_account(account_id) if account_id else None
+
+
+def delete_session(session_id: str) -> None:
+    _load()
+    with _lock:
+        with _db() as conn:
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        _sessions.pop(session_id, None)
+
+
+def get_token_state(account_id: str) -> Optional[dict]:
+    """Last debug_token result recorded for an account by any worker."""
+    _load()
+    state = _token_states.get(account_id)
+    return dict(state) if state else None
+
+
+def save_token_state(account_id: str, state: dict) -> None:
+    _load()
+    with _lock:
+        with _db() as conn:
+            conn.execute(
+                """
+                INSERT INTO token_state (account_id, state, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT(account_id) DO UPDATE SET state=excluded.state, updated_at=excluded.updated_at
+                """,
+                (account_id, json.dumps(state), time.time()),
+            )
+        _token_states[account_id] = dict(state)
+
+
+# Single-token helpers kept for scripts and older call sites; they operate on
+# the legacy account.
+def save_token(token: str, account_id: str = LEGACY_ACCOUNT) -> None:
+    try:
+        save_account(account_id, token)
+        print(f"Saved access token for account {account_id} to {DB_FILE}")
+    except Exception as e:
+        # Don't crash the app on save errors; log for debugging
+        print(f"Failed to save token to {DB_FILE}: {e}")
+
+
+def load_token(account_id: str = LEGACY_ACCOUNT) -> Optional[str]:
+    try:
+        account = get_account(account_id)
+    except sqlite3.Error:
+        print(f"Failed to read token store {DB_FILE}")
         return None
+    return account["access_token"] if account else None
 
 
-def clear_token() -> None:
+def clear_token(account_id: str = LEGACY_ACCOUNT) -> None:
     try:
-        if TOKEN_FILE.exists():
-            TOKEN_FILE.unlink()
+        delete_account(account_id)
     except Exception:
         pass
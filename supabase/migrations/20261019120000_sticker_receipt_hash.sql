@@ -0,0 +1,13 @@
+-- Content-addressed sticker receipts (routes/stickers.py store_receipt).
+--
+-- Receipts are stored once per SHA-256 at sha256/<hash> in the
+-- sticker-receipts bucket. A submission whose receipt was already sent by an
+-- earlier one points at it through probable_duplicate_of.
+
+alter table public.sticker_submissions
+  add column if not exists receipt_sha256 text,
+  add column if not exists probable_duplicate_of text;
+
+-- looked up on every submission
+create index if not exists sticker_submissions_receipt_sha256_idx
+  on public.sticker_submissions (receipt_sha256, submitted_at);
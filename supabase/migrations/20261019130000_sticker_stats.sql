@@ -0,0 +1,68 @@
+-- Typed sticker_count / amount_paid and the sticker_stats() function behind
+-- GET /api/stickers/stats.
+--
+-- Both columns used to be text. Existing values are converted in place with
+-- the patterns parse_count / parse_amount (routes/stickers.py) accept, so no
+-- value can abort the migration:
+--   sticker_count  a whole number from 1 to 999999999; anything else
+--                  ("2.5", "two", blank) becomes the column default, 1
+--   amount_paid    the currency sign and spaces are dropped ("₦10,000.50"
+--                  -> 10000.50); negatives, "1.234.56", "5.000,00" and blanks
+--                  become null
+
+alter table public.sticker_submissions
+  alter column sticker_count type integer
+    using case
+      when trim(sticker_count::text) ~ '^0*[1-9][0-9]{0,8}$' then trim(sticker_count::text)::integer
+      else 1
+    end,
+  alter column amount_paid type numeric(12, 2)
+    using case
+      when regexp_replace(amount_paid::text, '[^0-9.,-]', '', 'g')
+        ~ '^([0-9]{1,10}|[0-9]{1,3}(,[0-9]{3}){1,2}|[0-9],[0-9]{3},[0-9]{3},[0-9]{3})(\.[0-9]+)?$'
+      then replace(regexp_replace(amount_paid::text, '[^0-9.,-]', '', 'g'), ',', '')::numeric
+    end;
+
+alter table public.sticker_submissions
+  alter column sticker_count set default 1,
+  alter column sticker_count set not null;
+
+-- One small JSON document with every total the admin page shows.
+create or replace function public.sticker_stats()
+returns jsonb
+language sql
+stable
+as $$
+  with submissions as (
+    select
+      sticker_count,
+      coalesce(amount_paid, 0) as amount_paid,
+      coalesce(collected, false) as collected,
+      coalesce(nullif(lower(trim(payment_method)), ''), 'unknown') as payment_method
+    from public.sticker_submissions
+  ),
+  by_method as (
+    select
+      payment_method,
+      count(*) as submissions,
+      sum(sticker_count) as stickers,
+      sum(amount_paid) as amount_paid
+    from submissions
+    group by payment_method
+  )
+  select jsonb_build_object(
+    'submissions', (select count(*) from submissions),
+    'stickers', (select coalesce(sum(sticker_count), 0) from submissions),
+    'amount_paid', (select coalesce(sum(amount_paid), 0) from submissions),
+    'collected', (select count(*) from submissions where collected),
+    'pending', (select count(*) from submissions where not collected),
+    'stickers_collected', (select coalesce(sum(sticker_count), 0) from submissions where collected),
+    'stickers_pending', (select coalesce(sum(sticker_count), 0) from submissions where not collected),
+    'by_payment_method', coalesce(
+      (select jsonb_object_agg(payment_method, jsonb_build_object(
+        'submissions', submissions, 'stickers', stickers, 'amount_paid', amount_paid
+      )) from by_method),
+      '{}'::jsonb
+    )
+  );
+$$;
@@ -0,0 +1,60 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# test_output.txt is a saved UTF-16 log, not a doctest file
+collect_ignore = ["test_output.txt"]
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """storage.py backed by a fresh tokens.db in a temp dir."""
+    import storage
+
+    monkeypatch.setattr(storage, "STORE_PATH", tmp_path)
+    monkeypatch.setattr(storage, "TOKEN_FILE", tmp_path / "token.json")
+    monkeypatch.setattr(storage, "DB_FILE", tmp_path / "tokens.db")
+    monkeypatch.setattr(storage, "_watch", None)
+    monkeypatch.setattr(storage, "_data_version", None)
+    storage.reload()
+    yield storage
+    if storage._watch is not None:
+        storage._watch.close()
+    storage.reload()
+
+
+@pytest.fixture
+def client(store):
+    """The app without its lifespan (no background workers)."""
+    from starlette.testclient import TestClient
+
+    import main
+
+    return TestClient(main.app, base_url="https://testserver")
+
+
+@pytest.fixture
+def outbox_db(tmp_path, monkeypatch):
+    """utils/outbox.py on a fresh outbox.db in a temp dir."""
+    from utils import outbox
+
+    monkeypatch.setattr(outbox, "DB_FILE", tmp_path / "outbox.db")
+    monkeypatch.setattr(outbox, "_conn", None)
+    monkeypatch.setattr(outbox, "_owner", None)
+    yield outbox
+    if outbox._conn is not None:
+        outbox._conn.close()
+
+
+@pytest.fixture
+def webhook_logs(tmp_path, monkeypatch):
+    """Point the webhook and reply logs at a temp dir."""
+    from routes import api
+
+    for name, tail in api.log_tails.items():
+        monkeypatch.setattr(tail, "path", tmp_path / tail.path.name)
+    return api.log_tails
@@ -0,0 +1,80 @@
+"""Per-session accounts: one browser session can't see or change another's."""
+import pytest
+
+from routes import api
+
+
+@pytest.fixture
+def two_sessions(store):
+    store.save_account("alice", "alice-token-0001")
+    store.save_account("bob", "bob-token-0002")
+    return store.create_session("alice"), store.create_session("bob")
+
+
+def as_session(client, session_id):
+    client.cookies.clear()
+    if session_id:
+        client.cookies.set(api.SESSION_COOKIE, session_id)
+    return client
+
+
+def test_each_session_sees_only_its_own_token(client, two_sessions):
+    alice, bob = two_sessions
+    assert as_session(client, alice).get("/token/content").json()["token"] == "alic...0001"
+    assert as_session(client, bob).get("/token/content").json()["token"] == "bob-...0002"
+
+
+def test_delete_token_only_clears_the_sessions_account(client, store, two_sessions):
+    alice, bob = two_sessions
+    as_session(client, bob).delete("/token")
+    assert store.get_account("bob") is None
+    assert store.get_account("alice") is not None
+    assert as_session(client, alice).get("/token").json() == {"stored": True}
+
+
+def test_no_default_account_with_several_accounts(client, two_sessions):
+    anonymous = as_session(client, None)
+    assert anonymous.get("/token").json() == {"stored": False}
+    assert anonymous.get("/token/content").status_code == 404
+
+
+def test_single_account_is_the_default_for_reads_only(client, store, monkeypatch):
+    store.save_account("only", "only-token-0003")
+    anonymous = as_session(client, None)
+    assert anonymous.get("/token").json() == {"stored": True}
+
+    revoked = []
+
+    async def revoke(token):
+        revoked.append(token)
+        return True, {}
+
+    monkeypatch.setattr(api, "revoke_permissions_and_audit", revoke)
+    anonymous.cookies.set("csrf_token", "x")
+    r = anonymous.delete("/instagram/disconnect", headers={"X-CSRF-Token": "x"})
+    assert r.status_code == 400 and revoked == []
+    anonymous.delete("/token")
+    assert store.get_account("only") is not None
+
+
+def test_legacy_account_is_the_default_among_several(store):
+    store.save_account("alice", "alice-token")
+    store.save_account(store.LEGACY_ACCOUNT, "legacy-token")
+    store.save_account("alice", "alice-token-refreshed")
+    assert store.default_account()["account_id"] == store.LEGACY_ACCOUNT
+
+
+def test_disconnect_revokes_only_the_sessions_account(client, store, two_sessions, monkeypatch):
+    alice, bob = two_sessions
+    revoked = []
+
+    async def revoke(token):
+        revoked.append(token)
+        return True, {}
+
+    monkeypatch.setattr(api, "revoke_permissions_and_audit", revoke)
+    c = as_session(client, bob)
+    c.cookies.set("csrf_token", "x")
+    assert c.delete("/instagram/disconnect", headers={"X-CSRF-Token": "x"}).status_code == 200
+    assert revoked == ["bob-token-0002"]
+    assert store.get_account("alice") is not None
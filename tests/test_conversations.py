@@ -0,0 +1,65 @@
+from utils import conversations
+from utils.conversations import ConversationStore
+from utils.reply_providers import ReplyGenerator, RulesProvider, StubProvider
+
+T0 = 1_700_000_000.0
+
+
+def make_store(tmp_path, **kwargs):
+    return ConversationStore(path=tmp_path / "conversations.json", **kwargs)
+
+
+def test_provider_replies_skip_the_same_rule_cooldown(tmp_path):
+    store = make_store(tmp_path)
+    later = T0 + conversations.MIN_REPLY_GAP + 1
+    assert store.claim_reply("page", "alice", None, now=T0, cooldown=False)
+    assert store.claim_reply("page", "alice", None, now=later, cooldown=False)
+    assert store.get("page", "alice")["reply_count"] == 2
+
+
+def test_provider_replies_keep_the_minimum_gap(tmp_path):
+    store = make_store(tmp_path)
+    assert store.claim_reply("page", "alice", None, now=T0, cooldown=False)
+    assert not store.claim_reply("page", "alice", None, now=T0 + conversations.MIN_REPLY_GAP / 2, cooldown=False)
+
+
+def test_uses_provider_only_for_messages_no_rule_answers():
+    stub = ReplyGenerator(provider=StubProvider(delay=0))
+    assert stub.uses_provider(None)
+    assert not stub.uses_provider("pricing")
+    assert not ReplyGenerator(provider=RulesProvider()).uses_provider(None)
+
+
+def test_same_rule_answers_once_per_cooldown(tmp_path):
+    store = make_store(tmp_path)
+    assert store.claim_reply("page", "alice", "greeting", now=T0)
+    assert not store.claim_reply("page", "alice", "greeting", now=T0 + conversations.MIN_REPLY_GAP + 1)
+    assert store.claim_reply("page", "alice", "greeting", now=T0 + conversations.REPLY_COOLDOWN)
+
+
+def test_a_different_rule_only_waits_for_the_minimum_gap(tmp_path):
+    store = make_store(tmp_path)
+    assert store.claim_reply("page", "alice", "greeting", now=T0)
+    assert not store.claim_reply("page", "alice", "pricing", now=T0 + 1)
+    assert store.claim_reply("page", "alice", "pricing", now=T0 + conversations.MIN_REPLY_GAP)
+    assert store.get("page", "alice")["last_rule"] == "pricing"
+
+
+def test_conversations_are_throttled_separately(tmp_path):
+    store = make_store(tmp_path)
+    assert store.claim_reply("page", "alice", None, now=T0)
+    assert store.claim_reply("page", "bob", None, now=T0)
+    assert store.claim_reply("other-page", "alice", None, now=T0)
+
+
+def test_least_recently_seen_conversation_is_evicted(tmp_path):
+    store = make_store(tmp_path, maxsize=2)
+    store.touch("page", "alice", now=T0)
+    store.touch("page", "bob", now=T0 + 1)
+    store.touch("page", "alice", now=T0 + 2)
+    store.touch("page", "carol", now=T0 + 3)
+    assert len(store) == 2
+    assert store.get("page", "bob") is None
+    assert store.get("page", "alice")["message_count"] == 2
+    # an evicted conversation starts over: its cooldown is forgotten too
+    assert store.claim_reply("page", "bob", "greeting", now=T0 + 4)
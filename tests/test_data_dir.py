@@ -0,0 +1,25 @@
+"""DATA_DIR moves everything the app writes out of the repo's data/."""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+PATHS = """
+import json, main, storage
+from routes import api, web
+from utils import conversations, outbox, profiling
+print(json.dumps([str(p) for p in (
+    storage.DB_FILE, outbox.DB_FILE, conversations.conversations.path, api.log_tails["events"].path,
+    web.TEMPLATE_CACHE_DIR, profiling.PROFILE_DIR,
+)]))
+"""
+
+
+def test_data_dir_moves_every_data_file(tmp_path):
+    env = dict(os.environ, DATA_DIR=str(tmp_path))
+    out = subprocess.run([sys.executable, "-c", PATHS], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    paths = json.loads(out.stdout.strip().splitlines()[-1])
+    assert all(Path(path).is_relative_to(tmp_path) for path in paths), paths
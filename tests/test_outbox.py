@@ -0,0 +1,122 @@
+import asyncio
+import time
+
+import pytest
+
+EVENT = {"sender": {"id": "alice"}, "recipient": {"id": "page"}, "message": {"mid": "m-1", "text": "hi"}}
+
+
+def test_retry_backs_off_exponentially_then_fails(outbox_db):
+    outbox = outbox_db
+    item_id = outbox.enqueue("alice", "Hello!", recipient_id="page")
+    for attempt in range(1, outbox.MAX_ATTEMPTS):
+        before = time.time()
+        assert outbox.record_result(item_id, outbox.RETRY, "HTTP 503") == "pending"
+        item = outbox.get(item_id)
+        assert item["attempts"] == attempt
+        assert item["next_attempt_at"] - before == pytest.approx(outbox.BACKOFF * 2 ** (attempt - 1), abs=1)
+    assert outbox.record_result(item_id, outbox.RETRY, "HTTP 503") == "failed"
+    assert outbox.counts() == {"failed": 1}
+
+
+def test_pending_items_are_due_after_their_backoff(outbox_db):
+    outbox = outbox_db
+    item_id = outbox.enqueue("alice", "Hello!")
+    outbox.record_result(item_id, outbox.RETRY, "timeout")
+    due_at = outbox.get(item_id)["next_attempt_at"]
+    assert outbox._claim_due(due_at - 1) == []
+    assert [item["id"] for item in outbox._claim_due(due_at)] == [item_id]
+
+
+def test_expired_lease_is_claimed_again(outbox_db):
+    outbox = outbox_db
+    item_id = outbox.enqueue("alice", "Hello!")
+    now = time.time()
+    # the sender still holds it
+    assert outbox._claim_due(now) == []
+    claimed = outbox._claim_due(now + outbox.LEASE + 1)
+    assert [item["id"] for item in claimed] == [item_id]
+    item = outbox.get(item_id)
+    assert item["status"] == "sending"
+    assert item["lease_until"] > now + outbox.LEASE
+    # leased again: nobody else gets it until this lease runs out too
+    assert outbox._claim_due(now + outbox.LEASE + 2) == []
+
+
+def test_duplicate_mid_is_recorded_once(outbox_db):
+    outbox = outbox_db
+    first = outbox.receive([("m-1", EVENT, "page")])
+    again = outbox.receive([("m-1", EVENT, "page"), ("m-2", EVENT, "page")])
+    assert first[0] is not None
+    assert again[0] is None and again[1] is not None
+
+
+def test_unfinished_event_is_redriven_after_its_lease(outbox_db):
+    outbox = outbox_db
+    [inbox_id] = outbox.receive([("m-1", EVENT, "page")])
+    now = time.time()
+    assert outbox._claim_unfinished(now) == []
+    [row] = outbox._claim_unfinished(now + outbox.INBOX_LEASE + 1)
+    assert row["id"] == inbox_id
+    assert row["event"] == EVENT
+    attempts = outbox._connection().execute("SELECT attempts FROM inbox WHERE id = ?", (inbox_id,)).fetchone()[0]
+    assert attempts == 1
+    outbox.finish_event(inbox_id)
+    assert outbox.counts("inbox") == {"done": 1}
+
+
+def test_event_that_keeps_failing_is_given_up(outbox_db):
+    outbox = outbox_db
+    outbox.receive([("m-1", EVENT, "page")])
+    now = time.time()
+    for attempt in range(outbox.MAX_ATTEMPTS):
+        now += outbox.INBOX_LEASE + 1
+        assert len(outbox._claim_unfinished(now)) == 1
+    assert outbox._claim_unfinished(now + outbox.INBOX_LEASE + 1) == []
+    assert outbox.counts("inbox") == {"failed": 1}
+
+
+def test_worker_hands_unfinished_events_to_redrive(outbox_db, monkeypatch):
+    outbox = outbox_db
+    monkeypatch.setattr(outbox, "INBOX_LEASE", -1)  # leases are already expired
+    outbox.receive([("m-1", EVENT, "page")])
+    redriven = []
+
+    async def deliver(item):
+        return outbox.SENT, None
+
+    worker = outbox.OutboxWorker(deliver, redrive=redriven.append)
+    assert asyncio.run(worker.redrive_unfinished()) == 1
+    assert [row["event"] for row in redriven] == [EVENT]
+
+
+def test_event_interrupted_mid_reply_is_partial_not_redriven(outbox_db, monkeypatch):
+    outbox = outbox_db
+    [inbox_id] = outbox.receive([("m-1", EVENT, "page")])
+    # the first segment was recorded, then the process died
+    outbox.enqueue("alice", "First part of the answer.", recipient_id="page", inbox_id=inbox_id)
+    now = time.time() + outbox.INBOX_LEASE + 1
+    assert outbox._claim_unfinished(now) == []
+    assert outbox.counts("inbox") == {"partial": 1}
+    # the recorded segment is still delivered
+    assert len(outbox._claim_due(now + outbox.LEASE)) == 1
+    assert outbox.prune(now + outbox.RETENTION + 1) == 1
+    assert outbox.counts("inbox") == {}
+
+
+def test_worker_delivers_due_items(outbox_db):
+    outbox = outbox_db
+    item_id = outbox.enqueue("alice", "Hello!")
+    outbox.record_result(item_id, outbox.RETRY, "timeout")
+    outbox._connection().execute("UPDATE outbox SET next_attempt_at = 0 WHERE id = ?", (item_id,))
+    delivered, results = [], []
+
+    async def deliver(item):
+        delivered.append(item["text"])
+        return outbox.SENT, None
+
+    worker = outbox.OutboxWorker(deliver, on_result=lambda item, status: results.append(status))
+    assert asyncio.run(worker.run_once()) == 1
+    assert delivered == ["Hello!"]
+    assert results == ["sent"]
+    assert outbox.get(item_id)["attempts"] == 2
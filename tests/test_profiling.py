@@ -0,0 +1,57 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from utils import profiling
+from utils.profiling import sign_profile_path, signature_valid
+
+SECRET = "profile-secret"
+
+
+def test_signature_is_valid_for_its_path_until_it_expires():
+    signature = sign_profile_path("/webhook/status", SECRET, ttl=60)
+    assert signature_valid("/webhook/status", signature, SECRET)
+    assert not signature_valid("/webhook", signature, SECRET)
+    assert not signature_valid("/webhook/status", signature, "other-secret")
+
+
+def test_expired_signature_is_rejected():
+    assert not signature_valid("/webhook/status", sign_profile_path("/webhook/status", SECRET, ttl=-1), SECRET)
+
+
+@pytest.mark.parametrize("forge", [
+    # pushing the expiry out invalidates the HMAC
+    lambda sig: str(int(time.time()) + 86400) + sig[sig.index("."):],
+    # the old path-only signature format
+    lambda sig: sig.partition(".")[2],
+    lambda sig: "",
+    lambda sig: "soon." + sig.partition(".")[2],
+])
+def test_tampered_signature_is_rejected(forge):
+    signature = sign_profile_path("/webhook/status", SECRET, ttl=-10)
+    assert not signature_valid("/webhook/status", forge(signature), SECRET)
+
+
+def test_only_signed_requests_are_profiled(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", tmp_path)
+
+    async def ok(request):
+        return PlainTextResponse("ok")
+
+    app = profiling.RequestProfilerMiddleware(Starlette(routes=[Route("/ok", ok)]), secret=SECRET)
+
+    async def get(**kwargs):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://testserver") as client:
+            return await client.get("/ok", **kwargs)
+
+    expired = sign_profile_path("/ok", SECRET, ttl=-1)
+    assert asyncio.run(get(headers={"X-Profile-Signature": expired})).text == "ok"
+    assert list(tmp_path.iterdir()) == []
+    signed = sign_profile_path("/ok", SECRET)
+    assert asyncio.run(get(params={"_profile": signed})).text == "ok"
+    assert len(list(tmp_path.iterdir())) == 1
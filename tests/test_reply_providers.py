@@ -0,0 +1,101 @@
+import asyncio
+
+from utils import reply_providers
+from utils.reply_providers import (
+    MAX_MESSAGE_CHARS, ReplyGenerator, ReplyProvider, ReplyRequest, StubProvider, split_segment,
+)
+
+STATIC = "Hi there! 👋 This is Grace. How can I help you today?"
+
+
+class FailingProvider(ReplyProvider):
+    name = "failing"
+
+    async def stream(self, request):
+        raise RuntimeError("backend down")
+        yield
+
+
+class HangingProvider(ReplyProvider):
+    name = "hanging"
+
+    async def stream(self, request):
+        await asyncio.sleep(60)
+        yield "too late"
+
+
+def request(rule=None, message="do you ship to Lagos?"):
+    return ReplyRequest(message, "alice", "page", rule=rule, static_reply=STATIC)
+
+
+def collect(generator, req):
+    async def run():
+        return [message async for message in generator.segments(req)]
+    return asyncio.run(run())
+
+
+def test_stub_provider_answers_unmatched_messages():
+    stub = StubProvider(delay=0)
+    req = request()
+    assert collect(ReplyGenerator(provider=stub), req) == [stub.text_for(req)]
+
+
+def test_explicit_rules_take_precedence_over_the_provider():
+    assert collect(ReplyGenerator(provider=StubProvider(delay=0)), request(rule="greeting")) == [STATIC]
+
+
+def test_provider_error_falls_back_to_the_static_reply():
+    assert collect(ReplyGenerator(provider=FailingProvider()), request()) == [STATIC]
+
+
+def test_provider_timeout_falls_back_to_the_static_reply():
+    assert collect(ReplyGenerator(provider=HangingProvider(), timeout=0.05), request()) == [STATIC]
+
+
+def test_no_free_slot_falls_back_to_the_static_reply(monkeypatch):
+    monkeypatch.setattr(reply_providers, "REPLY_SLOT_WAIT", 0.05)
+    generator = ReplyGenerator(provider=StubProvider(delay=0), concurrency=1)
+
+    async def run():
+        await generator._semaphore.acquire()  # every slot busy
+        return [message async for message in generator.segments(request())]
+
+    assert asyncio.run(run()) == [STATIC]
+
+
+def test_split_segment_waits_for_a_sentence_boundary():
+    sentence = "This sentence is long enough to be worth sending on its own right away. " * 3
+    messages, rest = split_segment(sentence + "And this one is still being")
+    assert messages == [sentence.strip()]
+    assert rest == "And this one is still being"
+    assert split_segment("Too short to send yet.") == ([], "Too short to send yet.")
+
+
+def test_split_segment_never_exceeds_the_message_limit():
+    text = "word " * (MAX_MESSAGE_CHARS // 2)
+    messages, rest = split_segment(text, final=True)
+    assert rest == ""
+    assert len(messages) == 3
+    assert all(len(message) <= MAX_MESSAGE_CHARS for message in messages)
+    assert " ".join(messages) == text.strip()
+
+
+def test_split_segment_cuts_unbroken_text_at_the_limit():
+    messages, rest = split_segment("x" * (MAX_MESSAGE_CHARS + 5), final=True)
+    assert [len(message) for message in messages] == [MAX_MESSAGE_CHARS, 5]
+    assert rest == ""
+
+
+class BrokenMidStreamProvider(ReplyProvider):
+    name = "broken"
+    first = "This first sentence is long enough that it goes out before the backend fails. " * 3
+
+    async def stream(self, request):
+        yield self.first
+        yield "The second sentence was cut"
+        raise RuntimeError("connection reset")
+
+
+def test_mid_stream_error_sends_the_text_generated_so_far():
+    messages = collect(ReplyGenerator(provider=BrokenMidStreamProvider()), request())
+    assert messages == [BrokenMidStreamProvider.first.strip(), "The second sentence was cut"]
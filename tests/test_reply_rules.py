@@ -0,0 +1,95 @@
+import json
+import os
+
+import pytest
+
+from utils.reply_rules import CompiledRules, ReplyRules, literal_prefix
+
+ORDER = {"name": "order", "regex": r"\border\s*#?(?P<order_id>\d{4,})", "reply": "Checking order {order_id}"}
+PRICING = {"name": "pricing", "keywords": ["price", "order"], "reply": "Prices at {site}"}
+FRENCH = {"name": "french", "language": "fr", "reply": "Bonjour !"}
+
+
+def names(rules, *messages):
+    compiled = CompiledRules({"variables": {"site": "example.com"}, "rules": rules})
+    return [compiled.reply_for(message)[0] for message in messages]
+
+
+@pytest.mark.parametrize("rules, expected", [
+    ([ORDER, PRICING, FRENCH], "order"),
+    ([PRICING, ORDER, FRENCH], "pricing"),
+    ([FRENCH, ORDER, PRICING], "french"),
+])
+def test_first_matching_rule_in_file_order_wins(rules, expected):
+    assert names(rules, "Bonjour, où est ma order #12345 merci ?") == [expected]
+
+
+def test_each_kind_of_rule_still_matches_on_its_own():
+    assert names([ORDER, PRICING, FRENCH], "order 98765", "what's the price?", "Bonjour, merci beaucoup") == [
+        "order", "pricing", "french",
+    ]
+    assert CompiledRules({"rules": [ORDER]}).reply_for("order #4321")[1] == "Checking order 4321"
+
+
+def test_keywords_match_whole_words_and_word_prefixes():
+    how = {"name": "how", "keywords": ["how"], "reply": "how"}
+    how_much = {"name": "how_much", "keywords": ["how much"], "reply": "how much"}
+    # "how" is a word-prefix of "how much": the earlier rule wins either way
+    assert names([how, how_much], "how much is it?", "so how are you") == ["how", "how"]
+    assert names([how_much, how], "how  much is it?", "so how are you") == ["how_much", "how"]
+    assert names([how], "however you like", "showhow") == [None, None]
+
+
+def test_matched_keyword_is_the_rules_own_keyword():
+    compiled = CompiledRules({"rules": [
+        {"name": "how", "keywords": ["how"], "reply": "matched {keyword}"},
+        {"name": "how_much", "keywords": ["how much"], "reply": "matched {keyword}"},
+    ]})
+    assert compiled.reply_for("HOW MUCH for two?") == ("how", "matched HOW")
+
+
+@pytest.mark.parametrize("pattern, literal", [
+    (r"\border\s*#", "order"),
+    (r"^Refund", "refund"),
+    (r"colou?r", "colo"),
+    (r"a\.b\?", "a.b?"),
+    (r"\d+ items", ""),
+    (r"order|invoice", ""),
+    (r"(?:refund|return) please", ""),
+    (r"size\|fit", "size|fit"),
+])
+def test_literal_prefix(pattern, literal):
+    assert literal_prefix(pattern) == literal
+
+
+def test_regex_rules_without_a_literal_prefix_still_run():
+    rules = [
+        {"name": "returns", "regex": r"(?:refund|return)s?\b", "reply": "returns"},
+        {"name": "escaped", "regex": r"size\|fit", "reply": "escaped"},
+    ]
+    assert names(rules, "Can I get a REFUND?", "which size|fit?", "nothing here") == ["returns", "escaped", None]
+
+
+def write_rules(path, rules, mtime):
+    path.write_text(json.dumps({"rules": rules}) if isinstance(rules, list) else rules, encoding="utf-8")
+    os.utime(path, (mtime, mtime))
+
+
+@pytest.mark.parametrize("bad_edit", [
+    '{"rules": [',
+    json.dumps({"rules": [{"name": "broken", "regex": "order(", "reply": "x"}]}),
+    json.dumps({"rules": [{"name": "no_reply", "keywords": ["price"]}]}),
+])
+def test_reload_keeps_the_old_rules_on_a_bad_edit(tmp_path, bad_edit):
+    path = tmp_path / "reply_rules.json"
+    write_rules(path, [PRICING], 1_000)
+    rules = ReplyRules(path)
+    assert rules.reply_for("price?")[0] == "pricing"
+
+    write_rules(path, bad_edit, 2_000)
+    assert rules.reload() is False
+    assert rules.reply_for("price?")[0] == "pricing"
+
+    write_rules(path, [ORDER], 3_000)
+    assert rules.reload() is True
+    assert rules.reply_for("price?")[0] is None
@@ -0,0 +1,90 @@
+"""
+Cold-start budget tests.
+
+    python -m pytest tests/test_startup_time.py
+
+1. `import main` in a fresh interpreter (fastest of a few runs) must stay
+   within STARTUP_IMPORT_BUDGET_MS.
+2. The time from launching uvicorn until GET /webhook (Meta's verification
+   handshake) answers must stay within STARTUP_WEBHOOK_BUDGET_MS.
+
+A failed import budget lists the slowest imports (python -X importtime).
+"""
+
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+IMPORT_BUDGET_MS = int(os.getenv("STARTUP_IMPORT_BUDGET_MS", "1000"))
+WEBHOOK_BUDGET_MS = int(os.getenv("STARTUP_WEBHOOK_BUDGET_MS", "3000"))
+RUNS = 3
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def measure_import() -> float:
+    code = "import time; t = time.perf_counter(); import main; print((time.perf_counter() - t) * 1000)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(limit: int = 10) -> list:
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=ROOT, capture_output=True, text=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_webhook_ready() -> float:
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/webhook"
+    params = {"hub.mode": "subscribe", "hub.verify_token": os.getenv("WEBHOOK_VERIFY_TOKEN", "grace_webhook_token"), "hub.challenge": "ready"}
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = start + max(WEBHOOK_BUDGET_MS * 3, 10000) / 1000
+        while time.perf_counter() < deadline:
+            try:
+                r = httpx.get(url, params=params, timeout=1)
+                if r.status_code == 200 and r.text == "ready":
+                    return (time.perf_counter() - start) * 1000
+            except httpx.TransportError:
+                pass
+            time.sleep(0.02)
+        raise AssertionError("webhook verification never answered")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def test_import_budget():
+    import_ms = min(measure_import() for _ in range(RUNS))
+    if import_ms > IMPORT_BUDGET_MS:
+        slowest = "\n".join(f"{us / 1000:8.1f}ms  {name}" for us, name in slowest_imports())
+        raise AssertionError(
+            f"import main took {import_ms:.0f}ms (budget {IMPORT_BUDGET_MS}ms)\nSlowest imports (cumulative):\n{slowest}"
+        )
+
+
+def test_webhook_ready_budget():
+    ready_ms = measure_webhook_ready()
+    assert ready_ms <= WEBHOOK_BUDGET_MS, f"GET /webhook answered after {ready_ms:.0f}ms (budget {WEBHOOK_BUDGET_MS}ms)"
@@ -0,0 +1,102 @@
+import gzip
+import hashlib
+import os
+
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Mount
+from starlette.testclient import TestClient
+
+from utils.static import IMMUTABLE, REVALIDATE, PrecompressedStaticFiles
+
+CSS = b"body { color: #333; margin: 0; padding: 0; }\n" * 40
+
+
+@pytest.fixture
+def static_dir(tmp_path):
+    (tmp_path / "site.css").write_bytes(CSS)
+    (tmp_path / "site.0123abcd89.css").write_bytes(CSS)
+    return tmp_path
+
+
+@pytest.fixture
+def client(static_dir):
+    app = Starlette(routes=[Mount("/static", PrecompressedStaticFiles(directory=static_dir))])
+    return TestClient(app)
+
+
+def add_variant(static_dir, suffix, data, age=0):
+    variant = static_dir / f"site.css{suffix}"
+    variant.write_bytes(data)
+    original = (static_dir / "site.css").stat().st_mtime
+    os.utime(variant, (original - age, original - age))
+
+
+@pytest.mark.parametrize("url, cache_control", [
+    ("/static/site.0123abcd89.css", IMMUTABLE),
+    ("/static/site.css", REVALIDATE),
+    (f"/static/site.css?v={hashlib.sha256(CSS).hexdigest()[:10]}", IMMUTABLE),
+    (f"/static/site.css?v={hashlib.sha256(CSS).hexdigest().upper()}", IMMUTABLE),
+    (f"/static/site.css?v={hashlib.sha256(b'old').hexdigest()[:10]}", REVALIDATE),
+    ("/static/site.css?v=2", REVALIDATE),
+    ("/static/site.css?v=", REVALIDATE),
+    ("/static/site.css?dev=1", REVALIDATE),
+])
+def test_only_matching_fingerprints_are_immutable(client, url, cache_control):
+    r = client.get(url, headers={"Accept-Encoding": "identity"})
+    assert r.status_code == 200
+    assert r.headers["cache-control"] == cache_control
+
+
+def test_version_param_is_rechecked_after_an_edit(client, static_dir):
+    url = f"/static/site.css?v={hashlib.sha256(CSS).hexdigest()[:10]}"
+    assert client.get(url).headers["cache-control"] == IMMUTABLE
+    path = static_dir / "site.css"
+    path.write_bytes(CSS + b"a { color: red; }\n")
+    os.utime(path, (path.stat().st_mtime + 5, path.stat().st_mtime + 5))
+    assert client.get(url).headers["cache-control"] == REVALIDATE
+
+
+def test_conditional_requests_get_304(client):
+    first = client.get("/static/site.css", headers={"Accept-Encoding": "identity"})
+    etag, modified = first.headers["etag"], first.headers["last-modified"]
+    for conditional in ({"If-None-Match": etag}, {"If-Modified-Since": modified}):
+        r = client.get("/static/site.css", headers={"Accept-Encoding": "identity", **conditional})
+        assert r.status_code == 304
+        assert r.content == b""
+        assert r.headers["cache-control"] == REVALIDATE
+    stale = client.get("/static/site.css", headers={"Accept-Encoding": "identity", "If-None-Match": '"other"'})
+    assert stale.status_code == 200
+
+
+def test_each_encoding_has_its_own_etag(client, static_dir):
+    add_variant(static_dir, ".gz", gzip.compress(CSS))
+    plain = client.get("/static/site.css", headers={"Accept-Encoding": "identity"})
+    packed = client.get("/static/site.css", headers={"Accept-Encoding": "gzip"})
+    assert plain.headers["etag"] != packed.headers["etag"]
+    r = client.get("/static/site.css", headers={"Accept-Encoding": "gzip", "If-None-Match": packed.headers["etag"]})
+    assert r.status_code == 304
+
+
+@pytest.mark.parametrize("accept, encoding", [
+    ("gzip, deflate, br", "br"),
+    ("gzip", "gzip"),
+    ("br;q=0, gzip", "gzip"),
+    ("*", "br"),
+    ("identity", None),
+    ("", None),
+])
+def test_best_accepted_variant_is_served(client, static_dir, accept, encoding):
+    add_variant(static_dir, ".gz", gzip.compress(CSS))
+    add_variant(static_dir, ".br", b"brotli bytes")
+    r = client.get("/static/site.css", headers={"Accept-Encoding": accept})
+    assert r.headers.get("content-encoding") == encoding
+    assert r.headers["vary"] == "Accept-Encoding"
+    assert r.headers["content-type"].startswith("text/css")
+
+
+def test_variants_older_than_the_file_are_ignored(client, static_dir):
+    add_variant(static_dir, ".gz", gzip.compress(b"stale"), age=60)
+    r = client.get("/static/site.css", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in r.headers
+    assert r.content == CSS
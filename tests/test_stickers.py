@@ -0,0 +1,67 @@
+import hashlib
+
+import httpx
+import pytest
+from fastapi import HTTPException
+from supabase import create_client
+from supabase.lib.client_options import SyncClientOptions
+
+from benchmarks.stubs import SupabaseStub, sample_submission
+from routes.stickers import BUCKET, parse_amount, store_receipt
+
+RECEIPT = b"\x89PNG receipt bytes"
+SHA256 = hashlib.sha256(RECEIPT).hexdigest()
+
+
+@pytest.mark.parametrize("value, amount", [
+    ("", None),
+    ("   ", None),
+    (None, None),
+    ("10000", 10000.0),
+    ("₦10,000.50", 10000.5),
+    ("N 2,500", 2500.0),
+    (7500, 7500.0),
+])
+def test_parse_amount(value, amount):
+    assert parse_amount(value) == amount
+
+
+@pytest.mark.parametrize("value", ["abc", "N/A", "₦", "-", "-500", "10.000.00", "1,00"])
+def test_parse_amount_rejects_what_isnt_an_amount(value):
+    with pytest.raises(HTTPException) as e:
+        parse_amount(value)
+    assert e.value.status_code == 400
+
+
+@pytest.fixture
+def supabase():
+    stub = SupabaseStub()
+    http = httpx.Client(transport=httpx.WSGITransport(app=stub), timeout=10)
+    client = create_client("http://supabase.test", "test.test.test", options=SyncClientOptions(httpx_client=http))
+    yield stub, client
+    http.close()
+
+
+def test_new_receipt_is_uploaded_under_its_hash(supabase):
+    stub, sb = supabase
+    assert store_receipt(sb, RECEIPT, SHA256, "image/png") == (f"sha256/{SHA256}", None)
+    assert list(stub.objects) == [f"{BUCKET}/sha256/{SHA256}"]
+
+
+def test_receipt_already_submitted_is_reused(supabase):
+    stub, sb = supabase
+    earlier = [dict(sample_submission(i), receipt_sha256=SHA256) for i in (2, 1)]
+    stub.tables["sticker_submissions"].extend(earlier)
+    path, duplicate_of = store_receipt(sb, RECEIPT, SHA256, "image/png")
+    assert path == f"sha256/{SHA256}"
+    # flagged against the first submission that sent it
+    assert duplicate_of == min(earlier, key=lambda row: row["submitted_at"])["id"]
+    assert stub.uploads == 0
+
+
+def test_receipt_stored_by_a_failed_submission_is_reused(supabase):
+    stub, sb = supabase
+    # uploaded, but its submission row was never written
+    stub.objects[f"{BUCKET}/sha256/{SHA256}"] = b""
+    assert store_receipt(sb, RECEIPT, SHA256, "image/png") == (f"sha256/{SHA256}", None)
+    assert stub.uploads == 0
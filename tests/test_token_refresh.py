@@ -0,0 +1,66 @@
+"""debug_token results are shared between workers through tokens.db."""
+import asyncio
+
+import pytest
+
+from routes import api
+from utils import token_refresh
+
+DEBUG_BODY = {"data": {"is_valid": True, "expires_at": 1_900_000_000, "scopes": ["instagram_basic"]}}
+
+
+class FakeResponse:
+    status_code = 200
+
+    def json(self):
+        return DEBUG_BODY
+
+
+class FakeClient:
+    def __init__(self):
+        self.calls = 0
+
+    async def get(self, url, params=None):
+        self.calls += 1
+        return FakeResponse()
+
+
+@pytest.fixture
+def graph(monkeypatch):
+    monkeypatch.setenv("FACEBOOK_APP_ID", "app-id")
+    monkeypatch.setenv("FACEBOOK_APP_SECRET", "app-secret")
+    fake = FakeClient()
+    monkeypatch.setattr(token_refresh, "get_http_client", lambda: fake)
+    return fake
+
+
+def test_checked_state_is_visible_to_other_workers(store, graph):
+    store.save_account("alice", "alice-token-0001")
+    asyncio.run(token_refresh.check_token(store.get_account("alice")))
+
+    store.reload()  # what another worker sees: only tokens.db
+    state = token_refresh.get_token_state("alice")
+    assert state["valid"] is True
+    assert state["debug"] == DEBUG_BODY
+    assert store.get_account("alice")["scopes"] == ["instagram_basic"]
+
+
+def test_inspect_reads_the_recorded_state(client, store, graph):
+    store.save_account("alice", "alice-token-0001")
+    session_id = store.create_session("alice")
+    client.cookies.set(api.SESSION_COOKIE, session_id)
+    asyncio.run(token_refresh.check_token(store.get_account("alice")))
+    store.reload()
+
+    r = client.get("/token/inspect")
+    assert r.status_code == 200
+    assert r.json()["data"] == DEBUG_BODY["data"]
+    assert graph.calls == 1
+
+
+def test_disconnecting_drops_the_recorded_state(store, graph):
+    store.save_account("alice", "alice-token-0001")
+    asyncio.run(token_refresh.check_token(store.get_account("alice")))
+    store.delete_account("alice")
+    store.reload()
+    assert token_refresh.get_token_state("alice") is None
@@ -0,0 +1,56 @@
+"""X-Hub-Signature-256 checks on POST /webhook, and what gets forwarded."""
+import hashlib
+import hmac
+import json
+
+import pytest
+
+BODY = json.dumps({"object": "instagram", "entry": []}).encode()
+
+
+def signature(secret: str, body: bytes = BODY) -> str:
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+@pytest.fixture
+def published(monkeypatch, outbox_db, webhook_logs):
+    from utils.forwarding import forwarder
+
+    bodies = []
+    monkeypatch.setattr(forwarder, "publish", bodies.append)
+    return bodies
+
+
+@pytest.fixture(autouse=True)
+def no_secrets(monkeypatch):
+    monkeypatch.delenv("FACEBOOK_APP_SECRET", raising=False)
+    monkeypatch.delenv("INSTAGRAM_CLIENT_SECRET", raising=False)
+
+
+@pytest.mark.parametrize("variable", ["FACEBOOK_APP_SECRET", "INSTAGRAM_CLIENT_SECRET"])
+def test_signed_webhook_is_accepted_and_forwarded(client, published, monkeypatch, variable):
+    monkeypatch.setenv(variable, "app-secret")
+    r = client.post("/webhook", content=BODY, headers={"X-Hub-Signature-256": signature("app-secret")})
+    assert r.status_code == 200
+    assert published == [BODY]
+
+
+def test_bad_or_missing_signature_is_rejected(client, published, monkeypatch):
+    monkeypatch.setenv("INSTAGRAM_CLIENT_SECRET", "app-secret")
+    assert client.post("/webhook", content=BODY, headers={"X-Hub-Signature-256": signature("other")}).status_code == 403
+    assert client.post("/webhook", content=BODY).status_code == 403
+    assert published == []
+
+
+def test_without_a_secret_webhooks_are_accepted_but_not_forwarded(client, published):
+    assert client.post("/webhook", content=BODY).status_code == 200
+    assert published == []
+
+
+def test_forwarder_warns_when_it_cannot_verify(monkeypatch, capsys):
+    from utils import forwarding
+
+    forwarder = forwarding.WebhookForwarder(["https://crm.example.com/hook"])
+    monkeypatch.setattr(forwarding.ForwardTarget, "start", lambda self: None)
+    forwarder.start()
+    assert "webhooks can't be verified" in capsys.readouterr().out
@@ -0,0 +1,177 @@
+"""Per-conversation state for the DM auto-responder.
+
+State is keyed by (page id, sender id) and kept in an in-memory LRU:
+first/last seen, message count, last reply time and which rule answered
+last. `claim_reply` decides whether a message gets an answer:
+
+- no two replies within MIN_REPLY_GAP seconds (rapid-fire messages get one);
+- the same rule (including the default reply) answers at most once per
+  REPLY_COOLDOWN seconds, so follow-ups don't receive the greeting again.
+  Replies written by a conversational provider (REPLY_PROVIDER) are new text
+  every time, so they skip this cooldown (``cooldown=False``) and only keep
+  the MIN_REPLY_GAP spacing.
+
+The hot path never touches the disk. A background task snapshots dirty
+state to ``data/conversations.json`` every SNAPSHOT_INTERVAL seconds (and on
+shutdown); the snapshot is loaded at startup. With several workers each
+snapshot merges with the file on disk, newest ``last_seen`` wins.
+
+Tuning (env):
+- CONVERSATION_CACHE_SIZE     conversations kept in memory (default 50000)
+- CONVERSATION_COOLDOWN       REPLY_COOLDOWN in seconds (default 600)
+- CONVERSATION_MIN_GAP        MIN_REPLY_GAP in seconds (default 10)
+- CONVERSATION_SNAPSHOT_EVERY SNAPSHOT_INTERVAL in seconds (default 60)
+"""
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+import storage
+
+SNAPSHOT_FILE = storage.STORE_PATH / "conversations.json"
+MAX_CONVERSATIONS = int(os.getenv("CONVERSATION_CACHE_SIZE", "50000"))
+REPLY_COOLDOWN = float(os.getenv("CONVERSATION_COOLDOWN", "600"))
+MIN_REPLY_GAP = float(os.getenv("CONVERSATION_MIN_GAP", "10"))
+SNAPSHOT_INTERVAL = float(os.getenv("CONVERSATION_SNAPSHOT_EVERY", "60"))
+DEFAULT_RULE = "default"
+
+
+class ConversationStore:
+    def __init__(self, path: Path = SNAPSHOT_FILE, maxsize: int = MAX_CONVERSATIONS, interval: float = SNAPSHOT_INTERVAL):
+        self.path = Path(path)
+        self.maxsize = maxsize
+        self.interval = interval
+        self._states = OrderedDict()
+        self._dirty = False
+        self._task: Optional[asyncio.Task] = None
+        # replaceable so replays can run on the archived events' timestamps
+        self.clock = time.time
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    @staticmethod
+    def _key(page_id: Optional[str], sender_id: str) -> str:
+        return f"{page_id or ''}:{sender_id}"
+
+    def get(self, page_id: Optional[str], sender_id: str) -> Optional[dict]:
+        state = self._states.get(self._key(page_id, sender_id))
+        return dict(state) if state else None
+
+    def touch(self, page_id: Optional[str], sender_id: str, now: Optional[float] = None) -> dict:
+        """Record an incoming message and return the conversation's state."""
+        now = now or self.clock()
+        key = self._key(page_id, sender_id)
+        state = self._states.get(key)
+        if state is None:
+            state = {"first_seen": now, "last_seen": now, "message_count": 0, "reply_count": 0, "last_reply_at": None, "last_rule": None}
+            self._states[key] = state
+            if len(self._states) > self.maxsize:
+                self._states.popitem(last=False)
+        else:
+            self._states.move_to_end(key)
+        state["last_seen"] = now
+        state["message_count"] += 1
+        self._dirty = True
+        return state
+
+    def claim_reply(self, page_id: Optional[str], sender_id: str, rule: Optional[str], now: Optional[float] = None,
+                    cooldown: bool = True) -> bool:
+        """True (and the reply is recorded) if this conversation may be answered now.
+
+        `cooldown` applies the same-rule REPLY_COOLDOWN; without it only
+        MIN_REPLY_GAP is enforced.
+
+        Check and record happen without awaiting, so concurrent messages from
+        the same sender can't both claim a reply.
+        """
+        now = now or self.clock()
+        rule = rule or DEFAULT_RULE
+        state = self._states.get(self._key(page_id, sender_id)) or self.touch(page_id, sender_id, now)
+        last = state.get("last_reply_at")
+        if last is not None:
+            if now - last < MIN_REPLY_GAP:
+                return False
+            if cooldown and rule == state.get("last_rule") and now - last < REPLY_COOLDOWN:
+                return False
+        state["last_reply_at"] = now
+        state["last_rule"] = rule
+        state["reply_count"] += 1
+        self._dirty = True
+        return True
+
+    def load(self) -> int:
+        """Load the snapshot written by a previous run. Returns conversations loaded."""
+        try:
+            saved = json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Ignoring unreadable conversation snapshot {self.path}: {e}")
+            return 0
+        # oldest first, so the LRU order matches recency
+        for key, state in sorted(saved.items(), key=lambda item: item[1].get("last_seen", 0)):
+            current = self._states.get(key)
+            if current is None or state.get("last_seen", 0) > current.get("last_seen", 0):
+                self._states[key] = state
+                self._states.move_to_end(key)
+        while len(self._states) > self.maxsize:
+            self._states.popitem(last=False)
+        return len(saved)
+
+    def _write_snapshot(self, states: dict) -> None:
+        # merge with what other workers wrote since we last looked
+        try:
+            on_disk = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            on_disk = {}
+        for key, state in states.items():
+            if state.get("last_seen", 0) >= on_disk.get(key, {}).get("last_seen", 0):
+                on_disk[key] = state
+        if len(on_disk) > self.maxsize:
+            newest = sorted(on_disk.items(), key=lambda item: item[1].get("last_seen", 0))[-self.maxsize:]
+            on_disk = dict(newest)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(on_disk), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    async def snapshot(self) -> bool:
+        """Write dirty state to disk off the event loop. True if anything was written."""
+        if not self._dirty:
+            return False
+        self._dirty = False
+        states = {key: dict(state) for key, state in self._states.items()}
+        try:
+            await asyncio.to_thread(self._write_snapshot, states)
+        except OSError as e:
+            self._dirty = True
+            print(f"Failed to snapshot conversations to {self.path}: {e}")
+            return False
+        return True
+
+    def start(self) -> None:
+        if self._task is None:
+            loaded = self.load()
+            if loaded:
+                print(f"💬 Restored {loaded} conversation(s) from {self.path}")
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.snapshot()
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.snapshot()
+
+
+conversations = ConversationStore()
@@ -0,0 +1,63 @@
+"""Cross-process file locking for running several workers on one data/ dir.
+
+- `append_line` appends one line to a shared log. The line goes out in a
+  single O_APPEND write under an exclusive lock, so concurrent workers never
+  interleave or tear entries.
+- `ProcessLock` is a non-blocking exclusive lock on a lock file, used to elect
+  one worker for singleton jobs (e.g. the token refresh scheduler). The OS
+  releases it when the holder exits, so another worker takes over.
+
+Uses fcntl where available (Linux/macOS). On other platforms locking is a
+no-op and appends rely on O_APPEND alone.
+"""
+import os
+from pathlib import Path
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-worker development only
+    fcntl = None
+
+
+def append_line(path: Path, line: str) -> None:
+    """Append `line` (newline added) to `path` atomically across processes."""
+    data = (line.rstrip("\n") + "\n").encode("utf-8")
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        if fcntl:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        os.write(fd, data)
+    finally:
+        # closing the descriptor also drops the lock
+        os.close(fd)
+
+
+class ProcessLock:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._fd: Optional[int] = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def acquire(self) -> bool:
+        """Try to take the lock without blocking. True if this process holds it."""
+        if self._fd is not None:
+            return True
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                return False
+        self._fd = fd
+        return True
+
+    def release(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
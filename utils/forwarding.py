@@ -0,0 +1,216 @@
+"""Relay accepted webhooks to downstream consumers (CRM, analytics, ...).
+
+Targets come from WEBHOOK_FORWARD_TARGETS, a comma-separated list of
+
+- ``https://crm.example.com/hooks/instagram``  plain HTTP(S) POST, over the
+  shared pooled client;
+- ``unix:/run/analytics.sock`` or ``unix:/run/analytics.sock:/ingest``  HTTP
+  over a local Unix socket (path defaults to ``/``).
+
+Each target has its own bounded queue and worker tasks, so a slow or dead
+consumer only backs up its own queue; `publish` never waits and the Meta ack
+is never delayed. When a queue is full the oldest event is dropped.
+
+Deliveries are retried with exponential backoff. A circuit breaker opens
+after FORWARD_BREAKER_FAILURES consecutive failures and holds the queue for
+FORWARD_BREAKER_COOLDOWN seconds before a single trial delivery decides
+whether to close it again.
+
+The raw webhook body is forwarded unchanged with ``Content-Type:
+application/json``; with FORWARD_SECRET set, ``X-Forward-Signature-256``
+carries ``sha256=<HMAC of the body>`` so consumers can verify the origin.
+Only webhooks whose X-Hub-Signature-256 matched the app secret
+(FACEBOOK_APP_SECRET or INSTAGRAM_CLIENT_SECRET) are published
+(routes/api.py), so nothing is forwarded without one.
+"""
+import asyncio
+import hashlib
+import hmac
+import os
+import time
+from typing import Optional
+
+import httpx
+
+from utils.graph import app_secret, get_http_client
+
+QUEUE_SIZE = int(os.getenv("FORWARD_QUEUE_SIZE", "1000"))
+WORKERS_PER_TARGET = int(os.getenv("FORWARD_CONCURRENCY", "4"))
+MAX_ATTEMPTS = int(os.getenv("FORWARD_MAX_ATTEMPTS", "4"))
+RETRY_BACKOFF = float(os.getenv("FORWARD_RETRY_BACKOFF", "0.5"))
+BREAKER_FAILURES = int(os.getenv("FORWARD_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN = float(os.getenv("FORWARD_BREAKER_COOLDOWN", "30"))
+TIMEOUT = float(os.getenv("FORWARD_TIMEOUT", "5"))
+
+
+class CircuitBreaker:
+    def __init__(self, failures: int = BREAKER_FAILURES, cooldown: float = BREAKER_COOLDOWN):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.consecutive = 0
+        self.opened_at: Optional[float] = None
+        self._trial = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def wait_time(self) -> float:
+        """Seconds until a delivery may be attempted (0 = now)."""
+        if self.opened_at is None:
+            return 0.0
+        remaining = self.cooldown - (time.monotonic() - self.opened_at)
+        if remaining > 0:
+            return remaining
+        # half-open: one trial at a time, the other workers keep waiting
+        if self._trial:
+            return min(self.cooldown, 1.0)
+        self._trial = True
+        return 0.0
+
+    def success(self) -> None:
+        self.consecutive = 0
+        self.opened_at = None
+        self._trial = False
+
+    def failure(self) -> None:
+        self.consecutive += 1
+        self._trial = False
+        if self.opened_at is not None or self.consecutive >= self.failures:
+            self.opened_at = time.monotonic()
+
+
+class ForwardTarget:
+    def __init__(self, spec: str):
+        self.spec = spec.strip()
+        self._own_client: Optional[httpx.AsyncClient] = None
+        if self.spec.startswith("unix:"):
+            socket_path, _, path = self.spec[len("unix:"):].partition(":")
+            self.socket_path = socket_path
+            # the host is ignored for unix sockets but httpx needs a URL
+            self.url = "http://localhost" + (path or "/")
+        else:
+            self.socket_path = None
+            self.url = self.spec
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.breaker = CircuitBreaker()
+        self.stats = {"sent": 0, "failed": 0, "dropped": 0, "retries": 0}
+        self._workers = []
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self.socket_path is None:
+            return get_http_client()
+        if self._own_client is None:
+            self._own_client = httpx.AsyncClient(transport=httpx.AsyncHTTPTransport(uds=self.socket_path), timeout=TIMEOUT)
+        return self._own_client
+
+    def put(self, body: bytes) -> None:
+        try:
+            self.queue.put_nowait(body)
+        except asyncio.QueueFull:
+            # shed the oldest event: recent ones are more useful downstream
+            self.queue.get_nowait()
+            self.queue.task_done()
+            self.stats["dropped"] += 1
+            self.queue.put_nowait(body)
+
+    async def deliver(self, body: bytes) -> bool:
+        headers = {"Content-Type": "application/json"}
+        secret = os.getenv("FORWARD_SECRET")
+        if secret:
+            digest = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+            headers["X-Forward-Signature-256"] = f"sha256={digest}"
+        for attempt in range(MAX_ATTEMPTS):
+            wait = self.breaker.wait_time()
+            while wait > 0:
+                await asyncio.sleep(wait)
+                wait = self.breaker.wait_time()
+            try:
+                r = await self.client.post(self.url, content=body, headers=headers, timeout=TIMEOUT)
+                ok = r.status_code < 300
+                # 4xx other than 408/429 won't get better by retrying
+                retryable = r.status_code >= 500 or r.status_code in (408, 429)
+                error = f"HTTP {r.status_code}"
+            except httpx.HTTPError as e:
+                ok, retryable, error = False, True, str(e) or type(e).__name__
+            except Exception as e:
+                # e.g. httpx.InvalidURL: still a failure, so a half-open trial ends
+                ok, retryable, error = False, False, f"{type(e).__name__}: {e}"
+            if ok:
+                self.breaker.success()
+                self.stats["sent"] += 1
+                return True
+            self.breaker.failure()
+            if not retryable or attempt == MAX_ATTEMPTS - 1:
+                break
+            self.stats["retries"] += 1
+            await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+        self.stats["failed"] += 1
+        print(f"⚠️  Forwarding to {self.spec} failed: {error}")
+        return False
+
+    async def _work(self) -> None:
+        while True:
+            body = await self.queue.get()
+            try:
+                await self.deliver(body)
+            except Exception as e:
+                self.stats["failed"] += 1
+                print(f"⚠️  Forwarding to {self.spec} crashed: {e}")
+            finally:
+                self.queue.task_done()
+
+    def start(self) -> None:
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._work()) for _ in range(WORKERS_PER_TARGET)]
+
+    async def stop(self, timeout: float = 5) -> None:
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"⚠️  {self.queue.qsize()} event(s) for {self.spec} not forwarded before shutdown")
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._own_client is not None:
+            await self._own_client.aclose()
+            self._own_client = None
+
+    def status(self) -> dict:
+        return {"target": self.spec, "queued": self.queue.qsize(), "breaker": self.breaker.state, **self.stats}
+
+
+class WebhookForwarder:
+    def __init__(self, specs: Optional[list] = None):
+        if specs is None:
+            specs = [s for s in os.getenv("WEBHOOK_FORWARD_TARGETS", "").split(",") if s.strip()]
+        self.targets = [ForwardTarget(spec) for spec in specs]
+
+    def __len__(self) -> int:
+        return len(self.targets)
+
+    def publish(self, body: bytes) -> None:
+        """Queue one raw webhook body for every target. Never blocks."""
+        for target in self.targets:
+            target.put(body)
+
+    def start(self) -> None:
+        for target in self.targets:
+            target.start()
+        if self.targets:
+            print(f"📤 Forwarding webhooks to {len(self.targets)} target(s)")
+            if not app_secret():
+                print("⚠️  No FACEBOOK_APP_SECRET / INSTAGRAM_CLIENT_SECRET: webhooks can't be verified, so none will be forwarded")
+
+    async def stop(self) -> None:
+        await asyncio.gather(*(target.stop() for target in self.targets))
+
+    def status(self) -> list:
+        return [target.status() for target in self.targets]
+
+
+forwarder = WebhookForwarder()
@@ -0,0 +1,46 @@
+"""Shared HTTP client for Graph API calls.
+
+Opening a new ``httpx.AsyncClient`` per call means a fresh TCP + TLS handshake
+to graph.facebook.com every time. Routes use `get_http_client()` instead, which
+keeps one pooled client for the life of the process; `main.py` closes it on
+shutdown. httpx itself is only imported when the first client is built, so
+importing the URL constants is free.
+
+GRAPH_BASE_URL points every Graph call somewhere else, e.g. the fake Graph
+server from ``python -m benchmarks.fake_servers`` for offline testing.
+"""
+import os
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    import httpx
+
+GRAPH_API_VERSION = "v23.0"
+GRAPH_BASE_URL = os.getenv("GRAPH_BASE_URL", "https://graph.facebook.com").rstrip("/")
+GRAPH_URL = f"{GRAPH_BASE_URL}/{GRAPH_API_VERSION}"
+
+_client: Optional["httpx.AsyncClient"] = None
+
+
+def app_secret() -> Optional[str]:
+    """The Meta app secret (FACEBOOK_APP_SECRET, or INSTAGRAM_CLIENT_SECRET as in .env.example)."""
+    return os.getenv("FACEBOOK_APP_SECRET") or os.getenv("INSTAGRAM_CLIENT_SECRET")
+
+
+def get_http_client() -> "httpx.AsyncClient":
+    global _client
+    if _client is None or _client.is_closed:
+        import httpx
+
+        _client = httpx.AsyncClient(
+            timeout=10,
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+        )
+    return _client
+
+
+async def close_http_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
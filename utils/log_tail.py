@@ -0,0 +1,133 @@
+"""Follow the JSONL logs under data/ for live-tail endpoints.
+
+A cursor is a byte offset into the log file, so it stays valid across
+reconnects, restarts and worker processes (all workers append to the same
+file). `follow` yields every complete line after a cursor and then waits:
+
+- appends made by this process call `notify` and wake followers at once;
+- appends from other workers are picked up by one shared stat() poll per
+  file every TAIL_POLL seconds, which only runs while someone is following.
+
+Idle followers cost one pending future each, no reads. If the file shrinks
+below a cursor (truncated or rotated) following restarts from the top.
+"""
+import asyncio
+import os
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+TAIL_POLL = float(os.getenv("TAIL_POLL", "1"))
+HEARTBEAT = 15.0
+READ_CHUNK = 64 * 1024
+
+
+class LogTail:
+    def __init__(self, path: Path, poll: float = TAIL_POLL):
+        self.path = Path(path)
+        self.poll = poll
+        self._changed: Optional[asyncio.Event] = None
+        self._followers = 0
+        self._poller: Optional[asyncio.Task] = None
+        self._size = 0
+
+    def size(self) -> int:
+        try:
+            return self.path.stat().st_size
+        except OSError:
+            return 0
+
+    def notify(self) -> None:
+        """Wake followers; call after appending to the file."""
+        if self._changed is not None:
+            changed, self._changed = self._changed, asyncio.Event()
+            changed.set()
+
+    def read_from(self, offset: int, limit: int = 1000) -> tuple:
+        """Complete lines after `offset`: ([(end_offset, line), ...], new_offset)."""
+        if offset > self.size():
+            offset = 0
+        lines = []
+        try:
+            with self.path.open("rb") as f:
+                f.seek(offset)
+                while len(lines) < limit:
+                    raw = f.readline()
+                    # a partial last line is picked up once it's complete
+                    if not raw.endswith(b"\n"):
+                        break
+                    offset += len(raw)
+                    line = raw.decode("utf-8", errors="replace").strip()
+                    if line:
+                        lines.append((offset, line))
+        except FileNotFoundError:
+            pass
+        return lines, offset
+
+    def offset_before_last(self, count: int) -> int:
+        """Offset where the last `count` complete lines start (reads backwards)."""
+        end = self.size()
+        if count <= 0 or end == 0:
+            return end
+        with self.path.open("rb") as f:
+            position = end
+            newlines = 0
+            while position > 0:
+                step = min(READ_CHUNK, position)
+                position -= step
+                f.seek(position)
+                chunk = f.read(step)
+                # ignore the newline that terminates the very last line
+                search_end = len(chunk) - 1 if position + step == end else len(chunk)
+                index = search_end
+                while True:
+                    index = chunk.rfind(b"\n", 0, index)
+                    if index < 0:
+                        break
+                    newlines += 1
+                    if newlines == count:
+                        return position + index + 1
+        return 0
+
+    def last(self, count: int) -> list:
+        """The last `count` lines, oldest first."""
+        lines, _ = self.read_from(self.offset_before_last(count), limit=count)
+        return [line for _, line in lines]
+
+    async def _poll(self) -> None:
+        self._size = self.size()
+        while self._followers:
+            await asyncio.sleep(self.poll)
+            size = self.size()
+            if size != self._size:
+                self._size = size
+                self.notify()
+        self._poller = None
+
+    async def follow(self, cursor: Optional[int] = None) -> AsyncIterator[tuple]:
+        """Yield (cursor, line) for lines after `cursor` (default: the end).
+
+        Yields (cursor, None) after HEARTBEAT idle seconds so callers can
+        keep connections alive.
+        """
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        if cursor is None:
+            cursor = self.size()
+        self._followers += 1
+        if self._poller is None:
+            self._poller = asyncio.create_task(self._poll())
+        try:
+            while True:
+                # grab the event before reading so an append in between isn't missed
+                changed = self._changed
+                lines, cursor = await asyncio.to_thread(self.read_from, cursor)
+                for position, line in lines:
+                    yield position, line
+                if lines:
+                    continue
+                try:
+                    await asyncio.wait_for(changed.wait(), HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield cursor, None
+        finally:
+            self._followers -= 1
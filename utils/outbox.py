@@ -0,0 +1,424 @@
+"""Durable inbox and outbox for the DM auto-responder.
+
+Incoming messaging events are written to the ``inbox`` table before the
+webhook is acknowledged: once Meta has its 200 it won't redeliver, so the
+event must already be on disk. The same insert claims the message ``mid``
+(a unique key), so a redelivered or duplicate event is recognised in that one
+write. A row stays ``received`` until its replies are recorded; rows left
+unfinished by a crash are re-driven by the `OutboxWorker`, straight away at
+startup when their owner is gone, otherwise after INBOX_LEASE seconds.
+An unfinished event that already has replies in the outbox is not re-driven
+(answering it again would repeat them): it is marked ``partial`` and only
+the segments recorded before the crash are delivered; the rest of a streamed
+reply is lost. Finished rows are kept RETENTION seconds, which is also how
+long a ``mid`` is remembered.
+
+Outbound replies:
+
+Every reply is written to ``data/outbox.db`` before it is sent and marked
+``sent`` afterwards, so a crash between receiving a webhook and the Graph
+API call can't lose it. Items that fail with a retryable error (429, 5xx,
+network) stay ``pending`` with their own attempt count and backoff; the
+`OutboxWorker` picks them up, and on startup it replays whatever a previous
+process left behind.
+
+Items being sent are leased (``sending`` + ``lease_until`` + ``lease_owner``)
+so several workers can drain the same outbox without sending an item twice.
+Each process holds a lock file under ``data/leases/`` for as long as it runs;
+on startup the worker releases the leases of owners whose lock is free (the
+process is gone), so a crashed process's items are retried straight away
+rather than after LEASE seconds. Delivery is at-least-once.
+
+Tuning (env):
+- OUTBOX_MAX_ATTEMPTS  attempts before an item is marked failed (default 6)
+- OUTBOX_BACKOFF       base retry delay in seconds, doubled per attempt (default 5)
+- OUTBOX_TICK          how often the worker looks for due items (default 5s)
+- INBOX_LEASE          seconds an event being handled stays reserved (default 300)
+- INBOX_BUSY_TIMEOUT   seconds `receive` waits for a locked database (default 2)
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+import storage
+from utils.filelock import ProcessLock
+
+DB_FILE = storage.STORE_PATH / "outbox.db"
+MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "6"))
+BACKOFF = float(os.getenv("OUTBOX_BACKOFF", "5"))
+MAX_BACKOFF = 3600
+OUTBOX_TICK = float(os.getenv("OUTBOX_TICK", "5"))
+LEASE = 60  # seconds a claimed item stays reserved for its sender
+INBOX_LEASE = float(os.getenv("INBOX_LEASE", "300"))
+INBOX_BUSY_TIMEOUT = float(os.getenv("INBOX_BUSY_TIMEOUT", "2"))
+RETENTION = 7 * 24 * 3600  # finished items are kept this long for inspection
+BATCH = 50
+
+# delivery outcomes reported by the send callable
+SENT = "sent"
+RETRY = "retry"
+FAILED = "failed"
+NO_TOKEN = "no_token"
+
+# every function below does blocking SQLite I/O under this lock; async code
+# calls them through asyncio.to_thread so a busy database never stalls the loop
+_lock = threading.Lock()
+_conn = None
+# (pid, owner id, lock held while this process lives)
+_owner = None
+_owner_lock = threading.Lock()
+
+
+def _connection() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        DB_FILE.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(DB_FILE, timeout=10, check_same_thread=False, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL survives process crashes; only power loss can drop the newest commits
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS outbox (
+                id              INTEGER PRIMARY KEY AUTOINCREMENT,
+                sender_id       TEXT NOT NULL,
+                recipient_id    TEXT,
+                text            TEXT NOT NULL,
+                incoming        TEXT,
+                status          TEXT NOT NULL DEFAULT 'pending',
+                attempts        INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                lease_until     REAL,
+                lease_owner     TEXT,
+                last_error      TEXT,
+                created_at      REAL NOT NULL,
+                updated_at      REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS outbox_due ON outbox(status, next_attempt_at);
+            CREATE TABLE IF NOT EXISTS inbox (
+                id              INTEGER PRIMARY KEY AUTOINCREMENT,
+                key             TEXT UNIQUE,
+                event           TEXT NOT NULL,
+                entry_id        TEXT,
+                status          TEXT NOT NULL DEFAULT 'received',
+                attempts        INTEGER NOT NULL DEFAULT 0,
+                lease_until     REAL,
+                lease_owner     TEXT,
+                created_at      REAL NOT NULL,
+                updated_at      REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS inbox_open ON inbox(status, lease_until);
+            """
+        )
+        # columns added after outbox.db was first created
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(outbox)")}
+        if "lease_owner" not in columns:
+            conn.execute("ALTER TABLE outbox ADD COLUMN lease_owner TEXT")
+        if "inbox_id" not in columns:
+            conn.execute("ALTER TABLE outbox ADD COLUMN inbox_id INTEGER")
+        conn.execute("CREATE INDEX IF NOT EXISTS outbox_inbox ON outbox(inbox_id)")
+        # only kept once the schema is in place, so a failed setup is retried
+        _conn = conn
+    return _conn
+
+
+def _leases_dir() -> Path:
+    return DB_FILE.parent / "leases"
+
+
+def owner_id() -> str:
+    """Lease owner id of this process; its lock file is held until the process exits."""
+    global _owner
+    with _owner_lock:
+        # forked workers get their own id instead of inheriting the parent's
+        if _owner is None or _owner[0] != os.getpid():
+            owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+            lock = ProcessLock(_leases_dir() / f"{owner}.lock")
+            lock.acquire()
+            _owner = (os.getpid(), owner, lock)
+        return _owner[1]
+
+
+def release_orphaned_leases() -> int:
+    """Make items leased by processes that have exited due now. Returns how many."""
+    me = owner_id()
+    released = 0
+    for path in _leases_dir().glob("*.lock"):
+        owner = path.stem
+        if owner == me:
+            continue
+        lock = ProcessLock(path)
+        # the owner holds its lock for life: if we can take it, the owner is gone
+        if not lock.acquire():
+            continue
+        try:
+            with _lock:
+                conn = _connection()
+                cur = conn.execute(
+                    "UPDATE outbox SET lease_until = 0 WHERE status = 'sending' AND lease_owner = ?", (owner,)
+                )
+                released += cur.rowcount
+                cur = conn.execute(
+                    "UPDATE inbox SET lease_until = 0 WHERE status = 'received' AND lease_owner = ?", (owner,)
+                )
+                released += cur.rowcount
+            path.unlink(missing_ok=True)
+        finally:
+            lock.release()
+    return released
+
+
+def receive(events: list) -> list:
+    """Record incoming events before the webhook is acknowledged.
+
+    `events` holds (key, event, entry id) tuples; the key is the message mid
+    (None when there is none). Everything is written in one transaction.
+    Returns the new inbox row id for each event, leased to the caller, or
+    None where the key was already recorded.
+
+    Blocking: call it off the event loop. Waits at most INBOX_BUSY_TIMEOUT
+    for another process's write lock, then raises sqlite3.OperationalError
+    (nothing is recorded; the webhook asks Meta to retry).
+    """
+    now = time.time()
+    owner = owner_id()
+    with _lock:
+        conn = _connection()
+        conn.execute(f"PRAGMA busy_timeout = {int(INBOX_BUSY_TIMEOUT * 1000)}")
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        finally:
+            conn.execute("PRAGMA busy_timeout = 10000")
+        try:
+            ids = []
+            for key, event, entry_id in events:
+                cur = conn.execute(
+                    "INSERT INTO inbox (key, event, entry_id, lease_until, lease_owner, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(key) DO NOTHING",
+                    (key, json.dumps(event), entry_id, now + INBOX_LEASE, owner, now, now),
+                )
+                ids.append(cur.lastrowid if cur.rowcount == 1 else None)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return ids
+
+
+def finish_event(inbox_id: int, status: str = "done") -> None:
+    """Mark an inbox row handled: its replies (if any) are in the outbox."""
+    with _lock:
+        _connection().execute(
+            "UPDATE inbox SET status = ?, lease_until = NULL, lease_owner = NULL, updated_at = ? WHERE id = ?",
+            (status, time.time(), inbox_id),
+        )
+
+
+def _claim_unfinished(now: float, limit: int = BATCH) -> list:
+    """Lease inbox rows whose handler didn't finish (crash, or lease expired)."""
+    owner = owner_id()
+    with _lock:
+        conn = _connection()
+        # replies already recorded: the outbox delivers them, don't answer
+        # twice. Segments the handler hadn't generated yet are lost.
+        cur = conn.execute(
+            "UPDATE inbox SET status = 'partial', lease_until = NULL, lease_owner = NULL, updated_at = ? "
+            "WHERE status = 'received' AND lease_until < ? AND EXISTS (SELECT 1 FROM outbox WHERE outbox.inbox_id = inbox.id)",
+            (now, now),
+        )
+        if cur.rowcount:
+            print(f"⚠️  Inbox: {cur.rowcount} event(s) stopped mid-reply; sending the segments recorded before, not the rest")
+        # an event that keeps failing its handler is given up on
+        conn.execute(
+            "UPDATE inbox SET status = 'failed', lease_until = NULL, lease_owner = NULL, updated_at = ? "
+            "WHERE status = 'received' AND lease_until < ? AND attempts >= ?",
+            (now, now, MAX_ATTEMPTS),
+        )
+        rows = conn.execute(
+            "SELECT * FROM inbox WHERE status = 'received' AND lease_until < ? ORDER BY id LIMIT ?", (now, limit)
+        ).fetchall()
+        claimed = []
+        for row in rows:
+            cur = conn.execute(
+                "UPDATE inbox SET lease_until = ?, lease_owner = ?, attempts = attempts + 1, updated_at = ? "
+                "WHERE id = ? AND status = 'received' AND lease_until = ?",
+                (now + INBOX_LEASE, owner, now, row["id"], row["lease_until"]),
+            )
+            if cur.rowcount == 1:
+                item = dict(row)
+                item["event"] = json.loads(item["event"])
+                claimed.append(item)
+        return claimed
+
+
+def enqueue(sender_id: str, text: str, recipient_id: Optional[str] = None, incoming: Optional[str] = None,
+            inbox_id: Optional[int] = None) -> int:
+    """Record a reply before sending it. Returns the item id (already leased to the caller)."""
+    now = time.time()
+    with _lock:
+        cur = _connection().execute(
+            "INSERT INTO outbox (sender_id, recipient_id, text, incoming, inbox_id, status, next_attempt_at, lease_until, lease_owner, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, 'sending', ?, ?, ?, ?, ?)",
+            (sender_id, recipient_id, text, incoming, inbox_id, now, now + LEASE, owner_id(), now, now),
+        )
+        return cur.lastrowid
+
+
+def get(item_id: int) -> Optional[dict]:
+    with _lock:
+        row = _connection().execute("SELECT * FROM outbox WHERE id = ?", (item_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def _claim_due(now: float, limit: int = BATCH) -> list:
+    """Lease due items to this process. Pending items and expired leases are due."""
+    owner = owner_id()
+    with _lock:
+        conn = _connection()
+        rows = conn.execute(
+            "SELECT * FROM outbox WHERE (status = 'pending' AND next_attempt_at <= ?) "
+            "OR (status = 'sending' AND lease_until < ?) ORDER BY next_attempt_at LIMIT ?",
+            (now, now, limit),
+        ).fetchall()
+        claimed = []
+        for row in rows:
+            # another worker may have leased it between the SELECT and here
+            cur = conn.execute(
+                "UPDATE outbox SET status = 'sending', lease_until = ?, lease_owner = ?, updated_at = ? "
+                "WHERE id = ? AND status = ? AND (lease_until IS NULL OR lease_until = ?)",
+                (now + LEASE, owner, now, row["id"], row["status"], row["lease_until"]),
+            )
+            if cur.rowcount == 1:
+                claimed.append(dict(row))
+        return claimed
+
+
+def record_result(item_id: int, outcome: str, error: Optional[str] = None) -> str:
+    """Store the outcome of one delivery attempt. Returns the item's new status."""
+    now = time.time()
+    with _lock:
+        conn = _connection()
+        row = conn.execute("SELECT attempts FROM outbox WHERE id = ?", (item_id,)).fetchone()
+        if row is None:
+            return FAILED
+        attempts = row["attempts"] + 1
+        if outcome == RETRY and attempts < MAX_ATTEMPTS:
+            status = "pending"
+            next_attempt = now + min(BACKOFF * 2 ** (attempts - 1), MAX_BACKOFF)
+        else:
+            status = {SENT: "sent", NO_TOKEN: "logged_only"}.get(outcome, "failed")
+            next_attempt = now
+        conn.execute(
+            "UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, lease_until = NULL, lease_owner = NULL, last_error = ?, updated_at = ? WHERE id = ?",
+            (status, attempts, next_attempt, error, now, item_id),
+        )
+        return status
+
+
+def counts(table: str = "outbox") -> dict:
+    """Items per status in the outbox (or the inbox)."""
+    if table not in ("outbox", "inbox"):
+        raise ValueError(table)
+    with _lock:
+        rows = _connection().execute(f"SELECT status, COUNT(*) AS n FROM {table} GROUP BY status").fetchall()
+    return {row["status"]: row["n"] for row in rows}
+
+
+def prune(now: Optional[float] = None) -> int:
+    """Drop finished items and inbox rows older than RETENTION."""
+    cutoff = (now or time.time()) - RETENTION
+    with _lock:
+        conn = _connection()
+        cur = conn.execute(
+            "DELETE FROM outbox WHERE status IN ('sent', 'failed', 'logged_only') AND updated_at < ?", (cutoff,)
+        )
+        removed = cur.rowcount
+        cur = conn.execute("DELETE FROM inbox WHERE status IN ('done', 'partial', 'failed') AND updated_at < ?", (cutoff,))
+        return removed + cur.rowcount
+
+
+# deliver(item) -> (outcome, error); on_result(item, new_status);
+# redrive(inbox row) starts handling an unfinished incoming event again
+Deliver = Callable[[dict], Awaitable[tuple]]
+OnResult = Callable[[dict, str], None]
+Redrive = Callable[[dict], None]
+
+
+class OutboxWorker:
+    def __init__(self, deliver: Deliver, on_result: Optional[OnResult] = None, tick: float = OUTBOX_TICK,
+                 redrive: Optional[Redrive] = None):
+        self.deliver = deliver
+        self.on_result = on_result
+        self.redrive = redrive
+        self.tick = tick
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def attempt(self, item: dict) -> str:
+        """Deliver one leased item and record the outcome."""
+        try:
+            outcome, error = await self.deliver(item)
+        except Exception as e:
+            outcome, error = RETRY, str(e)
+        status = await asyncio.to_thread(record_result, item["id"], outcome, error)
+        if self.on_result:
+            self.on_result(item, status)
+        return status
+
+    async def run_once(self) -> int:
+        """Deliver every item that is due now. Returns how many were attempted."""
+        items = await asyncio.to_thread(_claim_due, time.time())
+        if items:
+            await asyncio.gather(*(self.attempt(item) for item in items))
+        return len(items)
+
+    async def redrive_unfinished(self) -> int:
+        """Hand inbox rows nobody finished to `redrive`. Returns how many."""
+        if self.redrive is None:
+            return 0
+        rows = await asyncio.to_thread(_claim_unfinished, time.time())
+        for row in rows:
+            self.redrive(row)
+        return len(rows)
+
+    async def _loop(self) -> None:
+        # the first pass doubles as crash recovery: items a previous process
+        # left pending are due, and so are the ones it had leased once its
+        # lease is released below (leases of live workers are left alone)
+        first = True
+        last_prune = 0.0
+        while True:
+            try:
+                if first:
+                    await asyncio.to_thread(release_orphaned_leases)
+                redriven = await self.redrive_unfinished()
+                if redriven:
+                    print(f"📥 Inbox: re-driving {redriven} unfinished webhook event(s)")
+                attempted = await self.run_once()
+                if first and attempted:
+                    print(f"📬 Outbox: replaying {attempted} reply(ies) left by a previous run")
+                while attempted == BATCH:
+                    attempted = await self.run_once()
+                if time.time() - last_prune > 3600:
+                    await asyncio.to_thread(prune)
+                    last_prune = time.time()
+            except Exception as e:
+                print(f"Outbox worker cycle failed: {e}")
+            first = False
+            await asyncio.sleep(self.tick)
@@ -0,0 +1,132 @@
+"""Resolve the page access token to reply with for a webhook recipient.
+
+Instagram messaging webhooks identify the receiving business by
+``recipient.id`` / ``entry.id`` (the Instagram business account id). Replies
+must be sent with the access token of the Facebook Page that IG account is
+connected to. `PageTokenResolver` derives those tokens from the stored user
+tokens via ``/me/accounts`` and keeps an in-memory map of both page id and IG
+account id to page token.
+
+Unknown ids trigger one (single-flight) refresh across all stored accounts;
+callers invalidate an id when Graph rejects its token (401 / OAuth error 190)
+and retry once. ``PAGE_ACCESS_TOKEN`` remains a fallback for single-page
+deployments.
+"""
+import asyncio
+import os
+import time
+from typing import Optional
+
+import httpx
+
+import storage
+from utils.graph import GRAPH_URL, get_http_client
+
+PLACEHOLDER_TOKEN = "your_page_access_token_here"
+# Don't hammer /me/accounts when webhooks arrive for pages we can't resolve
+MIN_REFRESH_INTERVAL = int(os.getenv("PAGE_TOKEN_MIN_REFRESH", "60"))
+
+
+def env_page_token() -> Optional[str]:
+    token = os.getenv("PAGE_ACCESS_TOKEN")
+    if not token or token == PLACEHOLDER_TOKEN:
+        return None
+    return token
+
+
+class PageTokenResolver:
+    def __init__(self):
+        self._tokens = {}
+        self._lock = asyncio.Lock()
+        self._last_refresh = 0.0
+        self._seeded = False
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+    def _seed_from_storage(self) -> None:
+        """Load page tokens already persisted on accounts (no network)."""
+        for account in storage.list_accounts():
+            if account.get("page_token"):
+                for key in (account.get("page_id"), account.get("ig_id")):
+                    if key:
+                        self._tokens.setdefault(key, account["page_token"])
+        self._seeded = True
+
+    async def _pages_for_account(self, account: dict) -> list:
+        pages = []
+        url = f"{GRAPH_URL}/me/accounts"
+        params = {
+            "fields": "id,access_token,instagram_business_account",
+            "limit": 100,
+            "access_token": account["access_token"],
+        }
+        client = get_http_client()
+        while url:
+            r = await client.get(url, params=params)
+            if r.status_code != 200:
+                print(f"Page token lookup failed for account {account['account_id']}: {r.status_code} {r.text}")
+                break
+            body = r.json()
+            pages.extend(body.get("data", []))
+            # the `next` link already carries every query parameter
+            url = body.get("paging", {}).get("next")
+            params = None
+        return pages
+
+    async def refresh(self) -> int:
+        """Rebuild the map from every stored account. Returns pages found."""
+        accounts = storage.list_accounts()
+        results = await asyncio.gather(
+            *(self._pages_for_account(a) for a in accounts), return_exceptions=True
+        )
+        tokens = {}
+        for account, pages in zip(accounts, results):
+            if isinstance(pages, BaseException):
+                print(f"Page token lookup failed for account {account['account_id']}: {pages}")
+                continue
+            persisted = False
+            for page in pages:
+                page_token = page.get("access_token")
+                if not page_token:
+                    continue
+                ig_id = (page.get("instagram_business_account") or {}).get("id")
+                tokens[page["id"]] = page_token
+                if ig_id:
+                    tokens[ig_id] = page_token
+                # the account record holds one page: the first IG-connected one
+                if ig_id and not persisted and storage.get_account(account["account_id"]):
+                    storage.save_account(account["account_id"], ig_id=ig_id, page_id=page["id"], page_token=page_token)
+                    persisted = True
+        self._tokens.update(tokens)
+        self._last_refresh = time.monotonic()
+        return len(tokens)
+
+    async def get(self, recipient_id: Optional[str]) -> Optional[str]:
+        """Page token for a webhook recipient id, refreshing once if unknown."""
+        if not self._seeded:
+            self._seed_from_storage()
+        if recipient_id and recipient_id in self._tokens:
+            return self._tokens[recipient_id]
+
+        if recipient_id:
+            async with self._lock:
+                # another task may have refreshed while we waited
+                if recipient_id not in self._tokens and time.monotonic() - self._last_refresh >= MIN_REFRESH_INTERVAL:
+                    try:
+                        await self.refresh()
+                    except httpx.HTTPError as e:
+                        print(f"Page token refresh failed: {e}")
+            if recipient_id in self._tokens:
+                return self._tokens[recipient_id]
+
+        return env_page_token()
+
+    def invalidate(self, recipient_id: Optional[str]) -> None:
+        """Forget a token Graph rejected so the next lookup re-resolves it."""
+        if recipient_id:
+            self._tokens.pop(recipient_id, None)
+        self._last_refresh = 0.0
+
+
+resolver = PageTokenResolver()
@@ -0,0 +1,254 @@
+"""Opt-in per-request profiling.
+
+Nothing here is installed unless ``PROFILE_REQUESTS=1`` and ``PROFILE_SECRET``
+are set (see `main.py`), so normal deployments pay no overhead at all.
+
+When enabled, a single request is profiled only if it carries a signature for
+its path, either as an ``X-Profile-Signature`` header or a ``?_profile=`` query
+flag. The signature is ``<expires>.<hex HMAC-SHA256 of "<expires>:<path>">``
+keyed with ``PROFILE_SECRET``, where ``expires`` is a Unix timestamp, so a
+leaked link stops working after PROFILE_SIGNATURE_TTL seconds (default 900).
+Make one with `sign_profile_path` or ``python -m utils.profiling /path``.
+Reports are written to ``data/profiles/``: HTML when pyinstrument is
+installed, otherwise a cProfile text summary.
+
+Sync (``def``) endpoints run in the threadpool, which a profiler started on the
+event loop thread can't see. `instrument_sync_endpoints` wraps those endpoints
+so the worker thread records into the same session as the middleware.
+"""
+import asyncio
+import cProfile
+import datetime
+import functools
+import hashlib
+import hmac
+import importlib.util
+import io
+import os
+import pstats
+import threading
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Optional
+from urllib.parse import parse_qs
+
+import storage
+
+PROFILE_DIR = storage.STORE_PATH / "profiles"
+PROFILE_HEADER = b"x-profile-signature"
+PROFILE_QUERY_PARAM = "_profile"
+# The report viewer shares the signature scheme; never profile it.
+REPORTS_PREFIX = "/debug/profiles"
+SIGNATURE_TTL = int(os.getenv("PROFILE_SIGNATURE_TTL", "900"))
+
+_active_session: ContextVar[Optional["ProfileSession"]] = ContextVar("profile_session", default=None)
+
+
+def profiling_enabled() -> bool:
+    return os.getenv("PROFILE_REQUESTS") == "1" and bool(os.getenv("PROFILE_SECRET"))
+
+
+def _digest(path: str, expires: int, secret: Optional[str]) -> str:
+    secret = secret or os.getenv("PROFILE_SECRET", "")
+    return hmac.new(secret.encode(), f"{expires}:{path}".encode(), hashlib.sha256).hexdigest()
+
+
+def sign_profile_path(path: str, secret: Optional[str] = None, ttl: int = SIGNATURE_TTL) -> str:
+    """Return a signature that enables profiling for `path` for the next `ttl` seconds."""
+    expires = int(time.time()) + ttl
+    return f"{expires}.{_digest(path, expires, secret)}"
+
+
+def signature_valid(path: str, signature: Optional[str], secret: Optional[str] = None) -> bool:
+    if not signature:
+        return False
+    expires, _, digest = signature.partition(".")
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(_digest(path, int(expires), secret), digest)
+
+
+def _pyinstrument_available() -> bool:
+    if os.getenv("PROFILE_BACKEND", "pyinstrument") != "pyinstrument":
+        return False
+    return importlib.util.find_spec("pyinstrument") is not None
+
+
+class ProfileSession:
+    """Collects samples for one request across the loop thread and worker threads."""
+
+    def __init__(self):
+        self.use_pyinstrument = _pyinstrument_available()
+        self._profilers = []
+        self._lock = threading.Lock()
+
+    def start(self, async_mode: str = "enabled"):
+        if self.use_pyinstrument:
+            from pyinstrument import Profiler
+
+            profiler = Profiler(async_mode=async_mode)
+            try:
+                profiler.start()
+            except RuntimeError:
+                # another profiler is already running in this thread/context
+                # (e.g. a concurrent profiled request); leave this one out
+                return None
+        else:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Python 3.12+ allows one active cProfile per process; the
+                # loop thread's profiler already sees this thread.
+                return None
+        with self._lock:
+            self._profilers.append(profiler)
+        return profiler
+
+    def stop(self, profiler) -> None:
+        if profiler is None:
+            return
+        if self.use_pyinstrument:
+            profiler.stop()
+        else:
+            profiler.disable()
+
+    def render(self) -> tuple:
+        """Return (report_text, file_extension) for everything recorded."""
+        if self.use_pyinstrument:
+            from pyinstrument.renderers import HTMLRenderer
+            from pyinstrument.session import Session
+
+            sessions = [p.last_session for p in self._profilers if p.last_session]
+            combined = sessions[0]
+            for other in sessions[1:]:
+                combined = Session.combine(combined, other)
+            return HTMLRenderer().render(combined), "html"
+
+        out = io.StringIO()
+        stats = pstats.Stats(self._profilers[0], stream=out)
+        for other in self._profilers[1:]:
+            stats.add(other)
+        stats.sort_stats("cumulative").print_stats(80)
+        return out.getvalue(), "txt"
+
+
+def _slug(path: str) -> str:
+    cleaned = "".join(c if c.isalnum() else "-" for c in path.strip("/"))
+    return cleaned.strip("-")[:60] or "root"
+
+
+def save_report(session: ProfileSession, method: str, path: str, elapsed_ms: float) -> Optional[Path]:
+    try:
+        report, ext = session.render()
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+        target = PROFILE_DIR / f"{stamp}_{method}_{_slug(path)}_{int(elapsed_ms)}ms.{ext}"
+        target.write_text(report, encoding="utf-8")
+        print(f"🧪 Profile for {method} {path} ({elapsed_ms:.1f}ms) saved to {target}")
+        return target
+    except Exception as e:
+        print(f"Failed to save profile for {method} {path}: {e}")
+        return None
+
+
+class RequestProfilerMiddleware:
+    """ASGI middleware that profiles requests carrying a valid signature."""
+
+    def __init__(self, app, secret: Optional[str] = None):
+        self.app = app
+        self.secret = secret or os.getenv("PROFILE_SECRET", "")
+
+    def _requested_signature(self, scope) -> Optional[str]:
+        for name, value in scope.get("headers", []):
+            if name == PROFILE_HEADER:
+                return value.decode("latin-1")
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        values = query.get(PROFILE_QUERY_PARAM)
+        return values[0] if values else None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        path = scope.get("path", "")
+        if path.startswith(REPORTS_PREFIX):
+            return await self.app(scope, receive, send)
+        if not signature_valid(path, self._requested_signature(scope), self.secret):
+            return await self.app(scope, receive, send)
+
+        session = ProfileSession()
+        profiler = session.start()
+        if profiler is None:
+            print(f"⚠️  Profiler busy, serving {path} unprofiled")
+            return await self.app(scope, receive, send)
+        token = _active_session.set(session)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            session.stop(profiler)
+            _active_session.reset(token)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            save_report(session, scope.get("method", "GET"), path, elapsed_ms)
+
+
+def _profiled_sync(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        session = _active_session.get()
+        if session is None:
+            return func(*args, **kwargs)
+        profiler = session.start(async_mode="disabled")
+        try:
+            return func(*args, **kwargs)
+        finally:
+            session.stop(profiler)
+
+    return wrapper
+
+
+def instrument_sync_endpoints(app) -> int:
+    """Wrap threadpool-run endpoints so profiling follows them off the loop.
+
+    Call after every router has been included. Returns the number of wrapped
+    endpoints.
+    """
+    wrapped = 0
+    for route in app.routes:
+        dependant = getattr(route, "dependant", None)
+        call = getattr(dependant, "call", None)
+        if call is None or asyncio.iscoroutinefunction(call):
+            continue
+        dependant.call = _profiled_sync(call)
+        wrapped += 1
+    return wrapped
+
+
+def list_reports() -> list:
+    if not PROFILE_DIR.exists():
+        return []
+    reports = []
+    for item in sorted(PROFILE_DIR.iterdir(), reverse=True):
+        if not item.is_file():
+            continue
+        stat = item.stat()
+        reports.append({
+            "name": item.name,
+            "size": stat.st_size,
+            "created": datetime.datetime.utcfromtimestamp(stat.st_mtime).isoformat() + "Z",
+        })
+    return reports
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Print a profiling signature for a request path")
+    parser.add_argument("path", help="request path, e.g. /webhook/status")
+    parser.add_argument("--ttl", type=int, default=SIGNATURE_TTL, help="seconds the signature stays valid")
+    args = parser.parse_args()
+    if not os.getenv("PROFILE_SECRET"):
+        parser.error("PROFILE_SECRET is not set")
+    print(sign_profile_path(args.path, ttl=args.ttl))
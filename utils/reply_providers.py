@@ -0,0 +1,296 @@
+"""Pluggable reply generation for the DM auto-responder.
+
+A provider turns an incoming message into reply text, streamed as chunks:
+
+- ``rules``  the static reply chosen by reply_rules.json (default);
+- ``stub``   deterministic local stand-in for an AI backend, for tests and
+             load runs (REPLY_STUB_DELAY adds a per-chunk delay);
+- ``http``   an OpenAI-compatible chat completions endpoint with streaming
+             (REPLY_PROVIDER_URL, REPLY_PROVIDER_KEY, REPLY_PROVIDER_MODEL);
+- ``package.module:Class`` any other `ReplyProvider` subclass.
+
+Select one with REPLY_PROVIDER. Messages that match an explicit reply rule
+keep the rule's answer; the provider handles everything else.
+
+`ReplyGenerator` wraps the provider with a concurrency limit
+(REPLY_CONCURRENCY, waited on for at most REPLY_SLOT_WAIT seconds), a
+deadline on generation (REPLY_TIMEOUT seconds) and a fallback to the static
+reply when there is no free slot, or generation fails or times out before
+anything was produced; failing later sends the text generated so far. For
+streaming providers it yields message-sized segments as soon as a sentence
+or paragraph is complete, so long answers start going out while the rest is
+still being generated; static replies are sent as one message unless they
+exceed MAX_MESSAGE_CHARS. Generation runs in its own task, so time spent
+sending segments doesn't count against the deadline or hold a slot.
+"""
+import asyncio
+import hashlib
+import importlib
+import json
+import os
+import re
+import time
+from typing import AsyncIterator, Optional
+
+from utils.graph import get_http_client
+
+REPLY_CONCURRENCY = int(os.getenv("REPLY_CONCURRENCY", "8"))
+REPLY_TIMEOUT = float(os.getenv("REPLY_TIMEOUT", "20"))
+# longest a message waits for a free generation slot before the static reply is used
+REPLY_SLOT_WAIT = float(os.getenv("REPLY_SLOT_WAIT", "10"))
+# Instagram rejects message text over 1000 characters
+MAX_MESSAGE_CHARS = 1000
+# don't send tiny fragments; wait for at least this much text per message
+MIN_SEGMENT_CHARS = int(os.getenv("REPLY_MIN_SEGMENT", "160"))
+SYSTEM_PROMPT = os.getenv(
+    "REPLY_SYSTEM_PROMPT",
+    "You are Grace, a friendly sales assistant replying to Instagram DMs. Answer briefly and helpfully.",
+)
+
+_BOUNDARY_RE = re.compile(r"(?:\n\s*\n|(?<=[.!?…])\s+)")
+
+
+class ReplyRequest:
+    def __init__(self, message: str, sender_id: str, page_id: Optional[str] = None, rule: Optional[str] = None,
+                 static_reply: str = "", conversation: Optional[dict] = None):
+        self.message = message
+        self.sender_id = sender_id
+        self.page_id = page_id
+        self.rule = rule
+        self.static_reply = static_reply
+        self.conversation = conversation or {}
+
+
+class ReplyProvider:
+    name = "base"
+
+    async def stream(self, request: ReplyRequest) -> AsyncIterator[str]:
+        """Yield reply text in chunks (any size)."""
+        raise NotImplementedError
+        yield  # pragma: no cover
+
+    async def generate(self, request: ReplyRequest) -> str:
+        return "".join([chunk async for chunk in self.stream(request)])
+
+    async def close(self) -> None:
+        pass
+
+
+class RulesProvider(ReplyProvider):
+    name = "rules"
+
+    async def stream(self, request: ReplyRequest) -> AsyncIterator[str]:
+        yield request.static_reply
+
+
+class StubProvider(ReplyProvider):
+    """Same input, same output: no network, optional artificial latency."""
+
+    name = "stub"
+
+    def __init__(self, delay: Optional[float] = None):
+        self.delay = float(os.getenv("REPLY_STUB_DELAY", "0")) if delay is None else delay
+
+    def text_for(self, request: ReplyRequest) -> str:
+        digest = hashlib.sha256(f"{request.page_id}:{request.sender_id}:{request.message}".encode("utf-8")).hexdigest()[:8]
+        return f"Thanks for your message! You said: \"{request.message.strip()}\". (stub reply {digest})"
+
+    async def stream(self, request: ReplyRequest) -> AsyncIterator[str]:
+        for word in re.findall(r"\S+\s*", self.text_for(request)):
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            yield word
+
+
+class HTTPProvider(ReplyProvider):
+    """OpenAI-compatible ``/chat/completions`` with ``stream: true``."""
+
+    name = "http"
+
+    def __init__(self, url: Optional[str] = None, api_key: Optional[str] = None, model: Optional[str] = None):
+        self.url = url or os.getenv("REPLY_PROVIDER_URL")
+        self.api_key = api_key or os.getenv("REPLY_PROVIDER_KEY")
+        self.model = model or os.getenv("REPLY_PROVIDER_MODEL", "gpt-4o-mini")
+        if not self.url:
+            raise ValueError("REPLY_PROVIDER_URL is required for the http reply provider")
+
+    async def stream(self, request: ReplyRequest) -> AsyncIterator[str]:
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        payload = {
+            "model": self.model,
+            "stream": True,
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": request.message},
+            ],
+        }
+        async with get_http_client().stream("POST", self.url, json=payload, headers=headers, timeout=REPLY_TIMEOUT) as r:
+            if r.status_code != 200:
+                body = await r.aread()
+                raise RuntimeError(f"reply provider returned {r.status_code}: {body[:200]!r}")
+            async for line in r.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                try:
+                    delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                except (ValueError, KeyError, IndexError):
+                    continue
+                if delta:
+                    yield delta
+
+
+PROVIDERS = {cls.name: cls for cls in (RulesProvider, StubProvider, HTTPProvider)}
+
+
+def load_provider(name: Optional[str] = None) -> ReplyProvider:
+    """Instantiate a provider by registry name or ``module:Class`` path."""
+    name = name or os.getenv("REPLY_PROVIDER", "rules")
+    if name in PROVIDERS:
+        return PROVIDERS[name]()
+    module_name, _, class_name = name.partition(":")
+    if not class_name:
+        raise ValueError(f"Unknown reply provider {name!r} (choose from {', '.join(PROVIDERS)} or module:Class)")
+    provider = getattr(importlib.import_module(module_name), class_name)()
+    if not isinstance(provider, ReplyProvider):
+        raise TypeError(f"{name} is not a ReplyProvider")
+    return provider
+
+
+def split_segment(buffer: str, final: bool = False) -> tuple:
+    """Split sendable messages off the front of `buffer`: (messages, rest)."""
+    messages = []
+    while len(buffer) >= MAX_MESSAGE_CHARS or (buffer.strip() and final):
+        if len(buffer) <= MAX_MESSAGE_CHARS:
+            messages.append(buffer.strip())
+            return messages, ""
+        window = buffer[:MAX_MESSAGE_CHARS]
+        cut = max((m.end() for m in _BOUNDARY_RE.finditer(window)), default=0) or window.rfind(" ") + 1 or MAX_MESSAGE_CHARS
+        messages.append(buffer[:cut].strip())
+        buffer = buffer[cut:]
+    if not final and len(buffer) >= MIN_SEGMENT_CHARS:
+        # send everything up to the last complete sentence/paragraph
+        cut = max((m.end() for m in _BOUNDARY_RE.finditer(buffer)), default=0)
+        if cut >= MIN_SEGMENT_CHARS:
+            messages.append(buffer[:cut].strip())
+            buffer = buffer[cut:]
+    return [m for m in messages if m], buffer
+
+
+class ReplyGenerator:
+    def __init__(self, provider: Optional[ReplyProvider] = None, concurrency: int = REPLY_CONCURRENCY, timeout: float = REPLY_TIMEOUT):
+        self._provider = provider
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    @property
+    def provider(self) -> ReplyProvider:
+        if self._provider is None:
+            self._provider = load_provider()
+            print(f"🤖 Reply provider: {self._provider.name}")
+        return self._provider
+
+    def uses_provider(self, rule: Optional[str]) -> bool:
+        """True if a message matching `rule` is answered by the provider, not fixed text."""
+        if rule:
+            return False
+        try:
+            return not isinstance(self.provider, RulesProvider)
+        except Exception:
+            return False
+
+    async def segments(self, request: ReplyRequest) -> AsyncIterator[str]:
+        """Yield the messages to send for `request`, falling back to the static reply."""
+        # explicit rules win; the provider answers what the rules don't cover
+        provider = RulesProvider()
+        if not request.rule:
+            try:
+                provider = self.provider
+            except Exception as e:
+                print(f"❌ Reply provider unavailable, using static replies: {e}")
+                self._provider = provider
+        if isinstance(provider, RulesProvider):
+            # fixed text isn't streamed: it goes out whole, split only when
+            # it is over Instagram's message limit
+            for message in split_segment(request.static_reply, final=True)[0]:
+                yield message
+            return
+        # Generation runs in its own task and hands segments over through a
+        # queue: the concurrency slot and the deadline cover generating only,
+        # not the time the caller spends sending each segment
+        queue: asyncio.Queue = asyncio.Queue()
+        producer = asyncio.create_task(self._produce(provider, request, queue))
+        try:
+            while True:
+                message = await queue.get()
+                if message is None:
+                    break
+                yield message
+        finally:
+            if not producer.done():
+                producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
+
+    async def _produce(self, provider: ReplyProvider, request: ReplyRequest, queue: asyncio.Queue) -> None:
+        """Put the reply's segments on `queue`, then None."""
+        produced = False
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), REPLY_SLOT_WAIT)
+        except asyncio.TimeoutError:
+            print(f"⚠️  No reply generation slot free after {REPLY_SLOT_WAIT:g}s, using the static reply")
+        else:
+            try:
+                produced = await self._generate(provider, request, queue)
+            finally:
+                self._semaphore.release()
+        if not produced:
+            # nothing went out: answer with the static reply instead
+            for message in split_segment(request.static_reply, final=True)[0]:
+                queue.put_nowait(message)
+        queue.put_nowait(None)
+
+    async def _generate(self, provider: ReplyProvider, request: ReplyRequest, queue: asyncio.Queue) -> bool:
+        """Stream the provider's reply onto `queue` within the deadline. True if anything was produced."""
+        produced = False
+        buffer = ""
+        deadline = time.monotonic() + self.timeout
+        chunks = provider.stream(request).__aiter__()
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), remaining)
+                except StopAsyncIteration:
+                    break
+                buffer += chunk
+                ready, buffer = split_segment(buffer)
+                for message in ready:
+                    produced = True
+                    queue.put_nowait(message)
+            ready, buffer = split_segment(buffer, final=True)
+            for message in ready:
+                produced = True
+                queue.put_nowait(message)
+        except Exception as e:
+            reason = "timed out" if isinstance(e, asyncio.TimeoutError) else f"failed: {e}"
+            print(f"⚠️  Reply provider {provider.name} {reason}")
+            if produced:
+                # part of the answer already went out: send what is left of
+                # it rather than stopping mid-reply without a word
+                for message in split_segment(buffer, final=True)[0]:
+                    queue.put_nowait(message)
+        finally:
+            if hasattr(chunks, "aclose"):
+                await chunks.aclose()
+        return produced
+
+    async def close(self) -> None:
+        if self._provider is not None:
+            await self._provider.close()
+
+
+generator = ReplyGenerator()
@@ -0,0 +1,303 @@
+"""Config-driven auto-reply rules.
+
+Rules live in ``reply_rules.json`` (override with REPLY_RULES_FILE)::
+
+    {
+      "variables": {"brand": "Grace"},
+      "default": "Hi! This is {brand} ...",
+      "rules": [
+        {"name": "pricing", "keywords": ["price", "how much"], "reply": "..."},
+        {"name": "order", "regex": "order\\s*#?(?P<order_id>\\d+)", "reply": "Checking order {order_id}"},
+        {"name": "french", "language": "fr", "reply": "Bonjour ! ..."}
+      ]
+    }
+
+The first rule in file order that matches wins; a rule with several
+conditions matches when any of them does. Replies are ``str.format``
+templates over the config ``variables``, the matched ``keyword``, named regex
+groups and the per-message context (``sender_id``, ``page_id``, ``message``).
+Unknown placeholders are left as-is.
+
+All rules are compiled once into combined matchers instead of being tried
+one by one per message:
+- every keyword goes into a single regex built from a trie of the keywords,
+  scanned with a lookahead so each start position reports its longest
+  keyword; shorter keywords that are word-prefixes of it are resolved from a
+  precomputed table;
+- regex rules are prefiltered: the literal text each pattern must start
+  with goes into a second trie regex, and only rules whose literal occurs in
+  the message are run. Patterns without a usable literal prefix are always
+  run, so keep those few;
+- languages are guessed once per message (script ranges + stopwords).
+
+The file is re-read when its mtime changes (checked at most every
+RELOAD_CHECK seconds); a broken edit keeps the previous rules.
+"""
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Optional
+
+RULES_FILE = Path(os.getenv("REPLY_RULES_FILE") or Path(__file__).resolve().parent.parent / "reply_rules.json")
+RELOAD_CHECK = float(os.getenv("REPLY_RULES_RELOAD_CHECK", "2"))
+
+DEFAULT_REPLY = "Hi! This is Grace, your AI sales assistant. Thanks for your message! This is an automated demo response during our Instagram app review. Full conversational AI capabilities will be available soon! 🤖✨"
+
+_META = set(".^$*+?{}[]()|\\")
+_QUANTIFIERS = set("*+?{")
+# shortest literal worth prefiltering on
+MIN_LITERAL = 2
+_WORD_RE = re.compile(r"\w+")
+
+# Script ranges decide non-Latin languages outright
+_SCRIPTS = (
+    ("ar", re.compile(r"[؀-ۿ]")),
+    ("ru", re.compile(r"[Ѐ-ӿ]")),
+    ("zh", re.compile(r"[一-鿿]")),
+    ("ja", re.compile(r"[぀-ヿ]")),
+    ("ko", re.compile(r"[가-힯]")),
+    ("hi", re.compile(r"[ऀ-ॿ]")),
+)
+# A few very common words per Latin-script language
+_STOPWORDS = {
+    "en": "the and is are you i it to of in for what how do can my your please thanks hello hi",
+    "fr": "le la les et est vous je un une des du pour avec bonjour merci oui pas quel combien",
+    "es": "el la los las y es usted yo un una para con hola gracias por que cuánto qué",
+    "pt": "o a os as e é você eu um uma para com olá obrigado não quanto",
+    "de": "der die das und ist sie ich ein eine für mit hallo danke nicht wie was",
+    "it": "il lo la gli le e è lei io un una per con ciao grazie non quanto",
+}
+_STOPWORD_LANGS = {}
+for _lang, _words in _STOPWORDS.items():
+    for _word in _words.split():
+        _STOPWORD_LANGS.setdefault(_word, []).append(_lang)
+
+
+def detect_language(text: str) -> Optional[str]:
+    """Best-effort language code for a short message, or None if unsure."""
+    for lang, script in _SCRIPTS:
+        if script.search(text):
+            return lang
+    scores = {}
+    for word in _WORD_RE.findall(text.lower()):
+        for lang in _STOPWORD_LANGS.get(word, ()):
+            scores[lang] = scores.get(lang, 0) + 1
+    if not scores:
+        return None
+    best = max(scores.values())
+    winners = [lang for lang, score in scores.items() if score == best]
+    return winners[0] if len(winners) == 1 else None
+
+
+def _trie_regex(words: list) -> str:
+    """Regex source matching any of `words`, longest alternative first."""
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # a word ending here makes the rest optional; `?` is greedy, so the
+        # longest keyword at a position is tried first
+        return "(?:" + body + ")?" if "" in node else body
+
+    return build(trie)
+
+
+def literal_prefix(pattern: str) -> str:
+    """Lowercased literal text every match of `pattern` starts with ('' if none)."""
+    if "|" in pattern.replace("\\|", ""):
+        # an alternation anywhere may be top-level; don't guess
+        return ""
+    i = 0
+    while pattern.startswith(("\\b", "^"), i):
+        i += 1 if pattern[i] == "^" else 2
+    literal = []
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == "\\":
+            if i + 1 >= len(pattern) or pattern[i + 1].isalnum():
+                break  # \d, \s, \b, backreferences ...
+            ch, step = pattern[i + 1], 2
+        elif ch in _META:
+            break
+        else:
+            step = 1
+        following = pattern[i + step:i + step + 1]
+        if following and following in _QUANTIFIERS:
+            break  # the char is optional or repeated
+        literal.append(ch)
+        i += step
+    return "".join(literal).lower()
+
+
+class _Format(dict):
+    def __missing__(self, key):
+        return "{" + key + "}"
+
+
+class RuleMatch:
+    def __init__(self, rule: dict, variables: dict):
+        self.rule = rule
+        self.variables = variables
+
+    @property
+    def name(self) -> str:
+        return self.rule["name"]
+
+
+class CompiledRules:
+    def __init__(self, config: dict):
+        self.variables = dict(config.get("variables") or {})
+        self.default = config.get("default") or DEFAULT_REPLY
+        self.rules = []
+        keyword_rules = {}
+        literal_rules = {}
+        self._regex_rules = {}
+        self._unfiltered = []
+        self._language_rules = {}
+
+        for index, raw in enumerate(config.get("rules") or []):
+            if "reply" not in raw:
+                raise ValueError(f"rule {index} has no reply")
+            rule = dict(raw, name=raw.get("name") or f"rule_{index}", index=index)
+            self.rules.append(rule)
+            for keyword in rule.get("keywords") or []:
+                keyword = " ".join(keyword.lower().split())
+                if keyword:
+                    keyword_rules.setdefault(keyword, index)
+            if rule.get("regex"):
+                try:
+                    compiled = re.compile(rule["regex"], re.IGNORECASE)
+                except re.error as e:
+                    raise ValueError(f"rule {rule['name']}: bad regex: {e}") from None
+                self._regex_rules[index] = compiled
+                literal = literal_prefix(rule["regex"])
+                if len(literal) >= MIN_LITERAL:
+                    literal_rules.setdefault(literal, []).append(index)
+                else:
+                    self._unfiltered.append(index)
+            if rule.get("language"):
+                self._language_rules.setdefault(rule["language"].lower(), index)
+
+        # a keyword hit also implies every keyword that is a whole-word prefix of it
+        self._keyword_best = {}
+        for keyword, index in keyword_rules.items():
+            best = (index, keyword)
+            for cut, ch in enumerate(keyword):
+                if ch == " " and keyword[:cut] in keyword_rules:
+                    best = min(best, (keyword_rules[keyword[:cut]], keyword[:cut]))
+            self._keyword_best[keyword] = best
+        self._keyword_re = None
+        if keyword_rules:
+            self._keyword_re = re.compile(r"(?=\b(" + _trie_regex(list(keyword_rules)) + r")\b)", re.IGNORECASE)
+        self._literal_rules = literal_rules
+        self._literal_re = None
+        if literal_rules:
+            self._literal_re = re.compile("(?=(" + _trie_regex(list(literal_rules)) + "))", re.IGNORECASE)
+
+    def match(self, text: str) -> Optional[RuleMatch]:
+        """Highest-priority rule matching `text`, or None."""
+        best, variables = None, {}
+        if self._keyword_re is not None:
+            normalized = " ".join(text.split())
+            for m in self._keyword_re.finditer(normalized):
+                hit = self._keyword_best.get(m.group(1).lower())
+                if hit is not None and (best is None or hit[0] < best):
+                    best, variables = hit[0], {"keyword": m.group(1)[:len(hit[1])]}
+        if self._regex_rules:
+            candidates = set(self._unfiltered)
+            if self._literal_re is not None:
+                for m in self._literal_re.finditer(text):
+                    # the trie reports the longest literal; shorter ones that
+                    # are its prefixes occur here too
+                    found = m.group(1).lower()
+                    for cut in range(MIN_LITERAL, len(found) + 1):
+                        candidates.update(self._literal_rules.get(found[:cut], ()))
+            for index in sorted(candidates):
+                if best is not None and index > best:
+                    break
+                m = self._regex_rules[index].search(text)
+                if m:
+                    best, variables = index, dict(m.groupdict(), match=m.group(0))
+                    break
+        if self._language_rules:
+            lang = detect_language(text)
+            index = self._language_rules.get(lang)
+            if index is not None and (best is None or index < best):
+                best, variables = index, {"language": lang}
+        return RuleMatch(self.rules[best], variables) if best is not None else None
+
+    def render(self, template: str, values: dict) -> str:
+        merged = _Format(self.variables)
+        merged.update({k: "" if v is None else v for k, v in values.items()})
+        try:
+            return template.format_map(merged)
+        except (ValueError, IndexError, AttributeError, KeyError) as e:
+            print(f"⚠️  Reply template {template[:40]!r} can't be rendered ({e}); sending it unformatted")
+            return template
+
+    def reply_for(self, text: str, **context) -> tuple:
+        """(rule name or None, rendered reply) for a message."""
+        match = self.match(text)
+        values = dict(match.variables if match else {}, message=text, **context)
+        if match is None:
+            return None, self.render(self.default, values)
+        return match.name, self.render(match.rule["reply"], values)
+
+
+class ReplyRules:
+    """Rules loaded from a JSON file and reloaded when it changes."""
+
+    def __init__(self, path: Path = RULES_FILE):
+        self.path = Path(path)
+        self._compiled = CompiledRules({})
+        self._mtime = None
+        self._checked = 0.0
+        self.reload()
+
+    def reload(self) -> bool:
+        """Re-read the file. Returns False (keeping the old rules) on error."""
+        try:
+            mtime = self.path.stat().st_mtime
+        except OSError:
+            if self._mtime is not None:
+                print(f"⚠️  Reply rules file {self.path} disappeared; keeping loaded rules")
+            return False
+        try:
+            compiled = CompiledRules(json.loads(self.path.read_text(encoding="utf-8")))
+        except (OSError, ValueError) as e:
+            print(f"❌ Failed to load reply rules from {self.path}: {e}")
+            self._mtime = mtime
+            return False
+        self._compiled = compiled
+        self._mtime = mtime
+        print(f"📜 Loaded {len(compiled.rules)} reply rule(s) from {self.path}")
+        return True
+
+    @property
+    def compiled(self) -> CompiledRules:
+        now = time.monotonic()
+        if now - self._checked >= RELOAD_CHECK:
+            self._checked = now
+            try:
+                mtime = self.path.stat().st_mtime
+            except OSError:
+                mtime = None
+            if mtime is not None and mtime != self._mtime:
+                self.reload()
+        return self._compiled
+
+    def reply_for(self, text: str, **context) -> tuple:
+        return self.compiled.reply_for(text, **context)
+
+
+rules = ReplyRules()
@@ -0,0 +1,173 @@
+"""Static file serving with precompressed variants and cache headers.
+
+`build_assets.py` writes ``.br`` / ``.gz`` siblings next to compressible files
+under ``static/``. At request time we pick the best variant the client accepts
+(brotli, then gzip, then the original) and send it with ``Content-Encoding``
+and ``Vary: Accept-Encoding``; nothing is compressed on the fly.
+
+Caching:
+- content-hashed file names (``name.<hex>.ext``) and ``?v=<hex>`` URLs whose
+  value is a prefix (8+ hex digits) of the file's SHA-256 get
+  ``Cache-Control: public, max-age=31536000, immutable``; any other ``?v=``
+  could be stale or made up, so it is revalidated like a plain URL;
+- everything else gets ``no-cache`` so browsers revalidate, and
+  ``If-None-Match`` / ``If-Modified-Since`` are answered with 304.
+
+`build_assets.py` also writes minified, content-hashed copies to
+``static/dist/`` plus a manifest; `built_file` and `asset_url` map source
+paths to those copies and fall back to the sources when no build exists.
+"""
+import functools
+import hashlib
+import json
+import os
+import re
+from mimetypes import guess_type
+from pathlib import Path
+from typing import Optional
+from urllib.parse import parse_qsl
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.requests import Request
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+# preferred first
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+FINGERPRINT_RE = re.compile(r"\.[0-9a-f]{8,64}\.[A-Za-z0-9]+$")
+FINGERPRINT_VALUE_RE = re.compile(r"[0-9a-f]{8,64}")
+STATIC_ROOT = Path(__file__).resolve().parent.parent / "static"
+MANIFEST_FILE = STATIC_ROOT / "dist" / "manifest.json"
+
+
+@functools.lru_cache(maxsize=1)
+def load_manifest() -> dict:
+    """Source path (relative to static/) -> built path, from build_assets.py."""
+    try:
+        return json.loads(MANIFEST_FILE.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def built_file(path: str) -> str:
+    """Map a ``static/...`` file path to its built copy, if one exists."""
+    if not path.startswith("static/"):
+        return path
+    built = load_manifest().get(path[len("static/"):])
+    if built and (STATIC_ROOT / built).is_file():
+        return f"static/{built}"
+    return path
+
+
+def asset_url(name: str) -> str:
+    """Public URL for a static asset, content-hashed when built."""
+    built = load_manifest().get(name)
+    if built and (STATIC_ROOT / built).is_file():
+        return f"/static/{built}"
+    return f"/static/{name}"
+
+
+def is_fingerprinted(path: str) -> bool:
+    return bool(FINGERPRINT_RE.search(os.path.basename(path)))
+
+
+def accepted_encodings(request_headers: Headers) -> set:
+    accepted = set()
+    for part in request_headers.get("accept-encoding", "").split(","):
+        name, _, params = part.partition(";")
+        name = name.strip().lower()
+        params = params.strip().replace(" ", "")
+        quality = 1.0
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name and quality > 0:
+            accepted.add(name)
+    return accepted
+
+
+def _pick_variant(full_path: str, stat_result: os.stat_result, request_headers: Headers) -> tuple:
+    accepted = accepted_encodings(request_headers)
+    for encoding, suffix in ENCODINGS:
+        if encoding not in accepted and "*" not in accepted:
+            continue
+        candidate = full_path + suffix
+        try:
+            candidate_stat = os.stat(candidate)
+        except OSError:
+            continue
+        # ignore variants left over from an older version of the file
+        if candidate_stat.st_mtime >= stat_result.st_mtime:
+            return candidate, candidate_stat, encoding
+    return full_path, stat_result, None
+
+
+@functools.lru_cache(maxsize=256)
+def _content_hash(path: str, mtime_ns: int, size: int) -> str:
+    # keyed on mtime/size so an edited file is hashed again
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def has_version_param(scope, full_path: str, stat_result: os.stat_result) -> bool:
+    """True for ``?v=<fingerprint>`` URLs matching the file's content (not ``?v=2``, ``?dev=1``, ...)."""
+    query = scope.get("query_string", b"").decode("latin-1")
+    versions = [value.lower() for key, value in parse_qsl(query) if key == "v"]
+    if not versions or not all(FINGERPRINT_VALUE_RE.fullmatch(v) for v in versions):
+        return False
+    digest = _content_hash(full_path, stat_result.st_mtime_ns, stat_result.st_size)
+    return all(digest.startswith(v) for v in versions)
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope,
+        status_code: int = 200,
+        immutable: Optional[bool] = None,
+    ) -> Response:
+        request_headers = Headers(scope=scope)
+        full_path = str(full_path)
+        if immutable is None:
+            immutable = is_fingerprinted(full_path) or has_version_param(scope, full_path, stat_result)
+
+        path, variant_stat, encoding = _pick_variant(full_path, stat_result, request_headers)
+        headers = {"Cache-Control": IMMUTABLE if immutable else REVALIDATE, "Vary": "Accept-Encoding"}
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        media_type = guess_type(full_path)[0] or "text/plain"
+
+        response = FileResponse(path, status_code=status_code, headers=headers, media_type=media_type, stat_result=variant_stat)
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+_files = PrecompressedStaticFiles()
+
+
+async def serve_static_file(request: Request, path: str, immutable: bool = False) -> Response:
+    """Serve one file with the same variant/caching rules as /static."""
+    stat_result = await anyio.to_thread.run_sync(os.stat, path)
+    return _files.file_response(path, stat_result, request.scope, immutable=immutable)
+
+
+def static_page(path: str):
+    """Build a GET endpoint that serves a fixed file (for the HTML shortcut routes).
+
+    Uses the minified build of `path` when `build_assets.py` has produced one.
+    The URL itself isn't hashed, so responses are never marked immutable.
+    """
+    path = built_file(path)
+
+    async def endpoint(request: Request) -> Response:
+        return await serve_static_file(request, path)
+
+    return endpoint
@@ -0,0 +1,204 @@
+"""Background debug_token checks and long-lived token refresh.
+
+Long-lived user tokens last ~60 days and then fail silently. A single
+scheduler task per process periodically runs ``debug_token`` for every stored
+account, records the result in ``data/tokens.db`` next to the account
+(`get_token_state`) and re-exchanges tokens that are close to expiry. Request
+paths only read the recorded state, from storage's in-memory copy; they never
+call ``debug_token`` inline.
+
+With several worker processes only the worker holding ``data/token_scheduler.lock``
+runs the periodic cycle; the state it records is shared with the others
+through tokens.db. If it exits, another worker picks the lock up on its next
+tick.
+
+Tuning (env):
+- TOKEN_CHECK_INTERVAL  seconds between debug_token checks per account (default 6h)
+- TOKEN_REFRESH_WINDOW  refresh when the token expires within this many seconds (default 7 days)
+- TOKEN_SCHEDULER_TICK  how often the scheduler wakes up (default 5 minutes)
+"""
+import asyncio
+import os
+import time
+from typing import Optional
+
+import httpx
+
+import storage
+from utils.filelock import ProcessLock
+from utils.graph import GRAPH_BASE_URL, GRAPH_URL, get_http_client
+
+DEBUG_TOKEN_URL = f"{GRAPH_BASE_URL}/debug_token"
+ENV_ACCOUNT = "env"
+
+CHECK_INTERVAL = int(os.getenv("TOKEN_CHECK_INTERVAL", str(6 * 3600)))
+REFRESH_WINDOW = int(os.getenv("TOKEN_REFRESH_WINDOW", str(7 * 24 * 3600)))
+SCHEDULER_TICK = int(os.getenv("TOKEN_SCHEDULER_TICK", "300"))
+LOCK_FILE = storage.STORE_PATH / "token_scheduler.lock"
+
+
+def _app_credentials() -> Optional[tuple]:
+    app_id = os.getenv("FACEBOOK_APP_ID") or os.getenv("INSTAGRAM_CLIENT_ID")
+    app_secret = os.getenv("FACEBOOK_APP_SECRET") or os.getenv("INSTAGRAM_CLIENT_SECRET")
+    if not (app_id and app_secret):
+        return None
+    return app_id, app_secret
+
+
+def get_token_state(account_id: str) -> Optional[dict]:
+    """Last known debug_token result for an account, from whichever worker checked it.
+
+    {"valid", "expires_at", "scopes", "checked_at", "debug", "error", "refreshed_at", "status_code"}
+    """
+    return storage.get_token_state(account_id)
+
+
+def env_account() -> Optional[dict]:
+    """Pseudo-account for the INSTAGRAM_ACCESS_TOKEN fallback, if configured."""
+    env_token = os.getenv("INSTAGRAM_ACCESS_TOKEN")
+    return {"account_id": ENV_ACCOUNT, "access_token": env_token} if env_token else None
+
+
+def _tracked_accounts() -> list:
+    accounts = storage.list_accounts()
+    if env_account():
+        accounts.append(env_account())
+    return accounts
+
+
+async def check_token(account: dict) -> dict:
+    """Run debug_token for one account and record the result."""
+    account_id = account["account_id"]
+    state = get_token_state(account_id) or {}
+    state["checked_at"] = time.time()
+
+    credentials = _app_credentials()
+    if not credentials:
+        state.update(valid=None, error="app_credentials_missing")
+        storage.save_token_state(account_id, state)
+        return state
+
+    params = {"input_token": account["access_token"], "access_token": "|".join(credentials)}
+    try:
+        r = await get_http_client().get(DEBUG_TOKEN_URL, params=params)
+        body = r.json()
+    except (httpx.HTTPError, ValueError) as e:
+        state.update(error=f"debug_token_failed: {e}")
+        storage.save_token_state(account_id, state)
+        return state
+
+    data = body.get("data") or {}
+    expires_at = data.get("expires_at")
+    state.update(
+        valid=bool(data.get("is_valid")),
+        expires_at=expires_at,
+        scopes=data.get("scopes", []),
+        debug=body,
+        status_code=r.status_code,
+        error=None if r.status_code == 200 else "debug_token_error",
+    )
+
+    # the account may have been disconnected while the check was in flight
+    connected = storage.get_account(account_id)
+    if connected or account_id == ENV_ACCOUNT:
+        storage.save_token_state(account_id, state)
+    if r.status_code == 200 and connected:
+        storage.save_account(account_id, expires_at=expires_at, scopes=state["scopes"])
+    return state
+
+
+async def refresh_token(account: dict) -> bool:
+    """Exchange an existing long-lived token for a fresh one."""
+    account_id = account["account_id"]
+    credentials = _app_credentials()
+    if not credentials or account_id == ENV_ACCOUNT:
+        return False
+    params = {
+        "grant_type": "fb_exchange_token",
+        "client_id": credentials[0],
+        "client_secret": credentials[1],
+        "fb_exchange_token": account["access_token"],
+    }
+    try:
+        r = await get_http_client().get(f"{GRAPH_URL}/oauth/access_token", params=params)
+        body = r.json()
+    except (httpx.HTTPError, ValueError) as e:
+        print(f"Token refresh for {account_id} failed: {e}")
+        return False
+
+    new_token = body.get("access_token")
+    if r.status_code != 200 or not new_token:
+        print(f"Token refresh for {account_id} rejected: {r.status_code} {body}")
+        return False
+
+    expires_in = body.get("expires_in")
+    storage.save_account(account_id, new_token, expires_at=time.time() + expires_in if expires_in else None)
+    state = get_token_state(account_id) or {}
+    state["refreshed_at"] = time.time()
+    storage.save_token_state(account_id, state)
+    print(f"🔄 Refreshed long-lived token for account {account_id}")
+    await check_token(storage.get_account(account_id))
+    return True
+
+
+def _needs_refresh(state: dict, now: float) -> bool:
+    expires_at = state.get("expires_at")
+    # expires_at == 0 means the token never expires
+    if not (state.get("valid") and expires_at and expires_at - now < REFRESH_WINDOW):
+        return False
+    # Graph may hand back a token with the same expiry; don't retry every tick
+    return now - state.get("refreshed_at", 0) >= CHECK_INTERVAL
+
+
+async def run_cycle() -> None:
+    """Check stale accounts and refresh the ones close to expiry."""
+    now = time.time()
+    for account in _tracked_accounts():
+        state = get_token_state(account["account_id"]) or {}
+        if now - state.get("checked_at", 0) >= CHECK_INTERVAL:
+            state = await check_token(account)
+        if _needs_refresh(state, now):
+            await refresh_token(account)
+
+
+class TokenRefreshScheduler:
+    def __init__(self, tick: int = SCHEDULER_TICK):
+        self.tick = tick
+        self._task: Optional[asyncio.Task] = None
+        self._pending = set()
+        self._leader: Optional[ProcessLock] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            # built here rather than at import, so LOCK_FILE can be repointed first
+            self._leader = ProcessLock(LOCK_FILE)
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        tasks = [t for t in [self._task, *self._pending] if t is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        self._pending.clear()
+        if self._leader is not None:
+            self._leader.release()
+
+    def schedule_check(self, account: dict) -> None:
+        """Check one account soon, e.g. right after it was connected."""
+        task = asyncio.create_task(check_token(account))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                # one worker refreshes for everyone
+                if self._leader.acquire():
+                    await run_cycle()
+            except Exception as e:
+                print(f"Token scheduler cycle failed: {e}")
+            await asyncio.sleep(self.tick)
+
+
+scheduler = TokenRefreshScheduler()
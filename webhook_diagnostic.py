@@ -2,210 +2,294 @@
 """
 Webhook diagnostic tool for Meta Instagram integration.
 This helps troubleshoot webhook setup issues.
+
+All checks run concurrently against one base URL, each with its own
+timeout, and report a timing breakdown (connect / TLS / wait / body):
+
+    python webhook_diagnostic.py                         # https://fynko.space
+    python webhook_diagnostic.py --local                 # http://127.0.0.1:8000
+    python webhook_diagnostic.py --base-url https://staging.example.com --timeout 5
+    python webhook_diagnostic.py --only verify status logs --json
+
+Exits non-zero when a check fails, so it can gate deploys. DIAG_BASE_URL and
+WEBHOOK_VERIFY_TOKEN set the defaults.
 """
 
-import requests
+import argparse
+import asyncio
 import json
+import os
+import sys
 import time
-from datetime import datetime
-
-def test_webhook_verification():
-    """Test the webhook verification endpoint manually."""
-    
-    print("🔍 Testing webhook verification endpoint...")
-    
-    # Test the GET endpoint that Meta will call for verification
-    base_url = "https://fynko.space/webhook"  # Change this if testing locally
-    
-    # These are the parameters Meta sends for verification
-    params = {
-        "hub.mode": "subscribe",
-        "hub.challenge": "test_challenge_12345",
-        "hub.verify_token": "grace_webhook_token"
+from typing import Awaitable, Callable, Optional
+
+import httpx
+
+DEFAULT_BASE_URL = os.getenv("DIAG_BASE_URL", "https://fynko.space")
+LOCAL_BASE_URL = "http://127.0.0.1:8000"
+
+# ok / warn (reachable but not fully set up) / fail
+OK, WARN, FAIL = "ok", "warn", "fail"
+ICONS = {OK: "✅", WARN: "⚠️ ", FAIL: "❌"}
+
+PAGES = [
+    "/",
+    "/privacy",
+    "/terms",
+    "/infinity-estate/stickers",
+    "/infinity-estate/stickers/admin",
+    "/accesscodeng/privacy",
+    "/accesscodeng/support",
+]
+
+
+class Timings:
+    """Request phases from httpx's trace hook, in milliseconds."""
+
+    PHASES = {
+        "connection.connect_tcp": "connect",
+        "connection.start_tls": "tls",
+        "http11.send_request_headers": "send",
+        "http11.send_request_body": "send",
+        "http11.receive_response_headers": "wait",
+        "http11.receive_response_body": "body",
+        "http2.send_request_headers": "send",
+        "http2.send_request_body": "send",
+        "http2.receive_response_headers": "wait",
+        "http2.receive_response_body": "body",
     }
-    
+
+    def __init__(self):
+        self.phases = {}
+        self._started = {}
+
+    async def trace(self, name: str, info: dict) -> None:
+        event, _, stage = name.rpartition(".")
+        phase = self.PHASES.get(event)
+        if phase is None:
+            return
+        now = time.perf_counter()
+        if stage == "started":
+            self._started[event] = now
+        elif stage in ("complete", "failed") and event in self._started:
+            elapsed = (now - self._started.pop(event)) * 1000
+            self.phases[phase] = round(self.phases.get(phase, 0) + elapsed, 1)
+
+
+class Check:
+    def __init__(self, client: httpx.AsyncClient, verify_token: str):
+        self.client = client
+        self.verify_token = verify_token
+        self.timings = Timings()
+        self.requests = 0
+
+    async def request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        self.requests += 1
+        extensions = {"trace": self.timings.trace}
+        return await self.client.request(method, path, extensions=extensions, **kwargs)
+
+
+async def check_verify(c: Check) -> tuple:
+    challenge = f"diag_{int(time.time())}"
+    params = {"hub.mode": "subscribe", "hub.verify_token": c.verify_token, "hub.challenge": challenge}
+    r = await c.request("GET", "/webhook", params=params)
+    if r.status_code == 200 and r.text.strip() == challenge:
+        return OK, "challenge echoed"
+    return FAIL, f"HTTP {r.status_code}, expected {challenge!r}, got {r.text[:80]!r}"
+
+
+async def check_verify_rejects(c: Check) -> tuple:
+    params = {"hub.mode": "subscribe", "hub.verify_token": "diag-wrong-token", "hub.challenge": "x"}
+    r = await c.request("GET", "/webhook", params=params)
+    if r.status_code == 403:
+        return OK, "wrong token rejected (403)"
+    return FAIL, f"wrong verify token answered HTTP {r.status_code}"
+
+
+async def check_status(c: Check) -> tuple:
+    r = await c.request("GET", "/webhook/status")
+    if r.status_code != 200:
+        return FAIL, f"HTTP {r.status_code}"
+    data = r.json()
+    if not data.get("messaging_enabled", data.get("page_access_token_configured")):
+        return WARN, "no page token; replies are only logged"
+    outbox = data.get("reply_outbox") or {}
+    return OK, f"outbox {outbox}" if outbox else "messaging enabled"
+
+
+async def check_logs(c: Check) -> tuple:
+    r = await c.request("GET", "/webhook/logs")
+    if r.status_code != 200:
+        return FAIL, f"HTTP {r.status_code}"
+    data = r.json()
+    events, replies = len(data.get("webhook_events", [])), len(data.get("auto_replies", []))
+    if not (events or replies):
+        return WARN, "no events yet (run seed_webhook_logs.py for sample data)"
+    return OK, f"{events} recent events, {replies} replies"
+
+
+async def check_stream(c: Check) -> tuple:
+    # the stream stays open: done as soon as the server sent its first frame
+    c.requests += 1
+    async with c.client.stream("GET", "/webhook/stream", params={"backlog": 1}, extensions={"trace": c.timings.trace}) as r:
+        if r.status_code != 200:
+            return FAIL, f"HTTP {r.status_code}"
+        async for line in r.aiter_lines():
+            if line.strip():
+                return OK, f"first frame: {line[:40]}"
+    return FAIL, "stream closed without data"
+
+
+async def check_profile(c: Check) -> tuple:
+    r = await c.request("GET", "/instagram/profile")
+    if r.status_code == 200:
+        profiles = r.json() if r.headers.get("content-type", "").startswith("application/json") else []
+        names = [f"@{p.get('username')}" for p in profiles if isinstance(p, dict) and p.get("username")]
+        return OK, ", ".join(names) if names else "profile served"
+    if r.status_code in (400, 401):
+        return WARN, f"HTTP {r.status_code}: no connected account / session"
+    return FAIL, f"HTTP {r.status_code}"
+
+
+async def check_pages(c: Check) -> tuple:
+    responses = await asyncio.gather(*(c.request("GET", path) for path in PAGES), return_exceptions=True)
+    failed = []
+    for path, r in zip(PAGES, responses):
+        if isinstance(r, Exception):
+            failed.append(f"{path} ({type(r).__name__})")
+        elif r.status_code != 200:
+            failed.append(f"{path} ({r.status_code})")
+    if failed:
+        return FAIL, "failed: " + ", ".join(failed)
+    return OK, f"{len(PAGES)} pages"
+
+
+async def check_stickers(c: Check) -> tuple:
+    r = await c.request("GET", "/api/stickers/submissions")
+    if r.status_code == 503:
+        return WARN, "sticker storage not configured (SUPABASE_URL / SUPABASE_KEY)"
+    if r.status_code == 404:
+        return WARN, "stickers routes disabled"
+    if r.status_code != 200:
+        return FAIL, f"submissions HTTP {r.status_code}"
+    rows = len(r.json())
+    missing = await c.request("GET", "/api/stickers/receipt/diag-missing")
+    if missing.status_code != 404:
+        return FAIL, f"unknown receipt answered HTTP {missing.status_code}"
+    return OK, f"{rows} submissions"
+
+
+CHECKS = {
+    "verify": ("Webhook verification handshake", check_verify),
+    "verify_rejects": ("Wrong verify token is rejected", check_verify_rejects),
+    "status": ("Webhook status", check_status),
+    "logs": ("Webhook logs", check_logs),
+    "stream": ("Webhook live stream", check_stream),
+    "profile": ("Instagram profile", check_profile),
+    "pages": ("Static pages", check_pages),
+    "stickers": ("Stickers endpoints", check_stickers),
+}
+
+
+async def run_check(name: str, fn: Callable[[Check], Awaitable[tuple]], client: httpx.AsyncClient, verify_token: str, timeout: float) -> dict:
+    check = Check(client, verify_token)
+    start = time.perf_counter()
     try:
-        response = requests.get(base_url, params=params, timeout=10)
-        
-        print(f"📊 Webhook Verification Response:")
-        print(f"   Status Code: {response.status_code}")
-        print(f"   Response Body: {response.text}")
-        print(f"   Content-Type: {response.headers.get('content-type', 'N/A')}")
-        
-        if response.status_code == 200 and response.text == "test_challenge_12345":
-            print("✅ Webhook verification endpoint working correctly!")
-            return True
-        else:
-            print("❌ Webhook verification failed!")
-            print(f"   Expected: 'test_challenge_12345'")
-            print(f"   Got: '{response.text}'")
-            return False
-            
-    except requests.exceptions.ConnectionError:
-        print("❌ Connection failed - webhook URL not accessible")
-        print("   Make sure your app is deployed to fynko.space")
-        return False
+        status, detail = await asyncio.wait_for(fn(check), timeout)
+    except asyncio.TimeoutError:
+        status, detail = FAIL, f"timed out after {timeout:g}s"
+    except httpx.HTTPError as e:
+        status, detail = FAIL, f"{type(e).__name__}: {e}"
     except Exception as e:
-        print(f"❌ Error testing webhook: {e}")
-        return False
-
-def test_local_webhook():
-    """Test webhook locally if running on localhost."""
-    
-    print("\n🏠 Testing local webhook (if running locally)...")
-    
-    local_url = "http://127.0.0.1:8000/webhook"
-    params = {
-        "hub.mode": "subscribe", 
-        "hub.challenge": "local_test_challenge",
-        "hub.verify_token": "grace_webhook_token"
+        status, detail = FAIL, f"unexpected {type(e).__name__}: {e}"
+    return {
+        "check": name,
+        "title": CHECKS[name][0],
+        "status": status,
+        "detail": detail,
+        "ms": round((time.perf_counter() - start) * 1000, 1),
+        "requests": check.requests,
+        "timings_ms": check.timings.phases,
     }
-    
-    try:
-        response = requests.get(local_url, params=params, timeout=5)
-        
-        print(f"📊 Local Webhook Response:")
-        print(f"   Status Code: {response.status_code}")
-        print(f"   Response: {response.text}")
-        
-        if response.status_code == 200:
-            print("✅ Local webhook working!")
-        else:
-            print("❌ Local webhook issue")
-            
-    except requests.exceptions.ConnectionError:
-        print("⚠️  Local server not running (this is OK if deployed)")
-    except Exception as e:
-        print(f"❌ Local test error: {e}")
-
-def check_webhook_requirements():
-    """Check all webhook requirements."""
-    
-    print("\n📋 Checking Meta Webhook Requirements:")
-    
-    requirements = [
-        {
-            "name": "HTTPS URL",
-            "requirement": "Webhook URL must use HTTPS",
-            "status": "✅" if "https://" in "https://fynko.space/webhook" else "❌",
-            "details": "fynko.space/webhook"
-        },
-        {
-            "name": "Public accessibility", 
-            "requirement": "URL must be publicly accessible",
-            "status": "⚠️",
-            "details": "Test by accessing https://fynko.space/webhook in browser"
-        },
-        {
-            "name": "Verify token",
-            "requirement": "Must return hub.challenge when verify token matches",
-            "status": "⚠️",
-            "details": "grace_webhook_token"
-        },
-        {
-            "name": "Response format",
-            "requirement": "Must return plain text challenge value",
-            "status": "✅",
-            "details": "PlainTextResponse implemented"
-        }
-    ]
-    
-    for req in requirements:
-        print(f"   {req['status']} {req['name']}: {req['details']}")
-    
-    print(f"\n🔧 Meta Developer Console Configuration:")
-    print(f"   Webhook URL: https://fynko.space/webhook")
-    print(f"   Verify Token: grace_webhook_token")
-    print(f"   Subscription Fields: messages")
-
-def simulate_meta_verification():
-    """Simulate what Meta does during webhook verification."""
-    
-    print(f"\n🤖 Simulating Meta's webhook verification process...")
-    
-    webhook_url = "https://fynko.space/webhook"
-    verify_token = "grace_webhook_token"
-    challenge = f"meta_challenge_{int(time.time())}"
-    
-    print(f"1. Meta sends GET request to: {webhook_url}")
-    print(f"2. With parameters:")
-    print(f"   - hub.mode=subscribe")
-    print(f"   - hub.verify_token={verify_token}")
-    print(f"   - hub.challenge={challenge}")
-    
-    params = {
-        "hub.mode": "subscribe",
-        "hub.verify_token": verify_token,
-        "hub.challenge": challenge
+
+
+async def run_diagnostics(base_url: str, names: list, timeout: float, verify_token: str) -> dict:
+    start = time.perf_counter()
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, follow_redirects=False) as client:
+        results = await asyncio.gather(*(run_check(n, CHECKS[n][1], client, verify_token, timeout) for n in names))
+    wall = (time.perf_counter() - start) * 1000
+    counts = {s: sum(r["status"] == s for r in results) for s in (OK, WARN, FAIL)}
+    return {
+        "base_url": base_url,
+        "https": base_url.startswith("https://"),
+        "wall_ms": round(wall, 1),
+        "sum_ms": round(sum(r["ms"] for r in results), 1),
+        "summary": counts,
+        "checks": results,
     }
-    
-    try:
-        print(f"\n📡 Making verification request...")
-        response = requests.get(webhook_url, params=params, timeout=15)
-        
-        print(f"📊 Meta Verification Simulation:")
-        print(f"   Status: {response.status_code}")
-        print(f"   Response: '{response.text}'")
-        print(f"   Expected: '{challenge}'")
-        
-        if response.status_code == 200 and response.text.strip() == challenge:
-            print("✅ META VERIFICATION WOULD SUCCEED!")
-            print("   Your webhook is properly configured")
-        else:
-            print("❌ META VERIFICATION WOULD FAIL!")
-            print("   Check your webhook implementation")
-            
-    except Exception as e:
-        print(f"❌ Verification simulation failed: {e}")
 
-def show_debugging_steps():
+
+def show_debugging_steps(base_url: str, verify_token: str) -> None:
     """Show debugging steps for webhook issues."""
-    
+
     print(f"\n🔧 Webhook Debugging Steps:")
     print(f"\n1. Check if your app is deployed and running:")
-    print(f"   Visit: https://fynko.space")
+    print(f"   Visit: {base_url}")
     print(f"   Should show: Instagram integration page")
-    
+
     print(f"\n2. Test webhook endpoint manually:")
-    print(f"   Visit: https://fynko.space/webhook?hub.mode=subscribe&hub.verify_token=grace_webhook_token&hub.challenge=test123")
+    print(f"   Visit: {base_url}/webhook?hub.mode=subscribe&hub.verify_token={verify_token}&hub.challenge=test123")
     print(f"   Should return: test123")
-    
+
     print(f"\n3. Check Meta Developer Console:")
     print(f"   Products → Webhooks → Instagram")
-    print(f"   Callback URL: https://fynko.space/webhook")
-    print(f"   Verify Token: grace_webhook_token")
+    print(f"   Callback URL: {base_url}/webhook")
+    print(f"   Verify Token: {verify_token}")
     print(f"   Subscribe to: messages")
-    
+
     print(f"\n4. Look for error messages in Meta Console")
     print(f"   Common issues:")
     print(f"   - URL not accessible (deployment issue)")
     print(f"   - Wrong verify token")
     print(f"   - Not returning plain text response")
     print(f"   - SSL certificate issues")
-    
-    print(f"\n5. Check webhook logs:")
-    print(f"   Visit: https://fynko.space/webhook/logs")
-    print(f"   Look for verification attempts")
+
+
+def print_report(report: dict) -> None:
+    print(f"🚀 Meta Webhook Diagnostics: {report['base_url']}\n")
+    for r in report["checks"]:
+        phases = " ".join(f"{k} {v:g}" for k, v in r["timings_ms"].items())
+        print(f"{ICONS[r['status']]} {r['title']:<34} {r['ms']:>8.1f}ms  {r['detail']}")
+        if phases:
+            print(f"   {'':<34} {'':>10}  ⏱️  {phases} (ms, {r['requests']} request{'s' if r['requests'] != 1 else ''})")
+    if not report["https"]:
+        print(f"\n⚠️  {report['base_url']} is not HTTPS; Meta only calls HTTPS webhook URLs")
+    s = report["summary"]
+    print(f"\n🎯 {s[OK]} ok, {s[WARN]} warnings, {s[FAIL]} failed in {report['wall_ms']:.0f}ms "
+          f"(checks took {report['sum_ms']:.0f}ms combined)")
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run webhook and endpoint diagnostics concurrently")
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL)
+    parser.add_argument("--local", action="store_true", help=f"shortcut for --base-url {LOCAL_BASE_URL}")
+    parser.add_argument("--only", nargs="+", choices=list(CHECKS), default=list(CHECKS))
+    parser.add_argument("--timeout", type=float, default=10, help="seconds per check")
+    parser.add_argument("--verify-token", default=os.getenv("WEBHOOK_VERIFY_TOKEN", "grace_webhook_token"))
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    base_url = (LOCAL_BASE_URL if args.local else args.base_url).rstrip("/")
+    report = asyncio.run(run_diagnostics(base_url, args.only, args.timeout, args.verify_token))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+        verify = next((r for r in report["checks"] if r["check"] == "verify"), None)
+        if verify and verify["status"] == FAIL:
+            show_debugging_steps(base_url, args.verify_token)
+    return 1 if report["summary"][FAIL] else 0
+
 
 if __name__ == "__main__":
-    print("🚀 Meta Webhook Diagnostic Tool\n")
-    
-    # Test webhook verification
-    webhook_works = test_webhook_verification()
-    
-    # Test local webhook if available
-    test_local_webhook()
-    
-    # Check requirements
-    check_webhook_requirements()
-    
-    # Simulate Meta's process
-    if webhook_works:
-        simulate_meta_verification()
-    
-    # Show debugging steps
-    show_debugging_steps()
-    
-    print(f"\n🎯 Diagnostic complete!")
-    print(f"   If webhook verification failed, follow the debugging steps above.")
-    print(f"   If it succeeded, check Meta Developer Console for any error messages.")
+    sys.exit(main())
@@ -4,64 +4,76 @@ Real-time webhook monitor to see Meta verification attempts.
 Run this while setting up webhooks in Meta Console.
 """
 
+import os
 import requests
 import time
 import json
-from datetime import datetime
+
+# Set MONITOR_BASE_URL=http://127.0.0.1:8000 to watch a local server
+BASE_URL = os.getenv("MONITOR_BASE_URL", "https://fynko.space").rstrip("/")
+
+
+def stream_events(cursor=None, source="events", backlog=0):
+    """Yield (cursor, event) from /webhook/stream, reconnecting from the last cursor.
+
+    The server pushes events as they arrive, so an idle monitor just holds one
+    open connection instead of polling.
+    """
+    delay = 1
+    while True:
+        params = {"source": source}
+        if cursor is not None:
+            params["cursor"] = cursor
+        elif backlog:
+            params["backlog"] = backlog
+        try:
+            with requests.get(f"{BASE_URL}/webhook/stream", params=params, stream=True, timeout=(10, 60)) as response:
+                if response.status_code != 200:
+                    print(f"❌ Stream returned {response.status_code}: {response.text[:200]}")
+                else:
+                    delay = 1
+                    event_id = None
+                    data = []
+                    for line in response.iter_lines(decode_unicode=True):
+                        if line is None:
+                            continue
+                        if line.startswith("id:"):
+                            event_id = line[3:].strip()
+                        elif line.startswith("data:"):
+                            data.append(line[5:].strip())
+                        elif line == "" and data:
+                            # blank line ends an SSE event
+                            cursor = int(event_id) if event_id and event_id.isdigit() else cursor
+                            try:
+                                yield cursor, json.loads("\n".join(data))
+                            except ValueError:
+                                pass
+                            event_id, data = None, []
+        except requests.exceptions.RequestException as e:
+            print(f"⚠️  Connection issue: {e}")
+        
+        # resume from the last cursor so nothing is missed or repeated
+        print(f"🔄 Reconnecting in {delay}s...")
+        time.sleep(delay)
+        delay = min(delay * 2, 30)
+
 
 def monitor_webhook_logs():
     """Monitor webhook logs in real-time."""
     
     print("🔍 Monitoring webhook activity...")
+    print(f"📡 Streaming from {BASE_URL}/webhook/stream")
     print("💡 Keep this running while configuring webhooks in Meta Console")
     print("⏹️  Press Ctrl+C to stop\n")
     
-    last_check = datetime.now()
-    
     try:
-        while True:
-            try:
-                # Check webhook logs
-                response = requests.get("https://fynko.space/webhook/logs", timeout=5)
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    webhook_events = data.get("webhook_events", [])
-                    
-                    # Look for recent events
-                    recent_events = []
-                    for event in webhook_events:
-                        try:
-                            # Handle different timestamp formats
-                            timestamp_str = event["timestamp"].replace("Z", "+00:00")
-                            event_time = datetime.fromisoformat(timestamp_str)
-                            # Make last_check timezone aware for comparison
-                            if event_time.timestamp() > last_check.timestamp():
-                                recent_events.append(event)
-                        except (ValueError, KeyError):
-                            # Skip events with invalid timestamps
-                            continue
-                    
-                    if recent_events:
-                        print(f"📡 New webhook activity detected:")
-                        for event in recent_events:
-                            print(f"   ⏰ {event['timestamp']}")
-                            print(f"   📋 Event: {event['event']}")
-                            if "data" in event:
-                                print(f"   📄 Data: {json.dumps(event['data'], indent=6)}")
-                            print()
-                        
-                        last_check = datetime.now()
-                    else:
-                        print("⏳ Waiting for webhook activity...", end="\r")
-                
-                else:
-                    print(f"❌ Failed to check logs: {response.status_code}")
-                
-            except requests.exceptions.RequestException as e:
-                print(f"⚠️  Connection issue: {e}")
-            
-            time.sleep(2)  # Check every 2 seconds
+        for cursor, event in stream_events():
+            print(f"📡 New webhook activity detected:")
+            print(f"   ⏰ {event.get('timestamp')}")
+            print(f"   📋 Event: {event.get('event')}")
+            if "data" in event:
+                print(f"   📄 Data: {json.dumps(event['data'], indent=6)}")
+            print()
             
     except KeyboardInterrupt:
         print(f"\n\n✅ Monitoring stopped")
@@ -71,7 +83,7 @@ def test_webhook_now():
     
     print("🧪 Sending test verification request...")
     
-    url = "https://fynko.space/webhook"
+    url = f"{BASE_URL}/webhook"
     params = {
         "hub.mode": "subscribe",
         "hub.verify_token": "grace_webhook_token", 
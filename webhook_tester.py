@@ -2,13 +2,52 @@
 """
 Real-time webhook testing tool.
 This sends test webhooks to your deployed app and shows you the responses.
+
+Run without arguments for the interactive menu, or use load mode to fire
+signed Instagram messaging payloads at a server and measure the webhook path:
+
+    python webhook_tester.py load                      # local uvicorn, 20 req/s for 30s
+    python webhook_tester.py load --rps 200 --concurrency 100 --duration 60
+    python webhook_tester.py load --url https://fynko.space/webhook --rps 5 --duration 10
+
+Requests are scheduled at a fixed rate (open loop), and latency is measured
+from each request's scheduled start, so a slow server shows up as higher
+percentiles rather than a quietly lower request rate. Payloads are signed
+with X-Hub-Signature-256 like Meta's (FACEBOOK_APP_SECRET or
+INSTAGRAM_CLIENT_SECRET, or --secret).
 """
 
-import requests
+import argparse
+import asyncio
+import hashlib
+import hmac
 import json
+import os
+import random
+import sys
 import time
+
+import requests
 from datetime import datetime
 
+DEFAULT_LOAD_URL = "http://127.0.0.1:8000/webhook"
+PAGE_ID = "17841457603940745"
+SAMPLE_TEXTS = [
+    "Hi! How much is this?",
+    "Hello, do you deliver to Abuja?",
+    "What's the price of the black one in size M?",
+    "Is this still available?",
+    "Where is my order #10293?",
+    "Thank you 🙏",
+    "Can I speak to a human please",
+    "Bonjour, quel est le prix ?",
+    "Hola, ¿hacen envíos?",
+    "ok",
+]
+# Meta batches events: most deliveries carry one entry with one event, a few
+# carry several. (entries, events per entry) -> weight
+BATCH_SHAPES = {(1, 1): 80, (1, 2): 10, (1, 3): 4, (2, 1): 4, (3, 2): 2}
+
 def test_webhook_verification():
     """Test webhook verification and show the response."""
     
@@ -150,7 +189,155 @@ def show_current_logs():
     
     print("\n")
 
+def sign_payload(body: bytes, secret: str) -> str:
+    """X-Hub-Signature-256 value for `body`, as Meta computes it."""
+    return "sha256=" + hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+
+
+def messaging_event(rng: random.Random, senders: int, message_ratio: float, seq: int) -> dict:
+    now_ms = int(time.time() * 1000)
+    event = {
+        "sender": {"id": f"loadtest_user_{rng.randrange(senders)}"},
+        "recipient": {"id": PAGE_ID},
+        "timestamp": now_ms,
+    }
+    roll = rng.random()
+    if roll < message_ratio:
+        event["message"] = {"mid": f"loadtest_mid_{os.getpid()}_{seq}", "text": rng.choice(SAMPLE_TEXTS)}
+    elif roll < message_ratio + (1 - message_ratio) / 2:
+        event["read"] = {"mid": f"loadtest_read_{seq}"}
+    else:
+        event["delivery"] = {"mids": [f"loadtest_delivered_{seq}"], "watermark": now_ms}
+    return event
+
+
+def load_payload(rng: random.Random, senders: int, message_ratio: float, seq: int) -> tuple:
+    """(payload, event count) with a batch shape drawn from BATCH_SHAPES."""
+    entries, per_entry = rng.choices(list(BATCH_SHAPES), weights=list(BATCH_SHAPES.values()))[0]
+    payload = {"object": "instagram", "entry": []}
+    for e in range(entries):
+        payload["entry"].append({
+            "id": PAGE_ID,
+            "time": int(time.time() * 1000),
+            "messaging": [messaging_event(rng, senders, message_ratio, seq * 10 + e * 3 + i) for i in range(per_entry)],
+        })
+    return payload, entries * per_entry
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # nearest rank
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+async def run_load(url: str, rps: float, duration: float, concurrency: int, secret: str, senders: int,
+                   message_ratio: float, seed: int) -> dict:
+    import httpx
+
+    rng = random.Random(seed)
+    total = int(rps * duration)
+    latencies = []
+    statuses = {}
+    errors = {}
+    events_sent = 0
+    slots = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=10) as client:
+        async def fire(payload: dict, scheduled: float):
+            body = json.dumps(payload).encode("utf-8")
+            headers = {"Content-Type": "application/json"}
+            if secret:
+                headers["X-Hub-Signature-256"] = sign_payload(body, secret)
+            async with slots:
+                try:
+                    r = await client.post(url, content=body, headers=headers)
+                    statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+                except httpx.HTTPError as e:
+                    name = type(e).__name__
+                    errors[name] = errors.get(name, 0) + 1
+                    return
+            # from the scheduled start, so time spent queued for a slot counts
+            latencies.append(time.perf_counter() - scheduled)
+
+        start = time.perf_counter()
+        tasks = []
+        for seq in range(total):
+            scheduled = start + seq / rps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            payload, count = load_payload(rng, senders, message_ratio, seq)
+            events_sent += count
+            tasks.append(asyncio.create_task(fire(payload, scheduled)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    ok = sum(n for code, n in statuses.items() if 200 <= code < 300)
+    failed = total - ok
+    return {
+        "url": url,
+        "target_rps": rps,
+        "requests": total,
+        "events": events_sent,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(ok / elapsed, 1) if elapsed else 0.0,
+        "error_rate": round(failed / total, 4) if total else 0.0,
+        "status_codes": {str(code): n for code, n in sorted(statuses.items())},
+        "transport_errors": errors,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 1),
+            "p95": round(percentile(latencies, 95) * 1000, 1),
+            "p99": round(percentile(latencies, 99) * 1000, 1),
+            "max": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+        },
+    }
+
+
+def load_mode(argv: list) -> int:
+    parser = argparse.ArgumentParser(prog="webhook_tester.py load", description="Fire signed Instagram webhook traffic at a server")
+    parser.add_argument("--url", default=os.getenv("LOADTEST_URL", DEFAULT_LOAD_URL))
+    parser.add_argument("--rps", type=float, default=20, help="requests per second to schedule")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to run")
+    parser.add_argument("--concurrency", type=int, default=50, help="max requests in flight")
+    parser.add_argument("--secret", default=os.getenv("FACEBOOK_APP_SECRET") or os.getenv("INSTAGRAM_CLIENT_SECRET", ""), help="app secret for X-Hub-Signature-256")
+    parser.add_argument("--senders", type=int, default=500, help="distinct simulated users")
+    parser.add_argument("--message-ratio", type=float, default=0.7, help="share of events that are text messages (rest: read/delivery)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    if not args.json:
+        print(f"🚀 Load test: {args.rps:g} req/s for {args.duration:g}s against {args.url} (concurrency {args.concurrency})")
+        if not args.secret:
+            print("⚠️  No FACEBOOK_APP_SECRET / INSTAGRAM_CLIENT_SECRET / --secret: requests are sent unsigned")
+        if args.message_ratio > 0:
+            print("💬 Text messages trigger auto-replies; point the server at a test token (or none) first")
+
+    report = asyncio.run(run_load(args.url, args.rps, args.duration, args.concurrency, args.secret,
+                                  args.senders, args.message_ratio, args.seed))
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        latency = report["latency_ms"]
+        print(f"\n📊 Results:")
+        print(f"   Requests:   {report['requests']} ({report['events']} events) in {report['elapsed_s']}s")
+        print(f"   Throughput: {report['throughput_rps']} req/s successful")
+        print(f"   Errors:     {report['error_rate'] * 100:.2f}%  status={report['status_codes']}  transport={report['transport_errors'] or '{}'}")
+        print(f"   Latency:    p50 {latency['p50']}ms  p95 {latency['p95']}ms  p99 {latency['p99']}ms  max {latency['max']}ms")
+        if report["throughput_rps"] < args.rps * 0.95:
+            print("⚠️  Server did not keep up with the target rate")
+    return 1 if report["error_rate"] else 0
+
+
 if __name__ == "__main__":
+    if sys.argv[1:2] == ["load"]:
+        sys.exit(load_mode(sys.argv[2:]))
+    
     print("🚀 Webhook Testing & Monitoring Tool")
     print("=" * 60)
     print()